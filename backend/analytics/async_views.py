@@ -0,0 +1,123 @@
+"""
+Async versions of the analytics endpoints made of independent queries
+(clients, services, payments, deadlines), for the ASGI deployment.
+
+The sync views run their 2-4 aggregates one after the other. Here each
+query runs on a thread of a small dedicated pool, concurrently, and each
+thread holds its own SQLite connection (Django connections are
+per-thread), so a request costs about its slowest query instead of the
+sum. The event loop only waits: a slow client reading the response holds
+no thread.
+
+Selected by ANALYTICS_ASYNC_VIEWS, which config/asgi.py turns on.
+Authentication, permissions and throttling are the sync view's own
+(its authentication_classes, permission_classes...), run through DRF, so
+JWT and session users get the same answer from both variants. GET and
+HEAD take the async path; other methods (OPTIONS, or a 405) are handed to
+the sync view. Payloads and analytics snapshot headers are identical to
+the sync views'.
+
+ANALYTICS_QUERY_THREADS sizes the pool (pool threads keep their read
+connection open for the life of the worker); 0 runs the queries one
+after the other in the request's thread, as the sync views do.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+from config.renderers import FastJSONRenderer
+from . import snapshot
+from .views import (
+    ClientAnalyticsView, ServiceAnalyticsView, PaymentAnalyticsView, DeadlineAnalyticsView,
+    client_analytics_queries, client_analytics_payload,
+    service_analytics_queries, service_analytics_payload,
+    payment_analytics_queries, payment_analytics_payload,
+    deadline_analytics_queries, deadline_analytics_payload,
+    run_queries,
+)
+
+_executor = None
+_renderer = FastJSONRenderer()
+
+
+def get_executor():
+    # Created in the worker on first use, never in a preloading master
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ANALYTICS_QUERY_THREADS, thread_name_prefix='analytics-query'
+        )
+    return _executor
+
+
+def _run_query(query):
+    # Pool threads keep their connections across requests
+    snapshot.close_stale_connection()
+    return query()
+
+
+async def run_queries_concurrently(queries):
+    """Async run_queries(): every callable on its own pool thread."""
+    if settings.ANALYTICS_QUERY_THREADS <= 0:
+        return await sync_to_async(_run_query)(lambda: run_queries(queries))
+    executor = get_executor()
+    results = await asyncio.gather(*(
+        sync_to_async(_run_query, thread_sensitive=False, executor=executor)(query)
+        for query in queries.values()
+    ))
+    return dict(zip(queries, results))
+
+
+def _json(data, status=200):
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+def _check_access(view_class, request):
+    """Returns None when the sync view would serve the request, else its error response."""
+    view = view_class()
+    view.args, view.kwargs = (), {}
+    drf_request = view.initialize_request(request)
+    view.request = drf_request
+    view.headers = view.default_response_headers
+    try:
+        # Authentication, permissions and throttles, as APIView.dispatch() runs them
+        view.initial(drf_request)
+    except Exception as exc:
+        return view.finalize_response(drf_request, view.handle_exception(exc)).render()
+    request.user = drf_request.user
+    return None
+
+
+def _sync_response(view_class, request):
+    return view_class.as_view()(request).render()
+
+
+def analytics_view(view_class, queries, payload):
+    """Build an async GET view from a sync view's query map and payload builder."""
+    async def view(request):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(_sync_response)(view_class, request)
+        denied = await sync_to_async(_check_access)(view_class, request)
+        if denied is not None:
+            return denied
+        try:
+            query_map = queries(request.GET)
+        except ValueError:
+            return _json({'error': 'months must be an integer'}, status=400)
+        # Pool threads run in a copy of this context, so they see reading()
+        with snapshot.reading() as snapshot_time:
+            results = await run_queries_concurrently(query_map)
+        response = snapshot.add_headers(_json(payload(results)), snapshot_time)
+        if request.method == 'HEAD':
+            response.content = b''
+        return response
+    return view
+
+
+client_analytics = analytics_view(ClientAnalyticsView, client_analytics_queries, client_analytics_payload)
+service_analytics = analytics_view(ServiceAnalyticsView, service_analytics_queries, service_analytics_payload)
+payment_analytics = analytics_view(PaymentAnalyticsView, payment_analytics_queries, payment_analytics_payload)
+deadline_analytics = analytics_view(DeadlineAnalyticsView, deadline_analytics_queries, deadline_analytics_payload)
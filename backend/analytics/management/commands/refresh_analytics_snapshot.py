@@ -0,0 +1,60 @@
+"""
+Refresh the read-only analytics snapshot (see analytics/snapshot.py).
+
+    manage.py refresh_analytics_snapshot              copy now
+    manage.py refresh_analytics_snapshot --if-older 300
+                                                      only when the copy is that old (cron,
+                                                      with ANALYTICS_SNAPSHOT_INTERVAL=0)
+"""
+
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import snapshot
+from maintenance import backup
+
+# Constants
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Copy the database to the read-only analytics snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.ANALYTICS_SNAPSHOT_PATH),
+                            help=f'Snapshot file (default ANALYTICS_SNAPSHOT_PATH: {settings.ANALYTICS_SNAPSHOT_PATH})')
+        parser.add_argument('--if-older', type=float, metavar='SECONDS',
+                            help='Skip unless the snapshot is at least this old; also skips while '
+                                 'another process is refreshing')
+        parser.add_argument('--pages', type=int, default=backup.DEFAULT_STEP_PAGES,
+                            help='Pages copied per backup step (default %(default)s)')
+        parser.add_argument('--sleep', type=float, default=backup.DEFAULT_STEP_SLEEP,
+                            help='Seconds between steps so writers get in (default %(default)s)')
+
+    def handle(self, *args, **options):
+        if settings.DATABASES['default']['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('The analytics snapshot only supports the SQLite database')
+        if not settings.ANALYTICS_SNAPSHOT_ENABLED:
+            self.stdout.write(self.style.WARNING(
+                '[WARN] ANALYTICS_SNAPSHOT_ENABLED is off: the snapshot is written but not read'
+            ))
+
+        kwargs = {'target_path': options['output'], 'pages': options['pages'], 'sleep': options['sleep']}
+        try:
+            if options['if_older'] is not None:
+                info = snapshot.refresh_if_stale(options['if_older'], **kwargs)
+            else:
+                info = snapshot.refresh(**kwargs)
+        except (OSError, sqlite3.Error) as e:
+            raise CommandError(str(e))
+
+        if info is None:
+            age = time.time() - (snapshot.taken_at(options['output']) or time.time())
+            self.stdout.write(f'Snapshot is {age:.0f}s old or being refreshed, skipped')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Snapshot {options["output"]} ({info["page_count"] * info["page_size"] / MB:.1f} MB) '
+            f'in {info["seconds"]:.1f}s, {info["steps"]} steps, {info["restarts"]} restarts'
+        ))
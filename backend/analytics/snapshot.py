@@ -0,0 +1,267 @@
+"""
+Read-only analytics snapshot: reporting queries off the primary database.
+
+The analytics endpoints (revenue series, cost analytics, top clients,
+profitability...) scan whole tables on the same SQLite file that
+log_generation and payment recording write to. With
+ANALYTICS_SNAPSHOT_ENABLED they read a copy instead:
+
+    ANALYTICS_SNAPSHOT_PATH     copy of the database, opened read-only as
+                                the "analytics" connection
+    <path>.tmp                  next copy being written
+    <path>.lock                 held by the process refreshing
+
+A copy is taken with the online backup API (maintenance.backup.snapshot:
+a few pages per step, writers get in between steps), then renamed over
+the previous one. Requests still running finish on the old file; a
+connection opened on an older copy (persistent connections, the async
+views' pool threads) is closed and reopened by the next reading() or
+close_stale_connection().
+
+Every process runs a SnapshotRefresher thread, started on the first
+analytics request; the copy is refreshed once it is ANALYTICS_SNAPSHOT_INTERVAL
+seconds old, by whichever process gets the lock first. With the interval
+set to 0 no thread runs and `manage.py refresh_analytics_snapshot` (cron)
+is the only refresh.
+
+Views opt in with SnapshotReadMixin (or reading() for the async views):
+while it is active, AnalyticsSnapshotRouter sends reads of SNAPSHOT_APPS
+models to the snapshot. Auth, sessions and all writes stay on the primary
+database. A snapshot older than ANALYTICS_SNAPSHOT_MAX_AGE (refreshes
+failing) or missing is not used: the request reads the primary database.
+Responses say which one they were served from:
+
+    X-Analytics-Source: snapshot | primary
+    X-Analytics-Snapshot-Age: <seconds>      snapshot only
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from maintenance import backup
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Constants
+SNAPSHOT_DB = 'analytics'  # Alias config/settings.py adds when enabled
+SNAPSHOT_APPS = {'clients', 'projects', 'invoices', 'services', 'subscriptions'}
+MAX_CHECK_INTERVAL = 15  # Seconds between age checks of the refresher thread
+SOURCE_HEADER = 'X-Analytics-Source'
+AGE_HEADER = 'X-Analytics-Snapshot-Age'
+
+# Time the snapshot being read was taken, None when reading the primary database
+_snapshot_time = ContextVar('analytics_snapshot_time', default=None)
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def snapshot_enabled():
+    return settings.ANALYTICS_SNAPSHOT_ENABLED and SNAPSHOT_DB in settings.DATABASES
+
+
+def taken_at(path=None):
+    """When the snapshot file was written, None if there is none."""
+    try:
+        return os.stat(path or settings.ANALYTICS_SNAPSHOT_PATH).st_mtime
+    except OSError:
+        return None
+
+
+def usable_snapshot():
+    """Time of the snapshot requests should read now, None for the primary database."""
+    if not snapshot_enabled():
+        return None
+    ensure_refresher()
+    snapshot_time = taken_at()
+    if snapshot_time is None or time.time() - snapshot_time > settings.ANALYTICS_SNAPSHOT_MAX_AGE:
+        return None
+    return snapshot_time
+
+
+def refresh(source_path=None, target_path=None, pages=backup.DEFAULT_STEP_PAGES,
+            sleep=backup.DEFAULT_STEP_SLEEP):
+    """
+    Copy the primary database over the snapshot.
+
+    Returns:
+        dict: maintenance.backup.snapshot() info plus `seconds`
+    """
+    source_path = source_path or settings.DATABASES['default']['NAME']
+    target_path = Path(target_path or settings.ANALYTICS_SNAPSHOT_PATH)
+    temp_path = target_path.with_name(f'{target_path.name}.tmp')
+    temp_path.unlink(missing_ok=True)
+
+    started = time.monotonic()
+    try:
+        info = backup.snapshot(source_path, temp_path, pages=pages, sleep=sleep)
+        os.replace(temp_path, target_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+    info['seconds'] = time.monotonic() - started
+    return info
+
+
+@contextmanager
+def _refresh_lock(target_path):
+    """Yields True when this process holds the refresh lock."""
+    if not FCNTL_AVAILABLE:
+        yield True
+        return
+    with open(f'{target_path}.lock', 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def refresh_if_stale(max_age, **kwargs):
+    """
+    refresh() when the snapshot is `max_age` seconds old or missing and no
+    other process is refreshing it. Returns the refresh info or None.
+    """
+    target_path = kwargs.get('target_path') or settings.ANALYTICS_SNAPSHOT_PATH
+    snapshot_time = taken_at(target_path)
+    if snapshot_time is not None and time.time() - snapshot_time < max_age:
+        return None
+    with _refresh_lock(target_path) as locked:
+        if not locked:
+            return None
+        # Another process may have refreshed while we waited for the lock
+        snapshot_time = taken_at(target_path)
+        if snapshot_time is not None and time.time() - snapshot_time < max_age:
+            return None
+        return refresh(**kwargs)
+
+
+class SnapshotRefresher(threading.Thread):
+    """Daemon thread that keeps the snapshot younger than `interval` seconds."""
+
+    def __init__(self, interval):
+        super().__init__(name='analytics-snapshot', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        check_every = min(self.interval, MAX_CHECK_INTERVAL)
+        while True:
+            try:
+                refresh_if_stale(self.interval)
+            except (OSError, sqlite3.Error):
+                # Tried again on the next round; requests fall back to the
+                # primary database once the snapshot passes MAX_AGE
+                pass
+            if self._stop_event.wait(check_every):
+                return
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def ensure_refresher():
+    """Start this process's refresher thread (again after a fork)."""
+    global _refresher
+    if settings.ANALYTICS_SNAPSHOT_INTERVAL <= 0:
+        return
+    refresher = _refresher
+    if refresher is not None and refresher.pid == os.getpid():
+        return
+    with _refresher_lock:
+        if _refresher is None or _refresher.pid != os.getpid():
+            _refresher = SnapshotRefresher(settings.ANALYTICS_SNAPSHOT_INTERVAL)
+            _refresher.pid = os.getpid()
+            _refresher.start()
+
+
+def _connection_created(sender, connection, **kwargs):
+    if connection.alias == SNAPSHOT_DB:
+        connection.snapshot_time = taken_at()
+
+
+connection_created.connect(_connection_created, dispatch_uid='analytics_snapshot_connection')
+
+
+def close_stale_connection():
+    """
+    Close this thread's snapshot connection if it was opened on an older
+    copy than the one the current request reads. Only call it between
+    queries: a cursor still being read would be closed with it.
+    """
+    snapshot_time = _snapshot_time.get()
+    if snapshot_time is None:
+        return
+    connection = connections[SNAPSHOT_DB]
+    if connection.connection is not None and getattr(connection, 'snapshot_time', None) != snapshot_time:
+        connection.close()
+
+
+@contextmanager
+def reading():
+    """Route snapshot app reads in this block to the snapshot, when usable."""
+    snapshot_time = usable_snapshot()
+    token = _snapshot_time.set(snapshot_time)
+    close_stale_connection()
+    try:
+        yield snapshot_time
+    finally:
+        _snapshot_time.reset(token)
+
+
+def current_snapshot():
+    """Time of the snapshot the current request reads, None for the primary database."""
+    return _snapshot_time.get()
+
+
+def add_headers(response, snapshot_time):
+    if snapshot_time is None:
+        response[SOURCE_HEADER] = 'primary'
+    else:
+        response[SOURCE_HEADER] = 'snapshot'
+        response[AGE_HEADER] = str(max(0, int(time.time() - snapshot_time)))
+    return response
+
+
+class SnapshotReadMixin:
+    """For read-only APIViews: queries go to the analytics snapshot when it is usable."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with reading() as snapshot_time:
+            response = super().dispatch(request, *args, **kwargs)
+        return add_headers(response, snapshot_time)
+
+
+class AnalyticsSnapshotRouter:
+    """Sends reads inside reading() to the snapshot; the snapshot is never migrated."""
+
+    def db_for_read(self, model, **hints):
+        if _snapshot_time.get() is not None and model._meta.app_label in SNAPSHOT_APPS:
+            return SNAPSHOT_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == SNAPSHOT_DB:
+            return False
+        return None
@@ -1,3 +1,194 @@
-from django.test import TestCase
+import json
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from clients.models import Client
+from invoices.models import Payment
+from subscriptions.models import CreditUsage
+from config.query_budget import seed_budget_dataset
+from . import snapshot
+
+
+class ProfitabilityViewTests(APITestCase):
+    """Margins per client, project and month over a month window."""
+
+    url = '/api/analytics/profitability/'
+
+    @classmethod
+    def setUpTestData(cls):
+        # Per client: 2 invoices of 1000, 4 payments of 200, 6 usages of 1.00
+        seed_budget_dataset(2)
+        cls.user = User.objects.create_user(username='profit', password='profit-password')
+        cls.first = Client.objects.get(email='budget0@example.ma')
+        cls.second = Client.objects.get(email='budget1@example.ma')
+        # A manual override counts instead of the calculated cost: 5 x 1.00 + 101
+        usage = CreditUsage.objects.filter(client=cls.first).first()
+        CreditUsage.objects.filter(pk=usage.pk).update(manual_cost_mad=Decimal('101'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        self.month = timezone.now().strftime('%Y-%m')
+
+    def test_margins_by_client(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(
+            [(row['client_id'], row['revenue'], row['invoiced'], row['cost'], row['margin'], row['margin_pct'])
+             for row in data['results']],
+            [(str(self.second.pk), 800.0, 2000.0, 6.0, 794.0, 99.25),
+             (str(self.first.pk), 800.0, 2000.0, 106.0, 694.0, 86.75)]
+        )
+        self.assertEqual(data['totals'], {
+            'revenue': 1600.0, 'invoiced': 4000.0, 'cost': 112.0, 'margin': 1488.0, 'margin_pct': 93.0,
+        })
+
+        data = self.client.get(self.url, {'ordering': 'margin_pct'}).json()
+        self.assertEqual(data['results'][0]['client_id'], str(self.first.pk))
+
+    def test_margins_by_project_and_month(self):
+        data = self.client.get(self.url, {'group_by': 'project', 'ordering': 'cost'}).json()
+        self.assertEqual(len(data['results']), 4)
+        self.assertEqual([row['cost'] for row in data['results']], sorted(row['cost'] for row in data['results']))
+        self.assertEqual(sum(row['cost'] for row in data['results']), 112.0)
+        self.assertEqual({row['revenue'] for row in data['results']}, {400.0})
+
+        data = self.client.get(self.url, {'group_by': 'month'}).json()
+        self.assertEqual([(row['month'], row['margin']) for row in data['results']], [(self.month, 1488.0)])
+
+    def test_invalid_parameters(self):
+        for params in ({'group_by': 'tool'}, {'ordering': '-name'}, {'from': '2026-13'}, {'to': '03/2026'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_month_window_bounds(self):
+        start = timezone.make_aware(datetime.strptime(self.month, '%Y-%m'))
+        payments = Payment.objects.filter(invoice__client=self.second).order_by('pk')
+        # First instant of the month is inside the window, first instant of the next is not
+        Payment.objects.filter(pk=payments[0].pk).update(payment_date=start)
+        Payment.objects.filter(pk=payments[1].pk).update(payment_date=(start + timedelta(days=32)).replace(day=1))
+        Payment.objects.filter(pk=payments[2].pk).update(payment_date=start - timedelta(seconds=1))
+
+        data = self.client.get(self.url, {'from': self.month, 'to': self.month}).json()
+        self.assertEqual((data['from'], data['to']), (self.month, self.month))
+        self.assertEqual(data['totals']['revenue'], 1200.0)
+
+        previous = (start - timedelta(days=1)).strftime('%Y-%m')
+        data = self.client.get(self.url, {'from': previous, 'to': previous}).json()
+        self.assertEqual(data['totals']['revenue'], 200.0)
+        self.assertEqual(data['totals']['cost'], 0.0)
+
+
+@override_settings(ANALYTICS_QUERY_THREADS=0)
+class AsyncAnalyticsViewTests(APITestCase):
+    """The async analytics views return the sync views' payloads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='async', password='async-password')
+        seed_budget_dataset(3)
+
+    def test_payload_parity(self):
+        from asgiref.sync import async_to_sync
+        from django.test import RequestFactory
+        from analytics import async_views
+
+        token = str(AccessToken.for_user(self.user))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        factory = RequestFactory()
+        for name in ('client', 'service', 'payment', 'deadline'):
+            path = f'/api/analytics/{name}s/'
+            view = getattr(async_views, f'{name}_analytics')
+            request = factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+            response = async_to_sync(view)(request)
+            self.assertEqual(response.status_code, 200, name)
+            sync_response = self.client.get(path)
+            self.assertEqual(json.loads(response.content), sync_response.json(), name)
+            self.assertEqual(response['X-Analytics-Source'], sync_response['X-Analytics-Source'])
+
+        response = async_to_sync(async_views.client_analytics)(factory.get('/api/analytics/clients/'))
+        self.assertEqual(response.status_code, 401)
+
+    def _session_request(self, method, path):
+        from django.contrib.auth.middleware import AuthenticationMiddleware
+        from django.contrib.sessions.middleware import SessionMiddleware
+        from django.test import RequestFactory
+
+        request = RequestFactory().generic(method, path)
+        request._dont_enforce_csrf_checks = True  # As the test client's requests
+        request.COOKIES.update({key: morsel.value for key, morsel in self.client.cookies.items()})
+        SessionMiddleware(lambda request: None).process_request(request)
+        AuthenticationMiddleware(lambda request: None).process_request(request)
+        return request
+
+    def test_session_user_same_status(self):
+        from asgiref.sync import async_to_sync
+        from analytics import async_views
+
+        view = async_views.client_analytics
+        path = '/api/analytics/clients/'
+        statuses = {}
+        for logged_in in (True, False):
+            if logged_in:
+                self.client.force_login(self.user)
+            else:
+                self.client.logout()
+            for method in ('GET', 'HEAD', 'OPTIONS', 'POST'):
+                sync_response = self.client.generic(method, path)
+                response = async_to_sync(view)(self._session_request(method, path))
+                self.assertEqual(response.status_code, sync_response.status_code, (logged_in, method))
+                statuses[logged_in, method] = response.status_code
+        self.assertEqual(statuses[True, 'GET'], 200)
+        self.assertEqual(statuses[True, 'HEAD'], 200)
+        self.assertEqual(statuses[True, 'OPTIONS'], 200)
+        self.assertEqual(statuses[False, 'GET'], 401)
+
+
+class AnalyticsSnapshotTests(SimpleTestCase):
+    """Snapshot refresh and routing of analytics reads."""
+
+    def test_refresh_and_routing(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = Path(directory) / 'source.sqlite3'
+            target = Path(directory) / 'analytics.sqlite3'
+            connection = sqlite3.connect(source)
+            connection.execute('CREATE TABLE figures (value INTEGER)')
+            connection.executemany('INSERT INTO figures VALUES (?)', [(i,) for i in range(100)])
+            connection.commit()
+            connection.close()
+
+            snapshot.refresh(source, target)
+            copy = sqlite3.connect(f'file:{target}?mode=ro', uri=True)
+            self.assertEqual(copy.execute('SELECT SUM(value) FROM figures').fetchone()[0], 4950)
+            copy.close()
+            self.assertIsNone(snapshot.refresh_if_stale(60, source_path=source, target_path=target))
+            self.assertIsNotNone(snapshot.refresh_if_stale(0, source_path=source, target_path=target))
+
+            router = snapshot.AnalyticsSnapshotRouter()
+            with override_settings(ANALYTICS_SNAPSHOT_PATH=target, ANALYTICS_SNAPSHOT_INTERVAL=0,
+                                   ANALYTICS_SNAPSHOT_MAX_AGE=60), \
+                    patch.object(snapshot, 'snapshot_enabled', return_value=True), \
+                    patch.object(snapshot, 'close_stale_connection'):
+                with snapshot.reading() as snapshot_time:
+                    self.assertIsNotNone(snapshot_time)
+                    self.assertEqual(router.db_for_read(Client), snapshot.SNAPSHOT_DB)
+                    self.assertIsNone(router.db_for_read(User))
+                    self.assertIsNone(router.db_for_write(Client))
+                self.assertIsNone(router.db_for_read(Client))
+
+                # Past ANALYTICS_SNAPSHOT_MAX_AGE: back to the primary database
+                os.utime(target, (0, 0))
+                with snapshot.reading() as snapshot_time:
+                    self.assertIsNone(snapshot_time)
+                    self.assertIsNone(router.db_for_read(Client))
@@ -1,14 +1,31 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     OverviewView, RevenueAnalyticsView, ClientAnalyticsView,
-    ServiceAnalyticsView, PaymentAnalyticsView, DeadlineAnalyticsView
+    ServiceAnalyticsView, PaymentAnalyticsView, DeadlineAnalyticsView,
+    ProfitabilityView
 )
 
+if settings.ANALYTICS_ASYNC_VIEWS:
+    # ASGI deployment: same URLs and payloads, queries run concurrently
+    from . import async_views
+
+    client_view = async_views.client_analytics
+    service_view = async_views.service_analytics
+    payment_view = async_views.payment_analytics
+    deadline_view = async_views.deadline_analytics
+else:
+    client_view = ClientAnalyticsView.as_view()
+    service_view = ServiceAnalyticsView.as_view()
+    payment_view = PaymentAnalyticsView.as_view()
+    deadline_view = DeadlineAnalyticsView.as_view()
+
 urlpatterns = [
     path('analytics/overview/', OverviewView.as_view(), name='analytics-overview'),
     path('analytics/revenue/', RevenueAnalyticsView.as_view(), name='analytics-revenue'),
-    path('analytics/clients/', ClientAnalyticsView.as_view(), name='analytics-clients'),
-    path('analytics/services/', ServiceAnalyticsView.as_view(), name='analytics-services'),
-    path('analytics/payments/', PaymentAnalyticsView.as_view(), name='analytics-payments'),
-    path('analytics/deadlines/', DeadlineAnalyticsView.as_view(), name='analytics-deadlines'),
+    path('analytics/clients/', client_view, name='analytics-clients'),
+    path('analytics/services/', service_view, name='analytics-services'),
+    path('analytics/payments/', payment_view, name='analytics-payments'),
+    path('analytics/deadlines/', deadline_view, name='analytics-deadlines'),
+    path('analytics/profitability/', ProfitabilityView.as_view(), name='analytics-profitability'),
 ]
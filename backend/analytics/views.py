@@ -1,33 +1,42 @@
+from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg, F, Q, Value
 from django.db.models.functions import TruncMonth, TruncWeek, TruncDay, Coalesce
-from django.core.cache import cache
 from django.conf import settings
-from datetime import timedelta
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from clients.models import Client
 from projects.models import Project
 from invoices.models import Invoice, Payment
 from services.models import ServicePricing
+from subscriptions.models import CreditUsage, CostRollup
+from config.compressed_cache import compressed_cache
+from config.authentication import STATELESS_READ_AUTHENTICATION
+from .snapshot import SnapshotReadMixin, current_snapshot
 
 # Constants
 DEFAULT_MONTHS_LOOKBACK = 12  # Default number of months for analytics queries
 CACHE_TIMEOUT = getattr(settings, 'CACHE_TIMEOUT_ANALYTICS', 300)  # 5 minutes default
+PROFITABILITY_GROUPS = ['client', 'project', 'month']
+PROFITABILITY_SORT_FIELDS = ['margin', 'margin_pct', 'revenue', 'invoiced', 'cost']
 
 
-class OverviewView(APIView):
+def _cache_day(request):
+    # Default windows end today: a new day is a new response. So is a new
+    # analytics snapshot, or cached figures would outlive their data.
+    return f'{timezone.now().date()}:{current_snapshot() or ""}'
+
+
+class OverviewView(SnapshotReadMixin, APIView):
     """Dashboard overview statistics - optimized with consolidated queries and caching."""
 
-    def get(self, request):
-        # Try to get cached response first
-        cache_key = f'analytics_overview_{timezone.now().date()}'
-        cached_response = cache.get(cache_key)
-        if cached_response is not None:
-            return Response(cached_response)
+    authentication_classes = STATELESS_READ_AUTHENTICATION
 
+    @compressed_cache('analytics_overview', CACHE_TIMEOUT, key=_cache_day)
+    def get(self, request):
         today = timezone.now().date()
         this_month_start = today.replace(day=1)
         last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
@@ -107,15 +116,14 @@ class OverviewView(APIView):
             'avg_project_value': float(invoice_stats['avg_value']),
         }
 
-        # Cache the response for faster subsequent requests
-        cache.set(cache_key, response_data, CACHE_TIMEOUT)
-
         return Response(response_data)
 
 
-class RevenueAnalyticsView(APIView):
+class RevenueAnalyticsView(SnapshotReadMixin, APIView):
     """Revenue analytics over time."""
 
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
     def get(self, request):
         period = request.query_params.get('period', 'monthly')
         months = int(request.query_params.get('months', DEFAULT_MONTHS_LOOKBACK))
@@ -145,133 +153,330 @@ class RevenueAnalyticsView(APIView):
         })
 
 
-class ClientAnalyticsView(APIView):
-    """Client analytics."""
-
-    def get(self, request):
-        months = int(request.query_params.get('months', DEFAULT_MONTHS_LOOKBACK))
-        end_date = timezone.now()
-        start_date = end_date - timedelta(days=months * 30)
+# The views below are made of independent queries. Each is declared once as
+# a {name: callable} map plus a function building the payload from the
+# results, so the sync views here and the async ones in async_views.py
+# (which run the callables concurrently) return the same data.
 
+def client_analytics_queries(params):
+    months = int(params.get('months', DEFAULT_MONTHS_LOOKBACK))
+    start_date = timezone.now() - timedelta(days=months * 30)
+    return {
         # New clients over time
-        new_clients = Client.objects.filter(
-            created_at__gte=start_date
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            count=Count('id')
-        ).order_by('month')
-
+        'new_clients_over_time': lambda: list(
+            Client.objects.filter(
+                created_at__gte=start_date
+            ).annotate(
+                month=TruncMonth('created_at')
+            ).values('month').annotate(
+                count=Count('id')
+            ).order_by('month')
+        ),
         # Top clients by revenue
-        top_clients = Client.objects.annotate(
-            total_paid=Sum('invoices__amount_paid')
-        ).filter(
-            total_paid__gt=0
-        ).order_by('-total_paid')[:10].values(
-            'id', 'name', 'company', 'total_paid'
-        )
-
+        'top_clients': lambda: list(
+            Client.objects.annotate(
+                total_paid=Sum('invoices__amount_paid')
+            ).filter(
+                total_paid__gt=0
+            ).order_by('-total_paid')[:10].values(
+                'id', 'name', 'company', 'total_paid'
+            )
+        ),
+        'total_clients': lambda: Client.objects.count(),
         # Client retention (clients with multiple projects)
-        total_clients = Client.objects.count()
-        repeat_clients = Client.objects.annotate(
+        'repeat_clients': lambda: Client.objects.annotate(
             project_count=Count('projects')
-        ).filter(project_count__gt=1).count()
+        ).filter(project_count__gt=1).count(),
+    }
 
-        retention_rate = (repeat_clients / total_clients * 100) if total_clients > 0 else 0
 
-        return Response({
-            'new_clients_over_time': list(new_clients),
-            'top_clients': list(top_clients),
-            'total_clients': total_clients,
-            'repeat_clients': repeat_clients,
-            'retention_rate': float(retention_rate),
-        })
+def client_analytics_payload(results):
+    total_clients, repeat_clients = results['total_clients'], results['repeat_clients']
+    retention_rate = (repeat_clients / total_clients * 100) if total_clients > 0 else 0
+    return {**results, 'retention_rate': float(retention_rate)}
 
 
-class ServiceAnalyticsView(APIView):
-    """Service popularity analytics."""
-
-    def get(self, request):
+def service_analytics_queries(params):
+    return {
         # Projects by service type
-        service_breakdown = Project.objects.values('service_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
+        'service_breakdown': lambda: list(
+            Project.objects.values('service_type').annotate(count=Count('id')).order_by('-count')
+        ),
         # Revenue by service type (based on projects)
-        service_revenue = Invoice.objects.values(
-            'project__service_type'
-        ).annotate(
-            total=Sum('amount_paid'),
-            count=Count('id')
-        ).order_by('-total')
+        'service_revenue': lambda: list(
+            Invoice.objects.values(
+                'project__service_type'
+            ).annotate(
+                total=Sum('amount_paid'),
+                count=Count('id')
+            ).order_by('-total')
+        ),
+    }
 
-        return Response({
-            'service_breakdown': list(service_breakdown),
-            'service_revenue': list(service_revenue),
-        })
 
+def service_analytics_payload(results):
+    return results
 
-class PaymentAnalyticsView(APIView):
-    """Payment status analytics."""
 
-    def get(self, request):
+def payment_analytics_queries(params):
+    return {
         # Payment status distribution
-        status_distribution = Invoice.objects.values('payment_status').annotate(
-            count=Count('id'),
-            total_amount=Sum('total_amount')
-        )
-
+        'status_distribution': lambda: list(
+            Invoice.objects.values('payment_status').annotate(
+                count=Count('id'),
+                total_amount=Sum('total_amount')
+            )
+        ),
         # Payment methods breakdown
-        payment_methods = Payment.objects.values('payment_method').annotate(
-            count=Count('id'),
-            total=Sum('amount')
-        ).order_by('-total')
-
-        # Outstanding balance trend
-        today = timezone.now().date()
-        outstanding = Invoice.objects.filter(
+        'payment_methods': lambda: list(
+            Payment.objects.values('payment_method').annotate(
+                count=Count('id'),
+                total=Sum('amount')
+            ).order_by('-total')
+        ),
+        # Outstanding balance
+        'total_outstanding': lambda: Invoice.objects.filter(
             payment_status__in=['unpaid', 'partial', 'overdue']
         ).aggregate(
             total_outstanding=Sum('total_amount') - Sum('amount_paid')
-        )
+        ).get('total_outstanding'),
+    }
 
-        return Response({
-            'status_distribution': list(status_distribution),
-            'payment_methods': list(payment_methods),
-            'total_outstanding': float(outstanding.get('total_outstanding') or 0),
-        })
+
+def payment_analytics_payload(results):
+    return {**results, 'total_outstanding': float(results['total_outstanding'] or 0)}
+
+
+def deadline_analytics_queries(params):
+    today = timezone.now()
+    open_statuses = ['pending', 'in_progress', 'review']
+    completed = Project.objects.filter(status='completed')
+    return {
+        # Upcoming deadlines (next 30 days)
+        'upcoming_deadlines': lambda: list(
+            Project.objects.filter(
+                deadline__gte=today,
+                deadline__lte=today + timedelta(days=30),
+                status__in=open_statuses
+            ).order_by('deadline').values(
+                'id', 'title', 'deadline', 'status', 'client__name'
+            )[:20]
+        ),
+        # Overdue projects
+        'overdue_count': lambda: Project.objects.filter(deadline__lt=today, status__in=open_statuses).count(),
+        # On-time completion rate
+        'total_completed': lambda: completed.count(),
+        'on_time': lambda: completed.filter(completed_at__lte=F('deadline')).count(),
+    }
 
 
-class DeadlineAnalyticsView(APIView):
+def deadline_analytics_payload(results):
+    total_completed = results.pop('total_completed')
+    on_time = results.pop('on_time')
+    return {
+        **results,
+        'total_completed': total_completed,
+        'on_time_rate': float((on_time / total_completed * 100) if total_completed > 0 else 0),
+    }
+
+
+def run_queries(queries):
+    """Run a {name: callable} map one query after the other."""
+    return {name: query() for name, query in queries.items()}
+
+
+class ClientAnalyticsView(SnapshotReadMixin, APIView):
+    """Client analytics."""
+
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
+    def get(self, request):
+        return Response(client_analytics_payload(run_queries(client_analytics_queries(request.query_params))))
+
+
+class ServiceAnalyticsView(SnapshotReadMixin, APIView):
+    """Service popularity analytics."""
+
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
+    def get(self, request):
+        return Response(service_analytics_payload(run_queries(service_analytics_queries(request.query_params))))
+
+
+class PaymentAnalyticsView(SnapshotReadMixin, APIView):
+    """Payment status analytics."""
+
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
+    def get(self, request):
+        return Response(payment_analytics_payload(run_queries(payment_analytics_queries(request.query_params))))
+
+
+class DeadlineAnalyticsView(SnapshotReadMixin, APIView):
     """Deadline analytics."""
 
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
     def get(self, request):
-        today = timezone.now()
+        return Response(deadline_analytics_payload(run_queries(deadline_analytics_queries(request.query_params))))
 
-        # Upcoming deadlines (next 30 days)
-        upcoming = Project.objects.filter(
-            deadline__gte=today,
-            deadline__lte=today + timedelta(days=30),
-            status__in=['pending', 'in_progress', 'review']
-        ).order_by('deadline').values(
-            'id', 'title', 'deadline', 'status', 'client__name'
-        )[:20]
 
-        # Overdue projects
-        overdue = Project.objects.filter(
-            deadline__lt=today,
-            status__in=['pending', 'in_progress', 'review']
-        ).count()
+def _money(value):
+    """Round a MAD amount to centimes for the response."""
+    return float(Decimal(value).quantize(Decimal('0.01')))
 
-        # On-time completion rate
-        completed = Project.objects.filter(status='completed')
-        total_completed = completed.count()
-        on_time = completed.filter(completed_at__lte=F('deadline')).count() if total_completed > 0 else 0
-        on_time_rate = (on_time / total_completed * 100) if total_completed > 0 else 0
 
-        return Response({
-            'upcoming_deadlines': list(upcoming),
-            'overdue_count': overdue,
-            'total_completed': total_completed,
-            'on_time_rate': float(on_time_rate),
-        })
+def _margin_pct(margin, revenue):
+    return round(float(margin / revenue * 100), 2) if revenue > 0 else None
+
+
+def _next_month(month):
+    """First day of the month after `month`."""
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class ProfitabilityView(SnapshotReadMixin, APIView):
+    """
+    Revenue, AI-tool cost and margin per client, project or month.
+
+    Query params:
+        group_by: client (default), project or month
+        from, to: YYYY-MM month window (default: last 12 months)
+        ordering: margin, margin_pct, revenue, invoiced or cost, '-' for descending (default -margin)
+
+    Revenue is cash collected (payments), as on the dashboard; invoiced is the
+    total of invoices issued in the window. Cost uses final_cost_mad so manual
+    overrides count. Client and month costs come from CostRollup; project costs
+    need one grouped query over CreditUsage since the rollup has no project key.
+    """
+
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
+    @compressed_cache('analytics_profitability', CACHE_TIMEOUT, key=_cache_day)
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'client')
+        ordering = request.query_params.get('ordering', '-margin')
+        if group_by not in PROFITABILITY_GROUPS:
+            return Response(
+                {'error': f'group_by must be one of {", ".join(PROFITABILITY_GROUPS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if ordering.lstrip('-') not in PROFITABILITY_SORT_FIELDS:
+            return Response(
+                {'error': f'ordering must be one of {", ".join(PROFITABILITY_SORT_FIELDS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            to_month = datetime.strptime(request.query_params['to'], '%Y-%m').date() \
+                if request.query_params.get('to') else timezone.now().date().replace(day=1)
+            if request.query_params.get('from'):
+                from_month = datetime.strptime(request.query_params['from'], '%Y-%m').date()
+            else:
+                year, month = divmod(to_month.year * 12 + to_month.month - DEFAULT_MONTHS_LOOKBACK, 12)
+                from_month = to_month.replace(year=year, month=month + 1)
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be in YYYY-MM format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        end_date = _next_month(to_month)
+        start_dt = timezone.make_aware(datetime.combine(from_month, datetime.min.time()))
+        end_dt = timezone.make_aware(datetime.combine(end_date, datetime.min.time()))
+
+        payments = Payment.objects.filter(payment_date__gte=start_dt, payment_date__lt=end_dt)
+        invoices = Invoice.objects.filter(issued_date__gte=from_month, issued_date__lt=end_date)
+        rollups = CostRollup.objects.filter(month__gte=from_month, month__lte=to_month)
+
+        # One grouped query per source, keyed by the group
+        if group_by == 'client':
+            revenue = payments.values_list('invoice__client_id').annotate(total=Sum('amount'))
+            invoiced = invoices.values_list('client_id').annotate(total=Sum('total_amount'))
+            cost = rollups.values_list('client_id').annotate(total=Sum('final_cost_mad'))
+        elif group_by == 'project':
+            revenue = payments.values_list('invoice__project_id').annotate(total=Sum('amount'))
+            invoiced = invoices.values_list('project_id').annotate(total=Sum('total_amount'))
+            cost = CreditUsage.objects.filter(
+                subscription__billing_month__gte=from_month,
+                subscription__billing_month__lte=to_month
+            ).values_list('project_id').annotate(
+                total=Sum(Coalesce('manual_cost_mad', 'calculated_cost_mad'))
+            )
+        else:
+            revenue = payments.annotate(
+                period=TruncMonth('payment_date')
+            ).values_list('period').annotate(total=Sum('amount'))
+            invoiced = invoices.annotate(
+                period=TruncMonth('issued_date')
+            ).values_list('period').annotate(total=Sum('total_amount'))
+            cost = rollups.values_list('month').annotate(total=Sum('final_cost_mad'))
+
+        rows = {}
+        for source, field in ((revenue, 'revenue'), (invoiced, 'invoiced'), (cost, 'cost')):
+            for key, total in source.order_by():
+                if group_by == 'month' and hasattr(key, 'date'):
+                    key = key.date()
+                row = rows.setdefault(key, {'revenue': Decimal('0'), 'invoiced': Decimal('0'), 'cost': Decimal('0')})
+                row[field] += Decimal(total or 0)
+
+        # Labels in one extra query
+        labels = {}
+        if group_by == 'client':
+            labels = {
+                client['id']: {'client_id': str(client['id']), 'client_name': client['name'], 'company': client['company']}
+                for client in Client.objects.filter(pk__in=rows.keys()).values('id', 'name', 'company')
+            }
+        elif group_by == 'project':
+            labels = {
+                project['id']: {
+                    'project_id': str(project['id']),
+                    'project_title': project['title'],
+                    'client_id': str(project['client_id']),
+                    'client_name': project['client__name'],
+                }
+                for project in Project.objects.filter(
+                    pk__in=[key for key in rows if key is not None]
+                ).values('id', 'title', 'client_id', 'client__name')
+            }
+            # Usages logged without a project
+            labels[None] = {'project_id': None, 'project_title': None, 'client_id': None, 'client_name': None}
+
+        results = []
+        totals = {'revenue': Decimal('0'), 'invoiced': Decimal('0'), 'cost': Decimal('0')}
+        for key, row in rows.items():
+            margin = row['revenue'] - row['cost']
+            for field in totals:
+                totals[field] += row[field]
+            label = {'month': key.strftime('%Y-%m')} if group_by == 'month' else labels.get(key, {})
+            results.append({
+                **label,
+                'revenue': _money(row['revenue']),
+                'invoiced': _money(row['invoiced']),
+                'cost': _money(row['cost']),
+                'margin': _money(margin),
+                'margin_pct': _margin_pct(margin, row['revenue']),
+            })
+
+        # Rows without a margin_pct (no revenue) always sort last
+        sort_field = ordering.lstrip('-')
+        ranked = [result for result in results if result[sort_field] is not None]
+        ranked.sort(key=lambda result: result[sort_field], reverse=ordering.startswith('-'))
+        results = ranked + [result for result in results if result[sort_field] is None]
+
+        total_margin = totals['revenue'] - totals['cost']
+        response_data = {
+            'group_by': group_by,
+            'from': from_month.strftime('%Y-%m'),
+            'to': to_month.strftime('%Y-%m'),
+            'totals': {
+                'revenue': _money(totals['revenue']),
+                'invoiced': _money(totals['invoiced']),
+                'cost': _money(totals['cost']),
+                'margin': _money(total_margin),
+                'margin_pct': _margin_pct(total_margin, totals['revenue']),
+            },
+            'results': results,
+        }
+
+        return Response(response_data)
@@ -0,0 +1,247 @@
+"""
+HTTP load-replay benchmark.
+
+Starts the API under gunicorn with the production gunicorn.conf.py (or
+runserver, or targets --url), builds a seeded request trace from the
+default mix, replays it with the requested concurrency and prints req/s
+and latency percentiles per endpoint. Results are written as JSON so runs
+can be compared across commits with --compare.
+
+A local server must run on a benchmark database (DATABASE_PATH), never
+the default db.sqlite3. Unless --username/--password are given, a
+throwaway user with a random password is created for the run and deleted
+afterwards.
+
+Typical run on a scaled dataset:
+    DATABASE_PATH=/tmp/bench.sqlite3 python manage.py migrate
+    DATABASE_PATH=/tmp/bench.sqlite3 python manage.py seed_scale --clients 5000
+    DATABASE_PATH=/tmp/bench.sqlite3 python manage.py benchmark_api --requests 5000 --concurrency 16
+
+ASGI against gthread on the analytics endpoints (async views, concurrent queries):
+    python manage.py benchmark_api --mix benchmarks/mixes/analytics.json --server gunicorn --save-trace t.json
+    python manage.py benchmark_api --trace t.json --server gunicorn-asgi --compare benchmarks/results/<first>.json
+"""
+
+import json
+import os
+import platform
+import secrets
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from benchmarks.replay import HttpSession, obtain_token, replay, summarize, compare
+from benchmarks.scenarios import DEFAULT_MIX, load_mix, load_fixtures, build_trace
+
+# Constants
+BENCHMARK_USERNAME_PREFIX = 'benchmark-'
+SERVER_START_TIMEOUT = 30  # Seconds to wait for /api/health/
+RESULTS_DIR = os.path.join(settings.BASE_DIR, 'benchmarks', 'results')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Replay a realistic request mix against a local server and report req/s and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Benchmark an already running server instead of starting one')
+        parser.add_argument('--username', help='Login to benchmark with (required with --url; otherwise a '
+                                                'temporary user is created and deleted after the run)')
+        parser.add_argument('--password', help='Password for --username')
+        parser.add_argument('--server', choices=['gunicorn', 'gunicorn-asgi', 'runserver'], default='gunicorn',
+                            help='Local server to start (default gunicorn, as in production; gunicorn-asgi '
+                                 'runs config.asgi with uvicorn workers and the async analytics views)')
+        parser.add_argument('--workers', type=int, default=4, help='Gunicorn workers (default 4)')
+        parser.add_argument('--threads', type=int, default=4, help='Gunicorn threads per worker (default 4)')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests to replay (default 1000)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight (default 8)')
+        parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests sent first (default 50)')
+        parser.add_argument('--seed', type=int, default=42, help='Trace random seed (default 42)')
+        parser.add_argument('--mix', help='JSON file with a custom request mix (see benchmarks/scenarios.py)')
+        parser.add_argument('--trace', help='Replay a previously saved trace instead of building one')
+        parser.add_argument('--save-trace', help='Write the built trace to this JSON file')
+        parser.add_argument('--output', help='Results JSON path (default benchmarks/results/<time>-<rev>.json)')
+        parser.add_argument('--compare', help='Previous results JSON to compare against')
+
+    def handle(self, *args, **options):
+        server = None
+        temporary_user = None
+        base_url = options['url']
+        if base_url and not options['username']:
+            raise CommandError('--url requires --username and --password')
+        if options['username'] and not options['password']:
+            raise CommandError('--username requires --password')
+        username, password = options['username'], options['password']
+        if not base_url:
+            self.check_database()
+        if not options['username']:
+            temporary_user, password = self.create_temporary_user()
+            username = temporary_user.username
+
+        try:
+            if not base_url:
+                server, base_url = self.start_server(options)
+            token = obtain_token(base_url, username, password)
+            trace = self.load_trace(options, base_url, token)
+
+            if options['warmup']:
+                self.stdout.write(f'Warming up with {options["warmup"]} requests...')
+                replay(base_url, token, trace[:options['warmup']], options['concurrency'])
+
+            self.stdout.write(
+                f'Replaying {len(trace)} requests with concurrency {options["concurrency"]} against {base_url}'
+            )
+            samples, wall_seconds = replay(base_url, token, trace, options['concurrency'])
+        finally:
+            if server:
+                server.terminate()
+                server.wait(timeout=10)
+            if temporary_user is not None:
+                temporary_user.delete()
+
+        summary = summarize(samples, wall_seconds)
+        results = {
+            'revision': _git_revision(),
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'server': 'external' if options['url'] else options['server'],
+            'workers': None if options['url'] else options['workers'],
+            'threads': None if options['url'] else options['threads'],
+            'concurrency': options['concurrency'],
+            'requests': len(trace),
+            'seed': options['seed'],
+            **summary,
+        }
+        self.print_summary(summary)
+
+        output = options['output'] or os.path.join(
+            RESULTS_DIR, f'{timezone.now():%Y%m%d-%H%M%S}-{results["revision"] or "local"}.json'
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as results_file:
+            json.dump(results, results_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'[OK] Results written to {output}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline_file:
+                self.print_comparison(compare(summary, json.load(baseline_file)), options['compare'])
+
+    def check_database(self):
+        database = os.path.abspath(str(settings.DATABASES['default']['NAME']))
+        if database == os.path.abspath(os.path.join(settings.BASE_DIR, 'db.sqlite3')):
+            raise CommandError(
+                'Refusing to benchmark the default database: set DATABASE_PATH to a benchmark '
+                'database (migrate + seed_scale), or target a running server with --url'
+            )
+
+    def create_temporary_user(self):
+        """A user that only exists for this run, with a password nobody knows."""
+        password = secrets.token_urlsafe(24)
+        user = User.objects.create_user(
+            username=f'{BENCHMARK_USERNAME_PREFIX}{secrets.token_hex(4)}', password=password
+        )
+        return user, password
+
+    def start_server(self, options):
+        port = _free_port()
+        if options['server'] in ('gunicorn', 'gunicorn-asgi'):
+            asgi = options['server'] == 'gunicorn-asgi'
+            command = [
+                sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                'config.asgi:application' if asgi else 'config.wsgi:application',
+                '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']),
+                '--threads', str(options['threads']),
+                '--access-logfile', os.devnull,
+                '--log-level', 'warning',
+            ]
+            if asgi:
+                command += ['--worker-class', 'uvicorn.workers.UvicornWorker']
+        else:
+            command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+
+        # The server inherits DATABASE_PATH, so it serves the same database this command sees
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=os.environ.copy())
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{options["server"]} exited with status {server.returncode}')
+            try:
+                session = HttpSession(base_url)
+                status, _ = session.request('GET', '/api/health/')
+                session.close()
+                if status == 200:
+                    self.stdout.write(f'[OK] {options["server"]} listening on {base_url}')
+                    return server, base_url
+            except OSError:
+                pass
+            time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'{options["server"]} did not answer /api/health/ within {SERVER_START_TIMEOUT}s')
+
+    def load_trace(self, options, base_url, token):
+        if options['trace']:
+            with open(options['trace'], encoding='utf-8') as trace_file:
+                return json.load(trace_file)
+
+        mix = load_mix(options['mix']) if options['mix'] else DEFAULT_MIX
+        session = HttpSession(base_url, token)
+        try:
+            fixtures = load_fixtures(session)
+        finally:
+            session.close()
+        try:
+            trace = build_trace(mix, fixtures, options['requests'], options['seed'])
+        except ValueError as e:
+            raise CommandError(f'{e}. Seed data first, e.g. manage.py seed_scale')
+
+        if options['save_trace']:
+            with open(options['save_trace'], 'w', encoding='utf-8') as trace_file:
+                json.dump(trace, trace_file)
+            self.stdout.write(f'[OK] Trace written to {options["save_trace"]}')
+        return trace
+
+    def print_summary(self, summary):
+        header = f'{"endpoint":60} {"count":>6} {"err":>4} {"req/s":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}'
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = list(summary['endpoints'].items()) + [('TOTAL', summary['total'])]
+        for endpoint, stats in rows:
+            line = (
+                f'{endpoint[:60]:60} {stats["count"]:>6} {stats["errors"]:>4} {stats["rps"]:>8} '
+                f'{stats["p50_ms"]:>8} {stats["p95_ms"]:>8} {stats["p99_ms"]:>8} {stats["max_ms"]:>8}'
+            )
+            self.stdout.write(self.style.ERROR(line) if stats['errors'] else line)
+        self.stdout.write(f'Latencies in ms, wall time {summary["wall_seconds"]}s')
+
+    def print_comparison(self, rows, baseline_path):
+        self.stdout.write(f'\nCompared with {baseline_path}:')
+        for endpoint, metric, previous, current, change in rows:
+            # Higher req/s is better, lower latency is better
+            better = change > 0 if metric == 'rps' else change < 0
+            line = f'  {endpoint[:60]:60} {metric:>7} {previous:>9} -> {current:>9} ({change:+.1f}%)'
+            if abs(change) < 5:
+                self.stdout.write(line)
+            else:
+                self.stdout.write(self.style.SUCCESS(line) if better else self.style.WARNING(line))
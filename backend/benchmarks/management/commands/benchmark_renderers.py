@@ -0,0 +1,83 @@
+"""
+JSON renderer benchmark.
+
+Builds real response payloads (the view's response.data, before
+rendering) and times DRF's JSONRenderer against config.renderers.
+FastJSONRenderer on each, checking that both produce the same bytes:
+
+    invoice_list    GET /api/invoices/ (one page)
+    cost_analytics  GET /api/subscriptions/analytics/costs/
+
+Usage (on a seeded dataset):
+    DATABASE_PATH=/tmp/bench.sqlite3 python manage.py benchmark_renderers --repeat 200
+"""
+
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from config.renderers import FastJSONRenderer, ORJSON_AVAILABLE
+
+# Constants
+RENDERERS = {
+    'JSONRenderer': JSONRenderer(),
+    'FastJSONRenderer': FastJSONRenderer(),
+}
+
+
+def _payloads():
+    from invoices.views import InvoiceViewSet
+    from subscriptions.views import CostAnalyticsView
+
+    user = User.objects.filter(is_active=True).first()
+    if user is None:
+        raise CommandError('No user in the database, run seed_admin or seed_scale first')
+    factory = APIRequestFactory()
+    views = {
+        'invoice_list': (InvoiceViewSet.as_view({'get': 'list'}), '/api/invoices/'),
+        'cost_analytics': (CostAnalyticsView.as_view(), '/api/subscriptions/analytics/costs/'),
+    }
+    payloads = {}
+    for name, (view, path) in views.items():
+        request = factory.get(path, HTTP_HOST='localhost')
+        force_authenticate(request, user=user)
+        response = view(request)
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        payloads[name] = response.data
+    return payloads
+
+
+class Command(BaseCommand):
+    help = 'Compare JSONRenderer and FastJSONRenderer render times on real payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=100, help='Renders per payload and renderer (default 100)')
+
+    def handle(self, *args, **options):
+        if not ORJSON_AVAILABLE:
+            self.stdout.write(self.style.WARNING('[WARN] orjson not installed, FastJSONRenderer is JSONRenderer'))
+
+        for name, data in _payloads().items():
+            outputs = {label: renderer.render(data) for label, renderer in RENDERERS.items()}
+            if len(set(outputs.values())) != 1:
+                self.stdout.write(self.style.WARNING(f'[WARN] {name}: renderers disagree on the output'))
+
+            timings = {}
+            for label, renderer in RENDERERS.items():
+                samples = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    renderer.render(data)
+                    samples.append(time.perf_counter() - start)
+                timings[label] = statistics.median(samples) * 1000
+
+            size_kb = len(outputs['JSONRenderer']) / 1024
+            self.stdout.write(f'\n{name} ({size_kb:.1f} KB)')
+            for label, median_ms in timings.items():
+                self.stdout.write(f'  {label:18} {median_ms:8.3f} ms median')
+            speedup = timings['JSONRenderer'] / timings['FastJSONRenderer']
+            self.stdout.write(self.style.SUCCESS(f'  [OK] {speedup:.1f}x faster'))
@@ -0,0 +1,115 @@
+"""
+Worker startup benchmark.
+
+Boots the application in fresh interpreters the way a gunicorn worker does
+(config.wsgi plus the URLconf) and reports boot time, resident memory and
+whether the PDF stack was loaded, then the first invoice render time and
+RSS afterwards. Each mode is run --repeat times and the median is shown:
+
+    lazy    PDF stack loaded on first render (default)
+    warmup  PDF_WARMUP=true, stack loaded and warmed at boot
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Constants
+MODES = {
+    'lazy': {'PDF_WARMUP': 'False'},
+    'warmup': {'PDF_WARMUP': 'True'},
+}
+
+CHILD_SCRIPT = '''
+import json, sys, time
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * __import__('os').sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+start = time.perf_counter()
+from config.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+boot_seconds = time.perf_counter() - start
+boot_rss = rss_bytes()
+pdf_loaded_at_boot = 'reportlab' in sys.modules
+
+from invoices.management.commands.benchmark_pdf import synthetic_invoice
+from invoices.pdf_generator import generate_invoice_pdf
+start = time.perf_counter()
+generate_invoice_pdf(synthetic_invoice(0, 2))
+first_render_seconds = time.perf_counter() - start
+
+print(json.dumps({
+    'boot_seconds': boot_seconds,
+    'boot_rss': boot_rss,
+    'pdf_loaded_at_boot': pdf_loaded_at_boot,
+    'first_render_seconds': first_render_seconds,
+    'render_rss': rss_bytes(),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure worker boot time and RSS with lazy vs warmed-up PDF stack'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per mode (default 5)')
+        parser.add_argument('--mode', choices=list(MODES), action='append',
+                            help='Mode to run (repeatable, default all)')
+        parser.add_argument('--output', help='Write the medians as JSON to this file')
+
+    def measure(self, mode):
+        env = {**os.environ, **MODES[mode], 'DJANGO_SETTINGS_MODULE': 'config.settings'}
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise CommandError(f'{mode} run failed:\n{result.stderr}')
+        # Last line only: the PDF generator may print template warnings first
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        modes = options['mode'] or list(MODES)
+        results = {}
+        for mode in modes:
+            runs = [self.measure(mode) for _ in range(options['repeat'])]
+            results[mode] = {
+                key: statistics.median(run[key] for run in runs)
+                for key in ['boot_seconds', 'boot_rss', 'first_render_seconds', 'render_rss']
+            }
+            results[mode]['pdf_loaded_at_boot'] = runs[0]['pdf_loaded_at_boot']
+
+        self.stdout.write(
+            f'\n  {"mode":8} {"boot ms":>9} {"boot RSS":>10} {"PDF at boot":>12} '
+            f'{"1st render ms":>14} {"RSS after":>10}'
+        )
+        for mode, stats in results.items():
+            self.stdout.write(
+                f'  {mode:8} {stats["boot_seconds"] * 1000:9.0f} {stats["boot_rss"] / 2 ** 20:8.1f}MB '
+                f'{"yes" if stats["pdf_loaded_at_boot"] else "no":>12} '
+                f'{stats["first_render_seconds"] * 1000:14.0f} {stats["render_rss"] / 2 ** 20:8.1f}MB'
+            )
+        self.stdout.write(f'  Medians of {options["repeat"]} fresh interpreters per mode')
+
+        if 'lazy' in results and 'warmup' in results:
+            saved_ms = (results['warmup']['boot_seconds'] - results['lazy']['boot_seconds']) * 1000
+            saved_mb = (results['warmup']['boot_rss'] - results['lazy']['boot_rss']) / 2 ** 20
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] Lazy loading saves {saved_ms:.0f} ms and {saved_mb:.1f} MB per worker at boot'
+            ))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f'[OK] Results written to {options["output"]}')
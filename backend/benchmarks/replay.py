@@ -0,0 +1,182 @@
+"""
+Replay a request trace against a running server and summarise latencies.
+
+Each worker thread owns one keep-alive HTTP connection (like a browser tab
+or the Next.js server) and pulls requests from a shared queue, so the
+concurrency setting is the number of requests in flight at any time.
+Only the standard library is used, so the benchmark runs wherever the
+backend does.
+"""
+
+import gzip
+import http.client
+import json
+import math
+import queue
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+# Constants
+PERCENTILES = [50, 90, 95, 99]
+REQUEST_TIMEOUT = 120  # Same as the gunicorn worker timeout
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class HttpSession:
+    """One persistent connection to the server under test."""
+
+    def __init__(self, base_url, token=None):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+        self.prefix = parts.path.rstrip('/')
+        self.token = token
+        self.last_wire_bytes = 0
+
+    def request(self, method, path, params=None, json_body=None):
+        """
+        Returns (status, decoded body bytes); the compressed size is kept in
+        last_wire_bytes. Reconnects once if the server closed the connection.
+        """
+        url = self.prefix + path
+        if params:
+            url += '?' + urlencode(params)
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+        payload = None
+        if json_body is not None:
+            payload = json.dumps(json_body)
+            headers['Content-Type'] = 'application/json'
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+
+        for attempt in range(2):
+            try:
+                self.connection.request(method, url, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                body = response.read()
+                self.last_wire_bytes = len(body)
+                if response.getheader('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                return response.status, body
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Gunicorn recycles workers (max-requests) and drops idle keep-alive connections
+                self.connection.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        self.connection.close()
+
+
+def obtain_token(base_url, username, password):
+    session = HttpSession(base_url)
+    try:
+        status, body = session.request(
+            'POST', '/api/auth/login/', json_body={'username': username, 'password': password}
+        )
+    finally:
+        session.close()
+    if status != 200:
+        raise RuntimeError(f'Login as {username} failed with status {status}')
+    return json.loads(body)['access']
+
+
+def replay(base_url, token, trace, concurrency):
+    """
+    Send every request of the trace with `concurrency` workers.
+
+    Returns:
+        tuple: (samples, wall_seconds); samples are
+        (endpoint, status, seconds, bytes on the wire), status 0 for transport errors
+    """
+    pending = queue.Queue()
+    for item in trace:
+        pending.put(item)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker():
+        session = HttpSession(base_url, token)
+        local = []
+        try:
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    break
+                start = time.perf_counter()
+                try:
+                    status, _ = session.request(item['method'], item['path'], item['params'], item['json'])
+                    size = session.last_wire_bytes
+                except (OSError, http.client.HTTPException):
+                    status, size = 0, 0
+                local.append((item['endpoint'], status, time.perf_counter() - start, size))
+        finally:
+            session.close()
+            with samples_lock:
+                samples.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def _stats(latencies, errors, wall_seconds, sizes):
+    stats = {
+        'count': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / wall_seconds, 2) if wall_seconds else None,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+        'mean_bytes': int(sum(sizes) / len(sizes)),
+    }
+    for pct in PERCENTILES:
+        stats[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 2)
+    return stats
+
+
+def summarize(samples, wall_seconds):
+    """Overall and per-endpoint req/s and latency percentiles."""
+    by_endpoint = {}
+    for endpoint, status, seconds, size in samples:
+        by_endpoint.setdefault(endpoint, []).append((status, seconds, size))
+
+    def block(rows):
+        return _stats(
+            [seconds for _, seconds, _ in rows],
+            sum(1 for status, _, _ in rows if status == 0 or status >= 400),
+            wall_seconds,
+            [size for _, _, size in rows],
+        )
+
+    return {
+        'wall_seconds': round(wall_seconds, 3),
+        'total': block([(status, seconds, size) for _, status, seconds, size in samples]),
+        'endpoints': {endpoint: block(rows) for endpoint, rows in sorted(by_endpoint.items())},
+    }
+
+
+def compare(current, baseline):
+    """Rows of (endpoint, metric, baseline, current, change %) for p50/p99 and req/s."""
+    rows = []
+    endpoints = [('total', current['total'], baseline.get('total'))] + [
+        (endpoint, stats, baseline.get('endpoints', {}).get(endpoint))
+        for endpoint, stats in current['endpoints'].items()
+    ]
+    for endpoint, stats, previous in endpoints:
+        if not previous:
+            continue
+        for metric in ['rps', 'p50_ms', 'p99_ms']:
+            if previous.get(metric) and stats.get(metric) is not None:
+                change = (stats[metric] - previous[metric]) / previous[metric] * 100
+                rows.append((endpoint, metric, previous[metric], stats[metric], round(change, 1)))
+    return rows
@@ -0,0 +1,164 @@
+"""
+Request mixes for the HTTP load-replay benchmark.
+
+A mix is a list of weighted scenarios, each a short sequence of requests a
+user action triggers (the dashboard issues two calls, a generation burst
+posts many logs back to back). build_trace() draws scenarios from the mix
+with a seeded RNG and fills {placeholders} with real ids, producing a flat
+request trace that can be saved, committed next to results and replayed
+identically against another build.
+"""
+
+import json
+import random
+import re
+
+# Constants
+PLACEHOLDER_RE = re.compile(r'\{(\w+)\}')
+
+DEFAULT_MIX = [
+    {
+        'name': 'dashboard',
+        'weight': 10,
+        'requests': [
+            {'method': 'GET', 'path': '/api/analytics/overview/'},
+            {'method': 'GET', 'path': '/api/projects/deadlines/', 'params': {'days': 14}},
+        ],
+    },
+    {
+        'name': 'analytics_page',
+        'weight': 3,
+        'requests': [
+            {'method': 'GET', 'path': '/api/analytics/revenue/', 'params': {'months': 12}},
+            {'method': 'GET', 'path': '/api/analytics/clients/', 'params': {'months': 12}},
+            {'method': 'GET', 'path': '/api/analytics/services/'},
+            {'method': 'GET', 'path': '/api/analytics/payments/'},
+        ],
+    },
+    {
+        'name': 'client_list',
+        'weight': 6,
+        'requests': [{'method': 'GET', 'path': '/api/clients/'}],
+    },
+    {
+        'name': 'client_detail',
+        'weight': 4,
+        'requests': [
+            {'method': 'GET', 'path': '/api/clients/{client_id}/'},
+            {'method': 'GET', 'path': '/api/clients/{client_id}/history/'},
+        ],
+    },
+    {
+        'name': 'invoice_list',
+        'weight': 8,
+        'requests': [{'method': 'GET', 'path': '/api/invoices/'}],
+    },
+    {
+        'name': 'invoice_detail',
+        'weight': 6,
+        'requests': [{'method': 'GET', 'path': '/api/invoices/{invoice_id}/'}],
+    },
+    {
+        'name': 'invoice_pdf',
+        'weight': 1,
+        'requests': [{'method': 'GET', 'path': '/api/invoices/{invoice_id}/pdf/'}],
+    },
+    {
+        'name': 'cost_analytics',
+        'weight': 3,
+        'requests': [
+            {'method': 'GET', 'path': '/api/subscriptions/analytics/costs/'},
+            {'method': 'GET', 'path': '/api/subscriptions/analytics/monthly/'},
+        ],
+    },
+    {
+        'name': 'log_generation_burst',
+        'weight': 2,
+        'repeat': 20,
+        'requests': [
+            {
+                'method': 'POST',
+                'path': '/api/subscriptions/usage/log_generation/',
+                'json': {
+                    'tool_id': '{tool_id}',
+                    'client_id': '{client_id}',
+                    'generation_type': 'image',
+                    'items_generated': 1,
+                    'credits_used': 10,
+                    'description': 'benchmark',
+                },
+            },
+        ],
+    },
+]
+
+
+def load_mix(path):
+    with open(path, encoding='utf-8') as mix_file:
+        return json.load(mix_file)
+
+
+def load_fixtures(session):
+    """
+    Collect the ids placeholders are filled from, through the API itself so
+    the same trace works against a local or remote server.
+    """
+    def ids(path, key='id'):
+        status, body = session.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f'GET {path} returned {status}')
+        data = json.loads(body)
+        rows = data['results'] if isinstance(data, dict) and 'results' in data else data
+        return [str(row[key]) for row in rows]
+
+    return {
+        'client_id': ids('/api/clients/'),
+        'project_id': ids('/api/projects/'),
+        'invoice_id': ids('/api/invoices/'),
+        # Only tools with a subscription this month accept log_generation
+        'tool_id': ids('/api/subscriptions/subscriptions/current_month/', key='tool'),
+    }
+
+
+def _fill(value, chosen):
+    if isinstance(value, str):
+        return PLACEHOLDER_RE.sub(lambda match: chosen[match.group(1)], value)
+    if isinstance(value, dict):
+        return {key: _fill(item, chosen) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, chosen) for item in value]
+    return value
+
+
+def build_trace(mix, fixtures, count, seed=42):
+    """
+    Expand a mix into `count` concrete requests.
+
+    Each request keeps its path template as `endpoint`, which is what
+    results are grouped by. Scenarios whose placeholders have no fixture
+    (e.g. no invoices yet) are left out.
+    """
+    rng = random.Random(seed)
+    usable = [
+        scenario for scenario in mix
+        if all(fixtures.get(name) for name in PLACEHOLDER_RE.findall(json.dumps(scenario['requests'])))
+    ]
+    if not usable:
+        raise ValueError('No scenario in the mix can be filled from the available data')
+    weights = [scenario['weight'] for scenario in usable]
+
+    trace = []
+    while len(trace) < count:
+        scenario = rng.choices(usable, weights)[0]
+        for _ in range(scenario.get('repeat', 1)):
+            chosen = {name: rng.choice(values) for name, values in fixtures.items() if values}
+            for template in scenario['requests']:
+                trace.append({
+                    'scenario': scenario['name'],
+                    'endpoint': f'{template["method"]} {template["path"]}',
+                    'method': template['method'],
+                    'path': _fill(template['path'], chosen),
+                    'params': template.get('params', {}),
+                    'json': _fill(template.get('json'), chosen),
+                })
+    return trace[:count]
@@ -0,0 +1,343 @@
+"""
+Bulk import of a client book (and optionally one project per row) from CSV or XLSX.
+
+The file is read row by row and handled in batches of IMPORT_BATCH_SIZE:
+
+1. Field validation with the rules of ClientSerializer / ProjectSerializer.
+   The serializer fields are built once per import and each row runs
+   through field.run_validation(), instead of one serializer instance per
+   row, which would rebuild every field 50,000 times.
+2. Deduplication against an in-memory index of existing clients, built
+   with one query: a row whose email (case-insensitive) or ICE number is
+   already known, in the database or earlier in the file, is attached to
+   that client instead of creating another one. A file can therefore list
+   several projects for the same client, one per row. Projects are
+   matched the same way on (client, title), so re-importing a file adds
+   nothing.
+3. bulk_create of the new clients, then their projects.
+
+Everything runs in one transaction; rows that fail validation are
+reported and skipped, they do not roll back the others. Line numbers in
+the report are spreadsheet lines (the header is line 1).
+
+Columns (header names are case-insensitive, French aliases accepted):
+    name, email, phone, company, ice_number, address_line1, address_line2,
+    city, notes, project_title, project_service_type, project_deadline,
+    project_description, project_status
+"""
+
+import codecs
+import csv
+from datetime import date, datetime, time
+from django.db import transaction
+from rest_framework import serializers
+
+from projects.models import Project
+from projects.serializers import ProjectSerializer
+from search import index as search_index
+from .models import Client
+from .serializers import ClientSerializer
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# Constants
+IMPORT_BATCH_SIZE = 2000  # Rows validated and inserted together
+BULK_CREATE_BATCH_SIZE = 500  # Rows per INSERT statement
+MAX_REPORTED_ERRORS = 1000  # Further errors are only counted
+FIRST_DATA_LINE = 2
+CLIENT_COLUMNS = [
+    'name', 'email', 'phone', 'company', 'ice_number',
+    'address_line1', 'address_line2', 'city', 'notes',
+]
+PROJECT_COLUMNS = {
+    'project_title': 'title',
+    'project_description': 'description',
+    'project_service_type': 'service_type',
+    'project_status': 'status',
+    'project_deadline': 'deadline',
+}
+COLUMN_ALIASES = {
+    'nom': 'name',
+    'client': 'name',
+    'e-mail': 'email',
+    'mail': 'email',
+    'telephone': 'phone',
+    'téléphone': 'phone',
+    'tel': 'phone',
+    'société': 'company',
+    'societe': 'company',
+    'entreprise': 'company',
+    'ice': 'ice_number',
+    'adresse': 'address_line1',
+    'ville': 'city',
+    'projet': 'project_title',
+    'service': 'project_service_type',
+    'deadline': 'project_deadline',
+    'date_limite': 'project_deadline',
+}
+DATE_INPUT_FORMATS = ['%Y-%m-%d', '%d/%m/%Y']
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be read (format, encoding, missing columns)."""
+
+
+def normalize_header(name):
+    key = str(name or '').strip().lower().replace(' ', '_')
+    return COLUMN_ALIASES.get(key, key)
+
+
+def read_rows(uploaded, filename):
+    """
+    Yield (line number, {column: value}) from a CSV or XLSX file object,
+    one row at a time.
+    """
+    if filename.lower().endswith('.xlsx'):
+        yield from _read_xlsx(uploaded)
+    elif filename.lower().endswith('.csv'):
+        yield from _read_csv(uploaded)
+    else:
+        raise ImportFileError('Unsupported file type, expected .csv or .xlsx')
+
+
+def _read_csv(uploaded):
+    sample = uploaded.read(4096)
+    uploaded.seek(0)
+    try:
+        # Spreadsheets exported with a French locale use ';'
+        dialect = csv.Sniffer().sniff(sample.decode('utf-8-sig', errors='ignore'), delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        # Binary files iterate line by line; decoding is lazy too
+        reader = csv.reader(codecs.iterdecode(uploaded, 'utf-8-sig'), dialect)
+        header = [normalize_header(name) for name in next(reader, [])]
+        _check_header(header)
+        for line, values in enumerate(reader, start=FIRST_DATA_LINE):
+            if any(value.strip() for value in values):
+                yield line, dict(zip(header, values))
+    except UnicodeDecodeError:
+        raise ImportFileError('CSV files must be UTF-8 encoded')
+    except csv.Error as e:
+        raise ImportFileError(f'Invalid CSV: {e}')
+
+
+def _read_xlsx(uploaded):
+    if not OPENPYXL_AVAILABLE:
+        raise ImportFileError('XLSX import needs openpyxl (pip install openpyxl), or upload a CSV')
+    try:
+        # read_only streams the sheet instead of loading every cell
+        workbook = openpyxl.load_workbook(uploaded, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f'Invalid XLSX file: {e}')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [normalize_header(name) for name in next(rows, ())]
+        _check_header(header)
+        for line, values in enumerate(rows, start=FIRST_DATA_LINE):
+            if any(value not in (None, '') for value in values):
+                yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def _check_header(header):
+    missing = [column for column in ('name', 'email') if column not in header]
+    if missing:
+        raise ImportFileError(f'Missing column(s): {", ".join(missing)}')
+
+
+def _cell_text(value):
+    """Spreadsheet cells may be numbers (phone, ICE) or dates; fields expect text."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def _deadline(value):
+    """Accept datetimes, dates and date-only text; a bare date means the end of that day."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time(23, 59))
+    text = _cell_text(value)
+    for input_format in DATE_INPUT_FORMATS:
+        try:
+            return datetime.combine(datetime.strptime(text, input_format).date(), time(23, 59))
+        except ValueError:
+            continue
+    return text or serializers.empty
+
+
+class RowValidator:
+    """
+    Runs a serializer's field rules on a batch of plain dicts, column by
+    column: each distinct value of a column is validated once per batch
+    (cities, service types and deadlines repeat on most rows).
+    """
+
+    _skip = object()
+
+    def __init__(self, serializer_class, names):
+        fields = serializer_class().fields
+        self.fields = {name: fields[name] for name in names}
+
+    def _run(self, field, value):
+        if value == '' and field.allow_null:
+            value = None
+        elif value == '' and not getattr(field, 'allow_blank', False):
+            value = serializers.empty
+        try:
+            return field.run_validation(value), None
+        except serializers.ValidationError as e:
+            return None, e.detail
+        except serializers.SkipField:
+            return self._skip, None
+
+    def validate_batch(self, rows):
+        """Returns [(validated data, errors)] in the order of `rows`."""
+        results = [({}, {}) for _ in rows]
+        for name, field in self.fields.items():
+            outcomes = {}
+            for row, (data, errors) in zip(rows, results):
+                value = row.get(name, serializers.empty)
+                if value not in outcomes:
+                    outcomes[value] = self._run(field, value)
+                result, error = outcomes[value]
+                if error is not None:
+                    errors[name] = error
+                elif result is not self._skip:
+                    data[name] = result
+        return results
+
+
+class ClientImporter:
+    """
+    Validate, dedupe and insert rows from read_rows().
+
+    Usage:
+        report = ClientImporter(dry_run=False).run(read_rows(file, name))
+    """
+
+    def __init__(self, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.client_validator = RowValidator(ClientSerializer, CLIENT_COLUMNS)
+        self.project_validator = RowValidator(ProjectSerializer, list(PROJECT_COLUMNS.values()))
+        self.report = {
+            'rows': 0, 'clients_created': 0, 'clients_matched': 0,
+            'projects_created': 0, 'projects_matched': 0, 'failed': 0, 'errors': [],
+        }
+        self.seen_projects = set()
+
+    def run(self, rows):
+        # One query: email/ICE -> client id for every existing client
+        self.by_email, self.by_ice = {}, {}
+        for pk, email, ice_number in Client.objects.values_list('pk', 'email', 'ice_number').iterator():
+            self._remember(pk, email, ice_number)
+
+        with transaction.atomic():
+            batch = []
+            for line, values in rows:
+                batch.append((line, values))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            self.import_batch(batch)
+            if self.dry_run:
+                transaction.set_rollback(True)
+        return self.report
+
+    def _remember(self, pk, email, ice_number):
+        if email:
+            self.by_email.setdefault(email.strip().lower(), pk)
+        if ice_number:
+            self.by_ice.setdefault(ice_number.strip(), pk)
+
+    def _error(self, line, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line, 'errors': errors})
+
+    def import_batch(self, batch):
+        if not batch:
+            return
+        new_clients = []
+        new_projects = []  # (client object or id, validated project data)
+        client_results = self.client_validator.validate_batch([
+            {name: _cell_text(values.get(name)) for name in CLIENT_COLUMNS} for _, values in batch
+        ])
+        project_rows, deadlines = {}, {}
+        for position, (_, values) in enumerate(batch):
+            if _cell_text(values.get('project_title')):
+                raw = {field: _cell_text(values.get(column)) for column, field in PROJECT_COLUMNS.items()}
+                deadline = values.get('project_deadline')
+                if deadline not in deadlines:
+                    deadlines[deadline] = _deadline(deadline)
+                raw['deadline'] = deadlines[deadline]
+                project_rows[position] = raw
+        project_results = dict(zip(
+            project_rows, self.project_validator.validate_batch(list(project_rows.values()))
+        ))
+
+        for position, (line, values) in enumerate(batch):
+            self.report['rows'] += 1
+            client_data, errors = client_results[position]
+            project_data = None
+            if position in project_results:
+                project_data, project_errors = project_results[position]
+                errors.update({f'project_{name}': detail for name, detail in project_errors.items()})
+            if errors:
+                self._error(line, errors)
+                continue
+
+            email = client_data['email'].lower()
+            ice_number = (client_data.get('ice_number') or '').strip()
+            existing = self.by_email.get(email) or (self.by_ice.get(ice_number) if ice_number else None)
+            if existing is None:
+                client = Client(**client_data)
+                new_clients.append(client)
+                self._remember(client, email, ice_number)
+                self.report['clients_created'] += 1
+                owner = client
+            else:
+                # An earlier row of this file or a client already in the database
+                owner = existing
+                if not isinstance(existing, Client):
+                    self.report['clients_matched'] += 1
+            if project_data is not None:
+                new_projects.append((owner, project_data))
+
+        Client.objects.bulk_create(new_clients, batch_size=BULK_CREATE_BATCH_SIZE)
+        # Matched database clients are held as ids; load them in one query for the search index
+        existing_ids = {owner for owner, _ in new_projects if not isinstance(owner, Client)}
+        existing = Client.objects.in_bulk(existing_ids) if existing_ids else {}
+        # Same title for the same client is the same project: re-running an import adds nothing
+        known_projects = {
+            (client_id, title.lower())
+            for client_id, title in Project.objects.filter(client_id__in=existing_ids).values_list('client_id', 'title')
+        } if existing_ids else set()
+        projects = []
+        for owner, data in new_projects:
+            client = owner if isinstance(owner, Client) else existing[owner]
+            key = (client.pk, data['title'].lower())
+            if key in known_projects or key in self.seen_projects:
+                self.report['projects_matched'] += 1
+                continue
+            self.seen_projects.add(key)
+            projects.append(Project(client=client, **data))
+        Project.objects.bulk_create(projects, batch_size=BULK_CREATE_BATCH_SIZE)
+        self.report['projects_created'] += len(projects)
+
+        if not self.dry_run:
+            # bulk_create sends no post_save
+            search_index.index_instances('client', new_clients)
+            search_index.index_instances('project', projects)
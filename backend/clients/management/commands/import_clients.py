@@ -0,0 +1,57 @@
+"""
+Import a client book from CSV/XLSX, same pipeline as POST /api/clients/import/.
+
+    manage.py import_clients agence.xlsx --dry-run
+"""
+
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from clients.imports import ClientImporter, ImportFileError, read_rows, MAX_REPORTED_ERRORS
+
+# Constants
+SHOWN_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Bulk import clients (and one project per row) from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='.csv or .xlsx file with a header row')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without saving')
+        parser.add_argument('--report', help=f'Write the full report (up to {MAX_REPORTED_ERRORS} errors) as JSON')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} not found')
+
+        started = time.perf_counter()
+        try:
+            with open(path, 'rb') as uploaded:
+                report = ClientImporter(dry_run=options['dry_run']).run(read_rows(uploaded, path))
+        except ImportFileError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors'][:SHOWN_ERRORS]:
+            details = '; '.join(f'{field}: {" ".join(map(str, messages))}'
+                                for field, messages in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f'[WARN] Line {error["line"]}: {details}'))
+        if report['failed'] > SHOWN_ERRORS:
+            self.stdout.write(self.style.WARNING(f'[WARN] ... {report["failed"] - SHOWN_ERRORS} more rows failed'))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, indent=2, ensure_ascii=False, default=str)
+
+        prefix = '[DRY RUN]' if options['dry_run'] else '[OK]'
+        summary = (
+            f'{prefix} {report["rows"]} rows in {elapsed:.1f}s: {report["clients_created"]} clients created, '
+            f'{report["clients_matched"]} matched existing, {report["projects_created"]} projects created, '
+            f'{report["projects_matched"]} already there, '
+            f'{report["failed"]} failed'
+        )
+        self.stdout.write(self.style.WARNING(summary) if options['dry_run'] else self.style.SUCCESS(summary))
@@ -0,0 +1,375 @@
+"""
+Generate a large, reproducible synthetic dataset for load testing.
+
+Unlike seed_data, every row is built in memory and written with chunked
+bulk_create inside one transaction, so 10^5-10^6 rows take minutes instead
+of hours. Primary keys and all random choices come from a seeded RNG and
+dates are relative to --anchor, so the same arguments always produce the
+same rows.
+
+Skew knobs:
+    --heavy-client-ratio / --heavy-client-factor  a few clients own most projects
+    --long-history-ratio / --long-history-payments  invoices paid in many instalments
+
+Generated clients use the @seed-scale.test email domain; --clear removes
+them (and everything that cascades from them) before seeding.
+"""
+
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from clients.models import Client
+from projects.models import Project
+from invoices.models import Invoice, InvoiceItem, Payment
+from subscriptions.models import AITool, Subscription, CreditUsage
+from search import index as search_index
+from subscriptions.rollups import rebuild_cost_rollup
+
+# Constants
+EMAIL_DOMAIN = 'seed-scale.test'
+DEFAULT_CHUNK_SIZE = 5000  # Buffered rows before a flush
+CENTS = Decimal('0.01')
+
+CITIES = ['Casablanca', 'Rabat', 'Marrakech', 'Tanger', 'Fès', 'Agadir']
+PROJECT_TITLES = [
+    'Brand Video Campaign', 'Product Image Set', 'Social Media Content Pack',
+    'Corporate Presentation', 'Advertisement Videos', 'Website Hero Images',
+]
+PAYMENT_METHODS = ['bank_transfer', 'bank_transfer', 'cash', 'paypal', 'stripe']
+GENERATION_TYPES = {'image': 'image', 'video': 'video', 'audio': 'audio', 'both': 'image'}
+
+# Models written by the seeder, in foreign key order
+SEEDED_MODELS = [Client, Project, Invoice, InvoiceItem, Payment, CreditUsage]
+
+
+@contextmanager
+def historical_timestamps(models):
+    """Let bulk_create keep the generated created_at/payment_date values."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False) or getattr(field, 'auto_now', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible synthetic dataset with bulk_create (load testing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000, help='Number of clients (default 1000)')
+        parser.add_argument('--projects-per-client', type=int, default=3, help='Average projects per client')
+        parser.add_argument('--items-per-invoice', type=int, default=3, help='Average invoice items')
+        parser.add_argument('--usages-per-project', type=int, default=10, help='Average credit usages per project')
+        parser.add_argument('--months', type=int, default=12, help='History length in months (default 12)')
+        parser.add_argument('--heavy-client-ratio', type=float, default=0.05,
+                            help='Share of clients with many more projects (default 0.05)')
+        parser.add_argument('--heavy-client-factor', type=int, default=20,
+                            help='Project multiplier for heavy clients (default 20)')
+        parser.add_argument('--long-history-ratio', type=float, default=0.1,
+                            help='Share of invoices paid in many instalments (default 0.1)')
+        parser.add_argument('--long-history-payments', type=int, default=24,
+                            help='Instalments for long-history invoices (default 24)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default 42)')
+        parser.add_argument('--anchor', help='Reference date YYYY-MM-DD (default today)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Rows per bulk_create flush (default {DEFAULT_CHUNK_SIZE})')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated clients first')
+        parser.add_argument('--dry-run', action='store_true', help='Show the expected row counts only')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+
+        if options['anchor']:
+            try:
+                anchor = datetime.strptime(options['anchor'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--anchor must be YYYY-MM-DD')
+            self.anchor = timezone.make_aware(anchor.replace(hour=18))
+        else:
+            self.anchor = timezone.now().replace(hour=18, minute=0, second=0, microsecond=0)
+        self.start = self.anchor - timedelta(days=30 * options['months'])
+
+        self.print_estimate()
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[DRY RUN] No rows written'))
+            return
+
+        if options['clear']:
+            deleted, _ = Client.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+            self.stdout.write(f'[OK] Cleared {deleted} previously generated rows')
+        elif Client.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').exists():
+            raise CommandError('Generated data already exists, re-run with --clear')
+
+        self.subscriptions = self.ensure_subscriptions()
+        self.buffers = {model: [] for model in SEEDED_MODELS}
+        self.counts = {model: 0 for model in SEEDED_MODELS}
+        self.invoice_number = 0
+        self.started_at = time.perf_counter()
+
+        with transaction.atomic(), historical_timestamps(SEEDED_MODELS):
+            for index in range(options['clients']):
+                self.generate_client(index)
+                if sum(len(rows) for rows in self.buffers.values()) >= options['chunk_size']:
+                    self.flush()
+            self.flush()
+            self.update_credits_remaining()
+
+        rollups = rebuild_cost_rollup()
+        # bulk_create sends no post_save, so index everything in one pass
+        indexed = search_index.rebuild()
+        elapsed = time.perf_counter() - self.started_at
+        total = sum(self.counts.values())
+        for model, count in self.counts.items():
+            self.stdout.write(f'  {model._meta.verbose_name_plural}: {count}')
+        self.stdout.write(f'  cost rollup rows: {rollups}')
+        self.stdout.write(f'  search documents: {sum(indexed.values())}')
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Generated {total} rows in {elapsed:.1f}s ({total / max(elapsed, 0.001):.0f} rows/s)'
+        ))
+
+    def print_estimate(self):
+        options = self.options
+        heavy = options['heavy_client_ratio']
+        projects = options['clients'] * options['projects_per_client'] * (
+            (1 - heavy) + heavy * options['heavy_client_factor']
+        )
+        long_history = options['long_history_ratio']
+        payments = projects * ((1 - long_history) * 1.2 + long_history * options['long_history_payments'])
+        estimate = {
+            'clients': options['clients'],
+            'projects': projects,
+            'invoices': projects,
+            'invoice items': projects * options['items_per_invoice'],
+            'payments': payments,
+            'credit usages': projects * options['usages_per_project'],
+        }
+        self.stdout.write(f'Expected rows (seed {options["seed"]}, anchor {self.anchor.date()}):')
+        for label, count in estimate.items():
+            self.stdout.write(f'  {label}: ~{int(count)}')
+        self.stdout.write(f'  total: ~{int(sum(estimate.values()))}')
+
+    def ensure_subscriptions(self):
+        """One subscription per active tool and billing month in the window, reusing existing ones."""
+        if not AITool.objects.filter(is_active=True).exists():
+            call_command('seed_tools', stdout=self.stdout)
+        tools = list(AITool.objects.filter(is_active=True))
+
+        months = []
+        month = self.start.date().replace(day=1)
+        while month <= self.anchor.date():
+            months.append(month)
+            month = (month + timedelta(days=32)).replace(day=1)
+
+        Subscription.objects.bulk_create(
+            [
+                Subscription(
+                    tool=tool, billing_month=month,
+                    total_cost_mad=tool.default_monthly_cost_mad or Decimal('100'),
+                    total_credits=tool.default_credits_per_month or None,
+                    credits_remaining=tool.default_credits_per_month or None,
+                )
+                for tool in tools for month in months
+            ],
+            ignore_conflicts=True
+        )
+        subscriptions = {}
+        for sub in Subscription.objects.filter(billing_month__in=months).select_related('tool'):
+            subscriptions.setdefault(sub.billing_month, []).append(sub)
+        return subscriptions
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def moment(self, start, end):
+        """Random datetime between start and end."""
+        span = max((end - start).total_seconds(), 0)
+        return start + timedelta(seconds=self.rng.uniform(0, span))
+
+    def spread(self, average):
+        """Random count with the given average."""
+        return self.rng.randint(0, 2 * average) if average > 0 else 0
+
+    def generate_client(self, index):
+        rng = self.rng
+        options = self.options
+        created_at = self.moment(self.start, self.anchor)
+        client = Client(
+            id=self.uuid(),
+            name=f'Client {index:07d}',
+            email=f'client{index}@{EMAIL_DOMAIN}',
+            phone=f'06{rng.randint(10000000, 99999999)}',
+            company=f'Société {index}' if rng.random() < 0.7 else None,
+            city=rng.choice(CITIES),
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        self.buffers[Client].append(client)
+
+        projects = max(1, self.spread(options['projects_per_client']))
+        if rng.random() < options['heavy_client_ratio']:
+            projects *= options['heavy_client_factor']
+        for _ in range(projects):
+            self.generate_project(client)
+
+    def generate_project(self, client):
+        rng = self.rng
+        created_at = self.moment(client.created_at, self.anchor)
+        deadline = created_at + timedelta(days=rng.randint(7, 45))
+        service_type = rng.choice(['image', 'image', 'video', 'audio', 'both'])
+        completed_at = None
+        if deadline < self.anchor:
+            status = 'cancelled' if rng.random() < 0.05 else 'completed'
+            if status == 'completed':
+                completed_at = deadline - timedelta(days=rng.randint(0, 5))
+        else:
+            status = rng.choice(['pending', 'in_progress', 'review'])
+
+        project = Project(
+            id=self.uuid(),
+            client=client,
+            title=rng.choice(PROJECT_TITLES),
+            service_type=service_type,
+            status=status,
+            deadline=deadline,
+            completed_at=completed_at,
+            created_at=created_at,
+            updated_at=completed_at or created_at,
+        )
+        self.buffers[Project].append(project)
+
+        self.generate_invoice(project)
+        for _ in range(self.spread(self.options['usages_per_project'])):
+            self.generate_usage(project)
+
+    def generate_invoice(self, project):
+        rng = self.rng
+        options = self.options
+        self.invoice_number += 1
+        issued_at = min(project.created_at + timedelta(days=rng.randint(0, 10)), self.anchor)
+        due_date = (issued_at + timedelta(days=30)).date()
+
+        invoice = Invoice(
+            id=self.uuid(),
+            invoice_number=f'LT{options["seed"]}-{self.invoice_number:07d}',
+            project=project,
+            client=project.client,
+            due_date=due_date,
+            issued_date=issued_at.date(),
+        )
+        total = Decimal('0')
+        for position in range(max(1, self.spread(options['items_per_invoice']))):
+            quantity = rng.randint(1, 10)
+            unit_price = Decimal(rng.randint(50, 1500))
+            total += quantity * unit_price
+            self.buffers[InvoiceItem].append(InvoiceItem(
+                id=self.uuid(),
+                invoice=invoice,
+                title=f'{project.title} - lot {position + 1}',
+                quantity=quantity,
+                unit_price=unit_price,
+                total_price=quantity * unit_price,
+            ))
+        invoice.total_amount = total
+
+        # Older invoices are more likely to be settled
+        age_days = (self.anchor - issued_at).days
+        roll = rng.random()
+        if roll < min(0.9, age_days / 60):
+            paid = total
+        elif roll < 0.85:
+            paid = (total * Decimal(rng.uniform(0.2, 0.8))).quantize(CENTS)
+        else:
+            paid = Decimal('0')
+
+        if paid > 0:
+            instalments = 1 if paid < total else rng.randint(1, 2)
+            if rng.random() < options['long_history_ratio']:
+                instalments = options['long_history_payments']
+            self.generate_payments(invoice, paid, instalments, issued_at)
+
+        invoice.amount_paid = paid
+        if paid >= total:
+            invoice.payment_status = 'paid'
+        elif paid > 0:
+            invoice.payment_status = 'partial'
+        elif due_date < self.anchor.date():
+            invoice.payment_status = 'overdue'
+        else:
+            invoice.payment_status = 'unpaid'
+        self.buffers[Invoice].append(invoice)
+
+    def generate_payments(self, invoice, paid, instalments, issued_at):
+        share = (paid / instalments).quantize(CENTS)
+        dates = sorted(self.moment(issued_at, self.anchor) for _ in range(instalments))
+        for position, payment_date in enumerate(dates):
+            # Last instalment absorbs the rounding
+            amount = paid - share * (instalments - 1) if position == instalments - 1 else share
+            self.buffers[Payment].append(Payment(
+                id=self.uuid(),
+                invoice=invoice,
+                amount=amount,
+                payment_method=self.rng.choice(PAYMENT_METHODS),
+                payment_date=payment_date,
+            ))
+
+    def generate_usage(self, project):
+        rng = self.rng
+        usage_date = self.moment(project.created_at, min(project.deadline, self.anchor))
+        subscriptions = self.subscriptions.get(usage_date.date().replace(day=1))
+        if not subscriptions:
+            return
+        subscription = rng.choice(subscriptions)
+        generation_type = GENERATION_TYPES.get(subscription.tool.tool_type, 'other')
+        items = rng.randint(1, 8)
+
+        usage = CreditUsage(
+            id=self.uuid(),
+            subscription=subscription,
+            client=project.client,
+            project=project,
+            generation_type=generation_type,
+            credits_used=items * rng.randint(5, 40),
+            items_generated=items,
+            video_seconds=items * rng.randint(5, 15) if generation_type == 'video' else 0,
+            usage_date=usage_date,
+            created_at=usage_date,
+        )
+        usage.calculated_cost_mad = Decimal(usage.calculate_cost()).quantize(CENTS)
+        self.buffers[CreditUsage].append(usage)
+
+    def flush(self):
+        for model, rows in self.buffers.items():
+            if rows:
+                model.objects.bulk_create(rows, batch_size=self.options['chunk_size'])
+                self.counts[model] += len(rows)
+                rows.clear()
+        total = sum(self.counts.values())
+        elapsed = time.perf_counter() - self.started_at
+        self.stdout.write(f'  {total} rows written ({elapsed:.1f}s)')
+
+    def update_credits_remaining(self):
+        """One UPDATE per subscription instead of one per usage as in CreditUsage.save."""
+        used = dict(
+            CreditUsage.objects.values_list('subscription_id').annotate(total=Sum('credits_used')).order_by()
+        )
+        subscriptions = [sub for subs in self.subscriptions.values() for sub in subs if sub.total_credits]
+        for sub in subscriptions:
+            sub.credits_remaining = max(0, sub.total_credits - used.get(sub.pk, 0))
+        Subscription.objects.bulk_update(subscriptions, ['credits_remaining'], batch_size=500)
@@ -34,6 +34,13 @@ class Client(models.Model):
     def __str__(self):
         return f"{self.name} ({self.company})" if self.company else self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the name so a save can tell whether documents carrying it are stale
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
     @property
     def total_projects(self):
         return self.projects.count()
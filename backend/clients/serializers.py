@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from django.db.models import Sum, Count
 from .models import Client
+from config.sparse_fields import SparseFieldsSerializerMixin
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Full serializer for client detail view with computed fields."""
     total_projects = serializers.SerializerMethodField()
     total_invoiced = serializers.SerializerMethodField()
@@ -20,6 +21,9 @@ class ClientSerializer(serializers.ModelSerializer):
             'total_projects', 'total_invoiced', 'total_paid', 'outstanding_balance'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # Aggregates are computed per client; they read no client columns
+        expandable_fields = ['total_projects', 'total_invoiced', 'total_paid', 'outstanding_balance']
+        field_dependencies = {name: [] for name in expandable_fields}
 
     def _get_aggregated_data(self, obj):
         """Get or compute aggregated invoice data (cached per instance)."""
@@ -61,7 +65,7 @@ class ClientSerializer(serializers.ModelSerializer):
         return data['total_invoiced'] - data['total_paid']
 
 
-class ClientListSerializer(serializers.ModelSerializer):
+class ClientListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Lighter serializer for list views with annotated fields."""
     total_projects = serializers.SerializerMethodField()
     outstanding_balance = serializers.SerializerMethodField()
@@ -72,6 +76,11 @@ class ClientListSerializer(serializers.ModelSerializer):
             'id', 'name', 'email', 'company', 'ice_number', 'city',
             'is_active', 'total_projects', 'outstanding_balance'
         ]
+        expandable_fields = ['total_projects', 'outstanding_balance']
+        field_dependencies = {
+            'total_projects': ['_total_projects'],
+            'outstanding_balance': ['_total_invoiced', '_total_paid'],
+        }
 
     def get_total_projects(self, obj):
         """Use annotated field if available, else fallback to property."""
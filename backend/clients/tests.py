@@ -1,3 +1,103 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from clients.models import Client
+from invoices.models import Payment
+from subscriptions.models import CreditUsage
+from config.query_budget import seed_budget_dataset
+
+
+class ClientImportTests(APITestCase):
+    """CSV import validates per row, dedupes on email/ICE and is idempotent."""
+
+    CSV = (
+        'Nom;Email;Téléphone;ICE;Projet;Service;Date_limite\n'
+        'Atlas Média;contact@atlas.ma;0600000001;001234567000089;Campagne Ramadan;video;15/03/2026\n'
+        'Atlas Média;CONTACT@atlas.ma;0600000001;;Catalogue été;image;2026-06-01\n'
+        'Existing Co;budget0@example.ma;0600000002;;;;\n'
+        'Broken;not-an-email;;;Logo;sculpture;\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.user = User.objects.create_user(username='import', password='import')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def upload(self, **data):
+        upload = SimpleUploadedFile('clients.csv', self.CSV.encode(), content_type='text/csv')
+        return self.client.post('/api/clients/import/', {'file': upload, **data}, format='multipart')
+
+    def test_import_report_and_idempotency(self):
+        clients_before = Client.objects.count()
+        response = self.upload(dry_run='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Client.objects.count(), clients_before)
+
+        response = self.upload()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['clients_created'], 1)
+        self.assertEqual(response.data['clients_matched'], 1)
+        self.assertEqual(response.data['projects_created'], 2)
+        self.assertEqual(response.data['errors'][0]['line'], 5)
+        self.assertEqual(
+            set(response.data['errors'][0]['errors']), {'email', 'phone', 'project_service_type', 'project_deadline'}
+        )
+        atlas = Client.objects.get(email='contact@atlas.ma')
+        self.assertEqual(atlas.projects.count(), 2)
+
+        response = self.upload()
+        self.assertEqual((response.data['clients_created'], response.data['projects_created']), (0, 0))
+        self.assertEqual(response.data['projects_matched'], 2)
+
+    def test_unreadable_file(self):
+        upload = SimpleUploadedFile('clients.txt', b'x', content_type='text/plain')
+        response = self.client.post('/api/clients/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+
+
+class SeedScaleTests(TestCase):
+    """seed_scale writes the same rows for the same arguments and --clear replaces them."""
+
+    args = ['--clients', '4', '--projects-per-client', '2', '--usages-per-project', '3', '--months', '3',
+            '--anchor', '2026-03-15', '--seed', '7']
+
+    def seed(self, *extra):
+        out = StringIO()
+        call_command('seed_scale', *self.args, *extra, stdout=out)
+        return out.getvalue()
+
+    def dataset(self):
+        domain = '@seed-scale.test'
+        return (
+            list(Client.objects.filter(email__endswith=domain).order_by('pk').values_list(
+                'pk', 'name', 'created_at')),
+            list(Payment.objects.filter(invoice__client__email__endswith=domain).order_by('pk').values_list(
+                'pk', 'amount', 'payment_date')),
+            list(CreditUsage.objects.filter(client__email__endswith=domain).order_by('pk').values_list(
+                'pk', 'credits_used', 'calculated_cost_mad', 'usage_date')),
+        )
+
+    def test_reproducible_and_clear(self):
+        self.assertIn('[OK] Generated', self.seed())
+        first = self.dataset()
+        self.assertEqual(len(first[0]), 4)
+        self.assertTrue(first[1] and first[2])
+
+        with self.assertRaisesMessage(CommandError, 're-run with --clear'):
+            self.seed()
+
+        output = self.seed('--clear')
+        self.assertIn('[OK] Cleared', output)
+        self.assertEqual(self.dataset(), first)
+
+        call_command('seed_scale', *self.args[:-1], '8', '--clear', stdout=StringIO())
+        self.assertNotEqual(self.dataset()[0], first[0])
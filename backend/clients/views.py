@@ -1,18 +1,23 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Sum, Count
 from .models import Client
 from .serializers import ClientSerializer, ClientListSerializer
+from .imports import ClientImporter, ImportFileError, read_rows
+from config.sparse_fields import SparseFieldsViewMixin
+from search.filters import FullTextSearchFilter
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_active']
     search_fields = ['name', 'email', 'company']
+    search_index_entity = 'client'
     ordering_fields = ['name', 'created_at', 'updated_at']
     ordering = ['-created_at']
 
@@ -20,12 +25,14 @@ class ClientViewSet(viewsets.ModelViewSet):
         """Optimize queryset with annotations for list view."""
         queryset = super().get_queryset()
         if self.action == 'list':
-            # Add aggregated fields to avoid N+1 queries
-            queryset = queryset.annotate(
-                _total_projects=Count('projects'),
-                _total_invoiced=Sum('invoices__total_amount'),
-                _total_paid=Sum('invoices__amount_paid'),
-            )
+            # Add aggregated fields to avoid N+1 queries, unless left out with ?fields=/?expand=
+            if self.wants_field('total_projects'):
+                queryset = queryset.annotate(_total_projects=Count('projects'))
+            if self.wants_field('outstanding_balance'):
+                queryset = queryset.annotate(
+                    _total_invoiced=Sum('invoices__total_amount'),
+                    _total_paid=Sum('invoices__amount_paid'),
+                )
         return queryset
 
     def get_serializer_class(self):
@@ -66,6 +73,34 @@ class ClientViewSet(viewsets.ModelViewSet):
             }
         })
 
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """
+        Bulk import clients (and one project per row) from a CSV or XLSX upload.
+
+        Form fields:
+            file: .csv or .xlsx with a header row (see clients/imports.py)
+            dry_run: "true" to validate and report without saving
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.data.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+        try:
+            report = ClientImporter(dry_run=dry_run).run(read_rows(upload, upload.name))
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = report['clients_created'] or report['projects_created']
+        report['dry_run'] = dry_run
+        return Response(
+            report,
+            status=status.HTTP_201_CREATED if created and not dry_run
+            else status.HTTP_200_OK if created or not report['failed']
+            else status.HTTP_400_BAD_REQUEST
+        )
+
     def perform_destroy(self, instance):
         """Soft delete - set is_active to False."""
         instance.is_active = False
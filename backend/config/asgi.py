@@ -3,6 +3,9 @@ ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served by gunicorn with uvicorn workers:
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py config.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -11,6 +14,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from config.metrics import serve_metrics
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+# Serve the analytics endpoints with their async views (ANALYTICS_ASYNC_VIEWS)
+os.environ.setdefault("ANALYTICS_ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
+serve_metrics()
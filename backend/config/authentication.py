@@ -0,0 +1,134 @@
+"""
+JWT authentication without a User query per request.
+
+simplejwt's JWTAuthentication loads the User row on every API call; the
+dashboard fires a dozen parallel requests per page, each paying that
+query on the single-writer database. CachedJWTAuthentication keeps the
+resolved user per token (jti claim) in CACHES['auth'], a cache shared by
+every worker (files or Redis, see config/settings.py):
+
+    auth:jwt:<jti>    (user auth version, USER_FIELDS values)   until min(exp, JWT_USER_CACHE_SECONDS)
+    auth:user:<id>    user auth version                         bumped on every User save/delete
+
+Only the USER_FIELDS values are cached, never the password hash. A cached
+user is rebuilt with the other fields deferred: reading one (last_login...)
+loads it, and save() only writes the loaded fields.
+
+Both keys are read with one get_many(); an entry whose version differs
+from the user's is a miss, so deactivating a user or changing a password
+(both saves) takes effect on the next request, in every worker. A missing
+version key (never set, or evicted) is a miss too: it is recreated with a
+random starting value, so entries cached under the evicted version never
+match again. Changes made with QuerySet.update() send no signal and wait
+for the entry to expire.
+
+StatelessJWTAuthentication goes further for GET/HEAD/OPTIONS, on the
+views that opt in with authentication_classes = STATELESS_READ_AUTHENTICATION
+(the analytics and catalog views): the user is built from the token claims
+(simplejwt's TokenUser, id only) with no cache or database access at all.
+It only suits read endpoints that need no more than request.user.id; a
+deactivated user keeps read access there until the access token expires
+(ACCESS_TOKEN_LIFETIME). Writes always get the real, cached User.
+"""
+
+import secrets
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from rest_framework.authentication import SessionAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from config.metrics import record_cache_lookup
+
+# Constants
+AUTH_CACHE = 'auth'  # CACHES alias shared by every worker
+TOKEN_KEY = 'auth:jwt:{jti}'
+USER_VERSION_KEY = 'auth:user:{user_id}'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+VERSION_BITS = 48  # Random starting version of a (re)created auth:user key
+# User fields kept in the cache, enough for permission checks and display
+USER_FIELDS = {'id', 'username', 'first_name', 'last_name', 'email', 'is_active', 'is_staff', 'is_superuser'}
+
+
+def _new_version():
+    return secrets.randbits(VERSION_BITS)
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached token of this user."""
+    cache = caches[AUTH_CACHE]
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def _user_changed(sender, instance, **kwargs):
+    bump_user_version(instance.pk)
+
+
+# Cached values are stored in model field order, as Model.from_db() expects them
+CACHED_USER_FIELDS = [
+    field.attname for field in get_user_model()._meta.concrete_fields if field.attname in USER_FIELDS
+]
+
+post_save.connect(_user_changed, sender=get_user_model(), dispatch_uid='jwt_user_cache_save')
+post_delete.connect(_user_changed, sender=get_user_model(), dispatch_uid='jwt_user_cache_delete')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with the resolved user cached per token."""
+
+    def get_user(self, validated_token):
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        timeout = min(
+            settings.JWT_USER_CACHE_SECONDS,
+            int(validated_token.get('exp', 0) - timezone.now().timestamp()),
+        )
+        if not jti or user_id is None or timeout <= 0:
+            return super().get_user(validated_token)
+
+        cache = caches[AUTH_CACHE]
+        token_key = TOKEN_KEY.format(jti=jti)
+        version_key = USER_VERSION_KEY.format(user_id=user_id)
+        cached = cache.get_many([token_key, version_key])
+        version = cached.get(version_key)
+        if version is None:
+            # Never set or evicted: no cached entry can be trusted
+            cache.add(version_key, _new_version(), None)
+            version = cache.get(version_key)
+        entry = cached.get(token_key)
+        hit = version is not None and entry is not None and entry[0] == version
+        record_cache_lookup('jwt_user', hit)
+        if hit:
+            return get_user_model().from_db(DEFAULT_DB_ALIAS, CACHED_USER_FIELDS, entry[1])
+
+        user = super().get_user(validated_token)  # raises for unknown or inactive users
+        if version is not None:
+            cache.set(token_key, (version, tuple(getattr(user, field) for field in CACHED_USER_FIELDS)), timeout)
+        return user
+
+
+class StatelessJWTAuthentication(CachedJWTAuthentication):
+    """CachedJWTAuthentication with a token-claims user on read requests."""
+
+    stateless = JWTStatelessUserAuthentication()
+
+    def authenticate(self, request):
+        self.request_method = request.method
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if getattr(self, 'request_method', None) in READ_METHODS:
+            return self.stateless.get_user(validated_token)
+        return super().get_user(validated_token)
+
+
+# authentication_classes of the read endpoints that only need request.user.id
+STATELESS_READ_AUTHENTICATION = [StatelessJWTAuthentication, SessionAuthentication]
@@ -0,0 +1,171 @@
+"""
+Cache of rendered, precompressed response bodies for cacheable GET views.
+
+GZipMiddleware compresses every response on every request, including
+payloads that are byte-identical for minutes (analytics) or hours (tool
+and pricing catalogs). For views decorated with @compressed_cache the
+JSON is rendered and compressed once per encoding, stored in the default
+cache, and later requests are answered with the stored bytes: no query,
+no serialization, no compression. GZipMiddleware leaves responses that
+already carry Content-Encoding alone.
+
+Encodings are gzip, plus br and zstd when the brotli / zstandard packages
+are installed; the best one the client accepts is served, with
+`Vary: Accept-Encoding`.
+
+Entries are keyed by name, path, query string and the optional `key`
+component. The default cache is local memory, private to each worker, so
+a version bumped on a write would only reach the process that made it.
+Views whose data changes on writes pass a `key` built from the data
+instead, such as table_version() of the model they render: every process
+sees the new stamp on its next request. The others expire after `timeout`.
+
+Only JSON responses with status 200 are stored; the browsable API and
+errors go through the normal path.
+"""
+
+import functools
+import gzip
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from config.metrics import record_cache_lookup
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Constants
+KEY_PREFIX = 'compressed'
+MIN_COMPRESS_BYTES = 200  # Same floor as GZipMiddleware
+GZIP_LEVEL = 9  # Compressed once per entry, so the best ratio is affordable
+BROTLI_QUALITY = 9
+ZSTD_LEVEL = 10
+
+
+def _compressors():
+    """encoding -> compress function, in order of preference."""
+    compressors = {}
+    if BROTLI_AVAILABLE:
+        compressors['br'] = lambda body: brotli.compress(body, quality=BROTLI_QUALITY)
+    if ZSTD_AVAILABLE:
+        compressors['zstd'] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+    compressors['gzip'] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+def accepted_encodings(header):
+    """Content codings of an Accept-Encoding header with a non-zero q value."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request, entry):
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding in COMPRESSORS:
+        if encoding in entry['bodies'] and (encoding in accepted or '*' in accepted):
+            return encoding
+    return None
+
+
+def table_version(model, field='updated_at'):
+    """
+    Stamp of a table's rows as stored in the database: row count and latest
+    `field`. It changes on every save() and delete(), whichever process made
+    them; queryset.update() calls that leave `field` alone go unseen.
+    """
+    stamp = model._default_manager.aggregate(count=Count('pk'), latest=Max(field))
+    latest = stamp['latest'].isoformat() if stamp['latest'] else ''
+    return f"{stamp['count']}:{latest}"
+
+
+def entry_key(name, request, extra=''):
+    location = f'{request.path}?{"&".join(sorted(request.META.get("QUERY_STRING", "").split("&")))}{extra}'
+    return f'{KEY_PREFIX}:{name}:{hashlib.sha1(location.encode()).hexdigest()}'
+
+
+def build_entry(body, content_type):
+    bodies = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        bodies.update((encoding, compress(body)) for encoding, compress in COMPRESSORS.items())
+    return {'content_type': content_type, 'bodies': bodies}
+
+
+def apply_encoding(response, request, entry):
+    """Set the body of `response` to the best stored encoding for `request`."""
+    encoding = choose_encoding(request, entry)
+    response.content = entry['bodies'][encoding or 'identity']
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(response.content))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def compressed_cache(name, timeout=None, key=None):
+    """
+    Decorator for a DRF view's GET handler (APIView.get, a viewset list or
+    @action).
+
+    Args:
+        name: cache name, used in keys and metrics
+        timeout: seconds, defaults to CACHE_TIMEOUT_ANALYTICS
+        key: optional callable(request) -> str, extra key component
+             (e.g. today's date for day-bound figures, table_version()
+             for data edited through the API or the admin)
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            # Content negotiation ran in initial(); only JSON is stored
+            if getattr(request.accepted_renderer, 'format', None) != 'json':
+                return handler(self, request, *args, **kwargs)
+
+            cache_key = entry_key(name, request, key(request) if key else '')
+            entry = cache.get(cache_key)
+            record_cache_lookup(name, entry is not None)
+            if entry is not None:
+                response = HttpResponse(content_type=entry['content_type'])
+                return apply_encoding(response, request, entry)
+
+            response = handler(self, request, *args, **kwargs)
+
+            def store(rendered):
+                if rendered.status_code != 200:
+                    return None
+                entry = build_entry(rendered.content, rendered['Content-Type'])
+                cache.set(cache_key, entry, timeout or getattr(settings, 'CACHE_TIMEOUT_ANALYTICS', 300))
+                apply_encoding(rendered, request, entry)
+                return None
+
+            if hasattr(response, 'add_post_render_callback'):
+                response.add_post_render_callback(store)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,152 @@
+"""
+Per-request query and timing instrumentation.
+
+RequestInstrumentationMiddleware records, for a sample of requests, the
+number of SQL queries, total SQL time, the slowest statements, view time
+and render time. It emits them as a Server-Timing header (visible in the
+browser dev tools network tab) and as structured log fields, and logs the
+captured SQL when a request exceeds SLOW_REQUEST_THRESHOLD_MS.
+
+When REQUEST_INSTRUMENTATION_ENABLED is off the middleware raises
+MiddlewareNotUsed, so Django drops it from the stack entirely.
+"""
+
+import heapq
+import logging
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_SLOW_REQUEST_THRESHOLD_MS = 500
+DEFAULT_SLOWEST_QUERIES = 5  # Statements listed in logs
+MAX_CAPTURED_QUERIES = 200  # Statements kept per request for the slow-request log
+
+
+class QueryRecorder:
+    """Database execute wrapper that counts and times every statement."""
+
+    def __init__(self, capture_limit=MAX_CAPTURED_QUERIES):
+        self.capture_limit = capture_limit
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total_seconds += duration
+            # SQL is kept with placeholders only, parameters may hold client data
+            if len(self.statements) < self.capture_limit:
+                self.statements.append((duration, sql))
+
+    def slowest(self, limit=DEFAULT_SLOWEST_QUERIES):
+        return heapq.nlargest(limit, self.statements, key=lambda statement: statement[0])
+
+    def record(self):
+        """Install on every configured database connection for the current thread."""
+        stack = ExitStack()
+        for connection in connections.all(initialized_only=False):
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestInstrumentationMiddleware:
+    """Server-Timing header and structured timing logs for sampled requests."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.slow_threshold_ms = getattr(
+            settings, 'SLOW_REQUEST_THRESHOLD_MS', DEFAULT_SLOW_REQUEST_THRESHOLD_MS
+        )
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        marks = {}
+        request._instrumentation_marks = marks
+
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        end = time.perf_counter()
+
+        timings = {
+            'total_ms': _ms(end - start),
+            'db_ms': _ms(recorder.total_seconds),
+            'db_queries': recorder.count,
+        }
+        if 'view_start' in marks:
+            timings['view_ms'] = _ms(marks.get('view_end', end) - marks['view_start'])
+        if 'view_end' in marks and 'render_end' in marks:
+            timings['render_ms'] = _ms(marks['render_end'] - marks['view_end'])
+
+        response['Server-Timing'] = self._server_timing(timings)
+        self._log(request, response, timings, recorder)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        marks = getattr(request, '_instrumentation_marks', None)
+        if marks is not None:
+            marks['view_start'] = time.perf_counter()
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns, so split view and render time
+        marks = getattr(request, '_instrumentation_marks', None)
+        if marks is not None:
+            marks['view_end'] = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: marks.__setitem__('render_end', time.perf_counter())
+            )
+        return response
+
+    def _server_timing(self, timings):
+        parts = [f'db;dur={timings["db_ms"]};desc="{timings["db_queries"]} queries"']
+        if 'view_ms' in timings:
+            parts.append(f'view;dur={timings["view_ms"]}')
+        if 'render_ms' in timings:
+            parts.append(f'render;dur={timings["render_ms"]}')
+        parts.append(f'total;dur={timings["total_ms"]}')
+        return ', '.join(parts)
+
+    def _log(self, request, response, timings, recorder):
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings,
+        }
+        summary = ' '.join(f'{key}={value}' for key, value in fields.items())
+
+        if timings['total_ms'] >= self.slow_threshold_ms:
+            slowest = recorder.slowest()
+            lines = [f'  {_ms(duration)}ms {sql}' for duration, sql in slowest]
+            logger.warning(
+                'slow_request %s\n%s', summary, '\n'.join(lines),
+                extra={
+                    **fields,
+                    'slowest_queries': [{'ms': _ms(duration), 'sql': sql} for duration, sql in slowest],
+                    'captured_sql': [sql for _, sql in recorder.statements],
+                }
+            )
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info('request %s', summary, extra=fields)
@@ -0,0 +1,478 @@
+"""
+Prometheus-compatible metrics shared across gunicorn workers.
+
+Each worker process keeps its counters and histograms in memory and a
+daemon thread writes them to the worker's own snapshot file in
+METRICS_DIR every METRICS_FLUSH_INTERVAL seconds when they changed (and
+at exit). /api/metrics/ merges every snapshot into one Prometheus text
+exposition, so a scrape sees totals for the whole server whichever
+worker answers it. Snapshots of workers that have exited
+(gunicorn recycles them after max-requests) are folded into archive.json
+so their counts are never lost.
+
+Exposed metrics:
+    http_requests_total{method,route,status}
+    http_request_duration_seconds{method,route}   histogram
+    db_queries_total{route} / db_query_seconds_total{route}
+    cache_requests_total{cache,result}             hit / miss
+    pdf_render_seconds{template}                   histogram
+    worker_recycles_total{reason}                  see gunicorn.conf.py
+    generation_spool_rejected_total                rows rejected at flush, subscriptions/spool.py
+    worker_info{pid,ppid} / process_*{pid}         live workers only
+
+process_resident_memory_bytes counts pages a worker shares with the
+gunicorn master; process_proportional_memory_bytes (PSS) splits shared
+pages between the processes using them, so its sum across workers is the
+real footprint and the gap to RSS shows how much preloading saves.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import contextmanager
+from django.conf import settings
+from django.http import HttpResponse
+
+from .instrumentation import QueryRecorder
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+# Constants
+DEFAULT_FLUSH_INTERVAL = 1  # Seconds between snapshot writes per worker
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNMATCHED_ROUTE = 'unmatched'
+
+METRICS = {
+    'http_requests_total': ('counter', 'HTTP requests by route and status code'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by route'),
+    'db_queries_total': ('counter', 'SQL queries issued by route'),
+    'db_query_seconds_total': ('counter', 'Time spent in SQL by route'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'pdf_render_seconds': ('histogram', 'Invoice PDF render time'),
+    'worker_recycles_total': ('counter', 'Workers restarted by the memory limit'),
+    'generation_spool_rejected_total': ('counter', 'Spooled generations rejected at flush time'),
+}
+
+PROCESS_MEMORY_GAUGES = [
+    ('process_max_resident_memory_bytes', 'max_rss_bytes', 'Worker peak resident memory'),
+    ('process_resident_memory_bytes', 'rss_bytes', 'Worker resident memory'),
+    ('process_proportional_memory_bytes', 'pss_bytes', 'Worker proportional set size (shared pages divided)'),
+    ('process_shared_memory_bytes', 'shared_bytes', 'Worker resident memory shared with other processes'),
+]
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class MetricsRegistry:
+    """In-process counters and histograms, snapshotted to METRICS_DIR."""
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f'worker-{self.pid}.json')
+
+    def inc(self, name, labels, value=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._dirty = True
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self._dirty = True
+
+    def flush_if_dirty(self):
+        if self._dirty:
+            self.flush()
+
+    def flush(self):
+        """Atomically replace this worker's snapshot file."""
+        with self._lock:
+            snapshot = {
+                'pid': self.pid,
+                'ppid': os.getppid(),
+                'started_at': self.started_at,
+                'max_rss_bytes': _max_rss_bytes(),
+                **{f'{key}_bytes': value for key, value in process_memory().items()},
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), data] for (name, labels), data in self.histograms.items()],
+            }
+            self._dirty = False
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temp_path, self.path)
+
+
+class MetricsFlusher(threading.Thread):
+    """Daemon thread that publishes the registry snapshot every `interval` seconds."""
+
+    def __init__(self, registry, interval):
+        super().__init__(name='metrics-flusher', daemon=True)
+        self.registry = registry
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.registry.flush_if_dirty()
+            except OSError:
+                # Snapshot is rewritten on the next round
+                pass
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _max_rss_bytes():
+    if not RESOURCE_AVAILABLE:
+        return None
+    # ru_maxrss is KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_memory():
+    """
+    Current memory of this process in bytes: {'rss', 'pss', 'shared'}.
+    PSS needs /proc/self/smaps_rollup (Linux 4.14+); values are None where
+    the platform does not report them.
+    """
+    memory = {'rss': None, 'pss': None, 'shared': None}
+    try:
+        with open('/proc/self/smaps_rollup', encoding='ascii') as rollup:
+            fields = {}
+            for line in rollup:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+        memory['rss'] = fields.get('Rss')
+        memory['pss'] = fields.get('Pss')
+        memory['shared'] = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+        return memory
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statm:
+            _, resident, shared = (int(value) for value in statm.read().split()[:3])
+        page_size = os.sysconf('SC_PAGE_SIZE')
+        memory['rss'] = resident * page_size
+        memory['shared'] = shared * page_size
+    except (OSError, ValueError):
+        memory['rss'] = _max_rss_bytes()
+    return memory
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    with open(os.path.join(directory, 'metrics.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            return json.load(snapshot_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _merge_into(totals, snapshot):
+    counters, histograms = totals
+    for name, labels, value in snapshot.get('counters', []):
+        key = (name, tuple(tuple(pair) for pair in labels))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, data in snapshot.get('histograms', []):
+        key = (name, tuple(tuple(pair) for pair in labels))
+        merged = histograms.get(key)
+        if merged is None:
+            histograms[key] = {'buckets': list(data['buckets']), 'sum': data['sum'], 'count': data['count']}
+        else:
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], data['buckets'])]
+            merged['sum'] += data['sum']
+            merged['count'] += data['count']
+
+
+def collect(directory):
+    """
+    Merge every worker snapshot. Dead workers are folded into archive.json.
+
+    Returns:
+        tuple: ((counters, histograms), live worker snapshots)
+    """
+    archive_path = os.path.join(directory, 'archive.json')
+    with _directory_lock(directory):
+        archive = _read(archive_path) or {}
+        totals = ({}, {})
+        _merge_into(totals, archive)
+
+        live = []
+        dead_totals = ({}, {})
+        _merge_into(dead_totals, archive)
+        dead_paths = []
+        for path in glob.glob(os.path.join(directory, 'worker-*.json')):
+            snapshot = _read(path)
+            if snapshot is None:
+                continue
+            _merge_into(totals, snapshot)
+            if _pid_alive(snapshot['pid']):
+                live.append(snapshot)
+            else:
+                _merge_into(dead_totals, snapshot)
+                dead_paths.append(path)
+
+        if dead_paths:
+            counters, histograms = dead_totals
+            temp_path = f'{archive_path}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as archive_file:
+                json.dump({
+                    'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                    'histograms': [[name, list(labels), data] for (name, labels), data in histograms.items()],
+                }, archive_file)
+            os.replace(temp_path, archive_path)
+            for path in dead_paths:
+                os.remove(path)
+    return totals, live
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render(totals, live):
+    """Prometheus text exposition format 0.0.4."""
+    counters, histograms = totals
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        if metric_type == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {value}')
+            continue
+        for (metric, labels), data in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, data['buckets']):
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {data["count"]}')
+            lines.append(f'{name}_sum{_labels(labels)} {data["sum"]}')
+            lines.append(f'{name}_count{_labels(labels)} {data["count"]}')
+
+    lines.append('# HELP worker_info Live worker processes (gunicorn workers share a ppid)')
+    lines.append('# TYPE worker_info gauge')
+    for worker in live:
+        lines.append(f'worker_info{_labels([("pid", worker["pid"]), ("ppid", worker["ppid"])])} 1')
+    lines.append('# HELP process_start_time_seconds Worker start time since the epoch')
+    lines.append('# TYPE process_start_time_seconds gauge')
+    for worker in live:
+        lines.append(f'process_start_time_seconds{_labels([("pid", worker["pid"])])} {worker["started_at"]}')
+    for name, key, help_text in PROCESS_MEMORY_GAUGES:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for worker in live:
+            if worker.get(key) is not None:
+                lines.append(f'{name}{_labels([("pid", worker["pid"])])} {worker[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+_registry = None
+_registry_lock = threading.Lock()
+_serving = False
+
+
+def serve_metrics():
+    """
+    Mark this process as an application server (config/wsgi.py, config/asgi.py).
+    Only servers record metrics: tests and management commands never write
+    worker snapshots to METRICS_DIR.
+    """
+    global _serving
+    _serving = True
+
+
+def metrics_enabled():
+    return _serving and getattr(settings, 'METRICS_ENABLED', False)
+
+
+def get_registry():
+    """
+    Registry of the current process, created with its flusher thread on
+    first use and recreated after a fork (gunicorn --preload).
+    """
+    global _registry
+    registry = _registry
+    if registry is not None and registry.pid == os.getpid():
+        return registry
+    with _registry_lock:
+        if _registry is None or _registry.pid != os.getpid():
+            interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+            _registry = MetricsRegistry(settings.METRICS_DIR)
+            _registry.flush()
+            MetricsFlusher(_registry, interval).start()
+            atexit.register(_registry.flush)
+        return _registry
+
+
+def inc(name, labels, value=1):
+    if metrics_enabled():
+        get_registry().inc(name, labels, value)
+
+
+def observe(name, labels, value):
+    if metrics_enabled():
+        get_registry().observe(name, labels, value)
+
+
+def record_cache_lookup(cache_name, hit):
+    inc('cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+class MetricsMiddleware:
+    """
+    Count, time and query-count every request by route (URL name).
+
+    Async-capable so the ASGI deployment does not push every request
+    through a thread; there, queries run on other threads and are not
+    counted, only requests and durations.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder(capture_limit=0)
+        start = time.perf_counter()
+        with recorder.record():
+            response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, recorder)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - start, None)
+        return response
+
+    def _record(self, request, response, duration, recorder):
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name if match else None) or UNMATCHED_ROUTE
+        registry = get_registry()
+        registry.inc('http_requests_total', {
+            'method': request.method, 'route': route, 'status': response.status_code,
+        })
+        registry.observe('http_request_duration_seconds', {'method': request.method, 'route': route}, duration)
+        if recorder is not None and recorder.count:
+            registry.inc('db_queries_total', {'route': route}, recorder.count)
+            registry.inc('db_query_seconds_total', {'route': route}, recorder.total_seconds)
+
+
+def _request_user(request):
+    """Session or JWT user of a plain Django view, None when anonymous or invalid."""
+    from rest_framework.exceptions import APIException
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        # Not the cached/stateless authenticator: scrapes are rare and need is_staff
+        result = JWTAuthentication().authenticate(request)
+    except APIException:
+        return None
+    return result[0] if result else None
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>`
+    when a token is set, otherwise an authenticated staff user (session or JWT).
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    else:
+        user = _request_user(request)
+        if user is None:
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+        if not user.is_staff:
+            return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    if not metrics_enabled():
+        return HttpResponse('Metrics disabled\n', status=404, content_type='text/plain')
+
+    # Publish this worker's latest numbers before merging
+    get_registry().flush()
+    totals, live = collect(str(settings.METRICS_DIR))
+    return HttpResponse(render(totals, live), content_type='text/plain; version=0.0.4; charset=utf-8')
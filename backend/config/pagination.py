@@ -0,0 +1,130 @@
+"""
+Opt-in keyset (cursor) pagination for large list endpoints.
+
+Without a `cursor` query parameter responses keep the default
+PageNumberPagination format. With `?cursor=` (empty for the first page)
+the list is ordered by the view's first `ordering` field plus the primary
+key as tie-breaker and each page is fetched with
+
+    WHERE field <= :v AND (field < :v OR id < :id) ORDER BY field DESC, id DESC LIMIT n + 1
+
+which a composite (field, id) index answers in O(page) at any depth: no
+OFFSET and no COUNT(*) unless `?count=1` is passed. ?ordering= is ignored
+in cursor mode since the cursor is only valid for the key it was built on.
+
+Cursor responses: {"next": url, "previous": url, "results": [...]} plus
+"count" when requested.
+"""
+
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        # The browsable API's numbered page controls have nothing to show
+        self.display_page_controls = False
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        ordering = view.ordering[0] if view is not None and getattr(view, 'ordering', None) else '-pk'
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        field = queryset.model._meta.get_field(self.field_name)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        position = self.decode_cursor(request, field)
+        reverse = bool(position and position['r'])
+        # Previous pages are read walking backwards from the cursor, then flipped
+        walk_descending = self.descending != reverse
+        direction = '-' if walk_descending else ''
+        queryset = queryset.order_by(f'{direction}{self.field_name}', f'{direction}pk')
+        if position:
+            lookup = 'lt' if walk_descending else 'gt'
+            value, pk = position['v'], position['id']
+            queryset = queryset.filter(
+                Q(**{f'{self.field_name}__{lookup}e': value})
+                & (Q(**{f'{self.field_name}__{lookup}': value}) | Q(**{f'pk__{lookup}': pk}))
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = None
+        self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = (rows[-1], False)
+            if position and (has_more or not reverse):
+                self.previous_position = (rows[0], True)
+        return rows
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position['v'] = field.to_python(position['v'])
+            position['r'] = bool(position.get('r'))
+            position['id'] = str(position['id'])
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        row, reverse = position
+        value = getattr(row, self.field_name)
+        payload = {
+            'v': value.isoformat() if hasattr(value, 'isoformat') else value,
+            'id': str(row.pk),
+            'r': int(reverse),
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        return self.encode_cursor(self.next_position)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return self.encode_cursor(self.previous_position)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_html_context(self):
+        if not self.keyset:
+            return super().get_html_context()
+        return {'previous_url': self.get_previous_link(), 'next_url': self.get_next_link()}
@@ -0,0 +1,237 @@
+"""
+Per-endpoint query and latency budget harness.
+
+discover_endpoints() walks the URLconf and yields every DRF GET endpoint
+(router-registered viewset routes, their extra actions and the analytics
+APIViews). QueryBudgetTestMixin measures each one at two dataset sizes and
+fails when an endpoint exceeds its declared query count (or, with
+check_latency, its p95 latency), printing a diff of the SQL issued at the small and the scaled dataset so
+N+1 patterns show up as repeated statements.
+
+Budgets are declared in ENDPOINT_BUDGETS (config/tests.py) keyed by URL
+name; a newly registered endpoint without a budget fails the suite.
+Query counts are deterministic and always checked. Latency depends on the
+machine, so p95 budgets are opt-in (QUERY_BUDGET_LATENCY=True, see
+config/tests.py) and left out of the default test run.
+"""
+
+import difflib
+import math
+import re
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.views import APIView
+
+# Constants
+DEFAULT_RUNS = 5  # Requests per endpoint used for the p95 latency
+IN_LIST_RE = re.compile(r'\(%s(?:, %s)+\)')
+
+
+def discover_endpoints(urlconf=None):
+    """
+    Yield (name, route, view_class) for every DRF endpoint that answers GET.
+    Format-suffix duplicates and the router API roots are skipped.
+    """
+    def walk(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, prefix + str(pattern.pattern))
+                continue
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is None or not issubclass(view_class, APIView):
+                continue
+            if pattern.name == 'api-root' or 'format' in pattern.pattern.regex.groupindex:
+                continue
+            actions = getattr(pattern.callback, 'actions', None)
+            methods = actions.keys() if actions else [
+                method for method in view_class.http_method_names if hasattr(view_class, method)
+            ]
+            if 'get' in methods:
+                yield pattern.name, prefix + str(pattern.pattern), view_class
+
+    seen = set()
+    for name, route, view_class in walk(get_resolver(urlconf).url_patterns, ''):
+        if name not in seen:
+            seen.add(name)
+            yield name, route, view_class
+
+
+def normalize_sql(sql):
+    """Collapse variable-length IN lists so statements compare across dataset sizes."""
+    return IN_LIST_RE.sub('(%s, ...)', sql)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def seed_budget_dataset(scale, prefix='budget'):
+    """
+    Create `scale` clients with projects, invoices (items + payments),
+    subscriptions and credit usages, using bulk_create throughout.
+    Calling it again with another prefix adds more rows on top.
+    """
+    from clients.models import Client
+    from projects.models import Project
+    from invoices.models import Invoice, InvoiceItem, Payment
+    from services.models import Service, ServicePricing
+    from subscriptions.models import AITool, Subscription, CreditUsage, ClientServiceSelection
+    from subscriptions.rollups import rebuild_cost_rollup
+    from search.index import rebuild as rebuild_search_index
+
+    now = timezone.now()
+    month = now.date().replace(day=1)
+
+    tools = [
+        AITool.objects.get_or_create(
+            name=f'{prefix}_tool_{t}',
+            defaults={'display_name': f'{prefix} tool {t}', 'tool_type': 'image', 'default_cost_per_image_mad': 2}
+        )[0]
+        for t in range(max(1, scale // 5))
+    ]
+    subscriptions = [
+        Subscription.objects.get_or_create(
+            tool=tool, billing_month=month,
+            defaults={'total_cost_mad': Decimal('300'), 'total_credits': 3000}
+        )[0]
+        for tool in tools
+    ]
+    Service.objects.get_or_create(
+        name='Budget Service',
+        defaults={'service_type': 'image', 'ai_tool': 'freepik', 'base_price': Decimal('100')}
+    )
+    ServicePricing.objects.get_or_create(
+        ai_tool='budget_tool', defaults={'display_name': 'Budget Tool', 'service_type': 'image'}
+    )
+
+    clients = Client.objects.bulk_create([
+        Client(name=f'{prefix} client {i}', email=f'{prefix}{i}@example.ma', phone='0600000000')
+        for i in range(scale)
+    ])
+    projects = Project.objects.bulk_create([
+        Project(
+            client=client, title=f'{prefix} project {i}-{j}', service_type='image',
+            deadline=now + timedelta(days=j + 1)
+        )
+        for i, client in enumerate(clients) for j in range(2)
+    ])
+    invoices = Invoice.objects.bulk_create([
+        Invoice(
+            invoice_number=f'{prefix.upper()}-{i}', project=project, client=project.client,
+            total_amount=Decimal('1000'), amount_paid=Decimal('400'), payment_status='partial',
+            due_date=now.date() - timedelta(days=i % 3)
+        )
+        for i, project in enumerate(projects)
+    ])
+    InvoiceItem.objects.bulk_create([
+        InvoiceItem(invoice=invoice, title=f'Item {k}', quantity=1,
+                    unit_price=Decimal('250'), total_price=Decimal('250'))
+        for invoice in invoices for k in range(3)
+    ])
+    Payment.objects.bulk_create([
+        Payment(invoice=invoice, amount=Decimal('200'), payment_method='bank_transfer')
+        for invoice in invoices for _ in range(2)
+    ])
+    CreditUsage.objects.bulk_create([
+        CreditUsage(
+            subscription=subscriptions[(i + k) % len(subscriptions)], client=project.client,
+            project=project, credits_used=10, items_generated=1, calculated_cost_mad=Decimal('1.00')
+        )
+        for i, project in enumerate(projects) for k in range(3)
+    ])
+    ClientServiceSelection.objects.bulk_create([
+        ClientServiceSelection(client=client, tool=tools[i % len(tools)])
+        for i, client in enumerate(clients)
+    ])
+    rebuild_cost_rollup()
+    rebuild_search_index()
+
+
+class QueryBudgetTestMixin:
+    """
+    Mixin for APITestCase subclasses.
+
+    Subclasses set:
+        budgets: {url_name: {'queries': int, 'p95_ms': float, 'params': dict, 'skip': str}}
+        base_scale / scaled: dataset sizes measured before and after growing the data
+        check_latency: also check p95_ms (requests are repeated `runs` times)
+    """
+    budgets = {}
+    base_scale = 2
+    scaled = 20
+    runs = DEFAULT_RUNS
+    check_latency = False
+
+    def detail_object(self, view_class):
+        return view_class.queryset.order_by('pk').first()
+
+    def endpoint_url(self, name, route, view_class):
+        kwargs = {}
+        if '<pk>' in route or '(?P<pk>' in route:
+            kwargs['pk'] = self.detail_object(view_class).pk
+        return reverse(name, kwargs=kwargs)
+
+    def measure(self, url, params):
+        """Return (query count, SQL statements, p95 ms) for a cold-cache GET."""
+        durations = []
+        statements = []
+        for run in range(self.runs if self.check_latency else 1):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = self.client.get(url, params)
+                durations.append((time.perf_counter() - start) * 1000)
+            self.assertLess(response.status_code, 400, f'GET {url} returned {response.status_code}')
+            if run == 0:
+                statements = [query['sql'] for query in context.captured_queries]
+        return len(statements), statements, percentile(durations, 95)
+
+    def measure_all(self):
+        results = {}
+        for name, route, view_class in discover_endpoints():
+            budget = self.budgets.get(name)
+            if budget is None or budget.get('skip'):
+                continue
+            url = self.endpoint_url(name, route, view_class)
+            results[name] = self.measure(url, budget.get('params', {}))
+        return results
+
+    def sql_diff(self, before, after):
+        counts = Counter(normalize_sql(sql) for sql in after)
+        repeated = [f'  x{count} {sql}' for sql, count in counts.most_common() if count > 1]
+        diff = difflib.unified_diff(
+            [normalize_sql(sql) for sql in before],
+            [normalize_sql(sql) for sql in after],
+            fromfile=f'scale={self.base_scale}', tofile=f'scale={self.scaled}', lineterm=''
+        )
+        report = '\n'.join(diff)
+        if repeated:
+            report += '\nRepeated statements:\n' + '\n'.join(repeated)
+        return report
+
+    def assert_budgets(self, grow_dataset):
+        """Measure every budgeted endpoint, call grow_dataset(), measure again and check budgets."""
+        baseline = self.measure_all()
+        grow_dataset()
+        scaled = self.measure_all()
+
+        for name, (count, statements, p95_ms) in scaled.items():
+            budget = self.budgets[name]
+            with self.subTest(endpoint=name):
+                if count > budget['queries']:
+                    self.fail(
+                        f'{name}: {count} queries, budget {budget["queries"]}\n'
+                        + self.sql_diff(baseline[name][1], statements)
+                    )
+                if self.check_latency and p95_ms > budget['p95_ms']:
+                    self.fail(f'{name}: p95 {p95_ms:.1f}ms, budget {budget["p95_ms"]}ms')
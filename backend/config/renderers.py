@@ -0,0 +1,61 @@
+"""
+JSON renderer with a native encoder for our payload types.
+
+DRF's JSONRenderer goes through the stdlib json module, which calls a
+Python-level default() for every Decimal, UUID, date and datetime; amounts,
+primary keys and timestamps make up most of our payloads. With orjson
+installed, FastJSONRenderer serializes UUID, date and datetime natively
+and only falls back to DRF's encoder for the rest (Decimal -> float, lazy
+strings, querysets...), so the output matches JSONRenderer's compact,
+UTF-8 form. Without orjson, or for an indented (browsable / ?indent)
+response, it is JSONRenderer.
+
+Selected in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'];
+manage.py benchmark_renderers compares both.
+"""
+
+from decimal import Decimal
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Constants
+ORJSON_OPTIONS = (
+    (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if ORJSON_AVAILABLE else 0
+)
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Decimal first: most of what orjson hands back (JSONEncoder renders it as a float too)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _fallback_encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer, through orjson when it is installed."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_AVAILABLE or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            rendered = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits, nesting over 254 levels: the stdlib copes
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer too: valid JSON, but not valid inside a JavaScript string
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in rendered:
+                rendered = rendered.replace(raw, escaped)
+        return rendered
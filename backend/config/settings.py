@@ -5,6 +5,7 @@ Django settings for config project.
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,10 +48,16 @@ INSTALLED_APPS = [
     "services",
     "analytics",
     "subscriptions",
+    "search",
+    "maintenance",
+    "exports",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
     "django.middleware.gzip.GZipMiddleware",  # Compress responses (60-70% smaller)
+    "config.instrumentation.RequestInstrumentationMiddleware",  # No-op unless enabled below
+    "config.metrics.MetricsMiddleware",  # Prometheus counters for /api/metrics/
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -120,16 +127,21 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # In production, set CORS_ALLOWED_ORIGINS environment variable (comma-separated)
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['X-Analytics-Source', 'X-Analytics-Snapshot-Age']  # Snapshot staleness for the dashboard
 
 # REST Framework settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "config.authentication.CachedJWTAuthentication",  # simplejwt, user cached per token
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "config.renderers.FastJSONRenderer",  # orjson when installed, else DRF's JSONRenderer
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
@@ -151,10 +163,102 @@ CACHES = {
     }
 }
 
+# JWT user cache (config/authentication.py). It must be shared by every worker,
+# or deactivating a user would only reach the worker that saved it: Redis when
+# AUTH_CACHE_REDIS_URL is set, otherwise files in AUTH_CACHE_DIR (one host).
+AUTH_CACHE_REDIS_URL = os.environ.get('AUTH_CACHE_REDIS_URL', '')
+AUTH_CACHE_DIR = os.environ.get('AUTH_CACHE_DIR', Path(tempfile.gettempdir()) / "sufian-panel-auth")
+if AUTH_CACHE_REDIS_URL:
+    CACHES['auth'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': AUTH_CACHE_REDIS_URL,
+        'KEY_PREFIX': 'sufian-panel',
+    }
+else:
+    CACHES['auth'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': AUTH_CACHE_DIR,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        }
+    }
+
 # Cache timeouts (in seconds)
 CACHE_TIMEOUT_ANALYTICS = 300  # 5 minutes for analytics data
 CACHE_TIMEOUT_STATIC = 3600  # 1 hour for static/rarely changing data
 
+# Write-behind spool for log_generation (?defer=1). Accepted rows are appended to
+# a local file and flushed to SQLite in batches by a background thread.
+GENERATION_SPOOL_ENABLED = os.environ.get('GENERATION_SPOOL_ENABLED', 'False').lower() == 'true'
+GENERATION_SPOOL_DIR = os.environ.get('GENERATION_SPOOL_DIR', BASE_DIR / "spool")
+GENERATION_SPOOL_FLUSH_INTERVAL = float(os.environ.get('GENERATION_SPOOL_FLUSH_INTERVAL', 2))
+
+# Request instrumentation (query counts, SQL time, Server-Timing header)
+# Disabled by default: the middleware removes itself from the stack when off.
+REQUEST_INSTRUMENTATION_ENABLED = os.environ.get('REQUEST_INSTRUMENTATION_ENABLED', 'False').lower() == 'true'
+REQUEST_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('REQUEST_INSTRUMENTATION_SAMPLE_RATE', 1.0))
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 500))
+
+# ReportLab/pypdf load on the first PDF render. PDF_WARMUP loads them (and
+# registers fonts) when the app starts instead, trading boot time and RSS for
+# a fast first render.
+PDF_WARMUP = os.environ.get('PDF_WARMUP', 'False').lower() == 'true'
+
+# Prometheus metrics at /api/metrics/, aggregated across gunicorn workers
+# through per-worker snapshot files in METRICS_DIR (wiped on container start).
+# Only server processes record (config/wsgi.py, config/asgi.py), never tests or
+# management commands. Scrapes need "Authorization: Bearer <METRICS_TOKEN>"
+# when a token is set, otherwise an authenticated staff user.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / "metrics")
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# manage.py backup: online SQLite snapshots (gzip + SHA-256) with rotation.
+# BACKUP_KEEP full backups are kept, each with the incrementals built on it.
+BACKUP_DIR = os.environ.get('BACKUP_DIR', BASE_DIR / "backups")
+BACKUP_KEEP = int(os.environ.get('BACKUP_KEEP', 7))
+BACKUP_MAX_INCREMENTAL = int(os.environ.get('BACKUP_MAX_INCREMENTAL', 24))
+
+# JWT authentication (config/authentication.py): the user behind a token is
+# cached this long in CACHES['auth'] (capped by the token's expiry); saving a
+# user invalidates it in every worker.
+JWT_USER_CACHE_SECONDS = int(os.environ.get('JWT_USER_CACHE_SECONDS', 300))
+
+# Async analytics views (analytics/async_views.py), on by default under ASGI
+# (config/asgi.py). Their independent queries run on a pool of
+# ANALYTICS_QUERY_THREADS threads per worker, each with its own connection.
+ANALYTICS_ASYNC_VIEWS = os.environ.get('ANALYTICS_ASYNC_VIEWS', 'False').lower() == 'true'
+ANALYTICS_QUERY_THREADS = int(os.environ.get('ANALYTICS_QUERY_THREADS', 4))
+
+# Read-only analytics snapshot (analytics/snapshot.py). The analytics endpoints
+# read a copy of the database taken with the SQLite backup API, refreshed in the
+# background once it is ANALYTICS_SNAPSHOT_INTERVAL seconds old (0: only by
+# manage.py refresh_analytics_snapshot). A copy older than
+# ANALYTICS_SNAPSHOT_MAX_AGE is not used; responses carry X-Analytics-Source
+# and X-Analytics-Snapshot-Age.
+ANALYTICS_SNAPSHOT_ENABLED = os.environ.get('ANALYTICS_SNAPSHOT_ENABLED', 'False').lower() == 'true'
+ANALYTICS_SNAPSHOT_PATH = os.environ.get('ANALYTICS_SNAPSHOT_PATH', BASE_DIR / "analytics.sqlite3")
+ANALYTICS_SNAPSHOT_INTERVAL = float(os.environ.get('ANALYTICS_SNAPSHOT_INTERVAL', 300))
+ANALYTICS_SNAPSHOT_MAX_AGE = float(os.environ.get('ANALYTICS_SNAPSHOT_MAX_AGE', 900))
+if ANALYTICS_SNAPSHOT_ENABLED:
+    DATABASES["analytics"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{ANALYTICS_SNAPSHOT_PATH}?mode=ro",  # Never written through Django
+    }
+DATABASE_ROUTERS = ["analytics.snapshot.AnalyticsSnapshotRouter"]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'config.instrumentation': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # JWT settings
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
@@ -0,0 +1,189 @@
+"""
+Sparse fieldsets (?fields=) and expansion control (?expand=) for GET requests.
+
+    ?fields=id,invoice_number,total_amount   render only these fields
+    ?expand=items                            heavy fields to include
+
+Heavy fields (nested relations, per-row aggregates) are listed in the
+serializer's Meta.expandable_fields. Without either parameter the output is
+unchanged. With ?expand= alone, every ordinary field is kept plus only the
+listed expandable ones (`?expand=` with no value drops them all). With
+?fields=, exactly those fields plus the ?expand= ones are rendered.
+
+SparseFieldsViewMixin then rebuilds the list/retrieve queryset from what
+is actually rendered: only() the columns behind those fields,
+select_related the forward relations they traverse, prefetch_related the
+nested lists, nothing else. Fields whose source is a model property or
+method declare the ORM paths they read in Meta.field_dependencies; names
+there that are not model fields are taken as annotations. A field whose
+data cannot be traced (no dependency entry) leaves the view's queryset
+untouched rather than risk a deferred-field query per row.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+# Constants
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+SPARSE_METHODS = ('GET', 'HEAD')
+
+
+def _parse_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def rendered_field_names(serializer_class, request, declared=None):
+    """
+    Field names the serializer renders for this request, in declaration
+    order, or None when the request does not ask for a sparse response.
+    """
+    params = request.query_params
+    if request.method not in SPARSE_METHODS or (FIELDS_PARAM not in params and EXPAND_PARAM not in params):
+        return None
+    if declared is None:
+        declared = list(serializer_class().fields)
+    expandable = set(getattr(serializer_class.Meta, 'expandable_fields', []))
+    expand = set(_parse_names(params.get(EXPAND_PARAM, '')))
+    if FIELDS_PARAM in params:
+        wanted = set(_parse_names(params[FIELDS_PARAM])) | expand
+    else:
+        wanted = {name for name in declared if name not in expandable} | expand
+    unknown = wanted.difference(declared)
+    if unknown:
+        raise ValidationError({'error': f'Unknown field(s): {", ".join(sorted(unknown))}'})
+    return [name for name in declared if name in wanted]
+
+
+class SparseFieldsSerializerMixin:
+    """Drops the fields a GET request did not ask for (see module docstring)."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        # Only the response root (or each row of a root list) reads the query string
+        is_root = self.parent is None or (
+            isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None
+        )
+        if request is None or not is_root:
+            return fields
+        names = rendered_field_names(type(self), request, declared=list(fields))
+        if names is None:
+            return fields
+        return {name: fields[name] for name in names}
+
+    @classmethod
+    def queryset_plan(cls, names):
+        """
+        Returns {'only': [...], 'select_related': [...], 'prefetch_related': [...]}
+        for rendering `names`, or None when a field's data cannot be traced.
+        """
+        model = cls.Meta.model
+        dependencies = getattr(cls.Meta, 'field_dependencies', {})
+        declared = cls().fields
+        plan = {'only': {'pk'}, 'select_related': set(), 'prefetch_related': set(), 'whole': set()}
+        for name in names:
+            if name in dependencies:
+                for path in dependencies[name]:
+                    _add_path(plan, model, path.split('__'), strict=False)
+                continue
+            field = declared[name]
+            if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                plan['prefetch_related'].add(field.source.replace('.', '__'))
+                continue
+            if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+                return None
+            whole = isinstance(field, serializers.BaseSerializer)
+            if not _add_path(plan, model, field.source.split('.'), strict=True, whole=whole):
+                return None
+
+        # A relation rendered whole by a nested serializer keeps all its columns
+        whole = plan.pop('whole')
+        plan['only'] = {
+            path for path in plan['only']
+            if not any(path.startswith(f'{relation}__') for relation in whole)
+        }
+        return {key: sorted(value) for key, value in plan.items()}
+
+
+def _model_field(model, name):
+    """Model field for a source attribute (get_<field>_display reads <field>), or None."""
+    if name.startswith('get_') and name.endswith('_display'):
+        name = name[len('get_'):-len('_display')]
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _add_path(plan, model, parts, strict, whole=False):
+    """
+    Record the columns and joins a source path reads. Returns False when
+    the path is not made of model fields and strict is set; otherwise the
+    unknown remainder is an annotation, which is always selected.
+    """
+    traversed = []
+    for index, part in enumerate(parts):
+        field = _model_field(model, part)
+        if field is None:
+            return not strict
+        path = '__'.join(traversed + [field.name])
+        if field.many_to_many or field.one_to_many:
+            plan['prefetch_related'].add(path)
+            return True
+        plan['only'].add(path)
+        last = index == len(parts) - 1
+        if not field.is_relation or (last and not whole):
+            return True
+        # Forward relation read through: join it instead of a query per row
+        plan['select_related'].add(path)
+        if last:
+            plan['whole'].add(path)
+            return True
+        traversed.append(field.name)
+        model = field.related_model
+    return True
+
+
+class SparseFieldsViewMixin:
+    """
+    Trims list/retrieve querysets to the fields the response renders.
+    Views can also ask wants_field() to skip annotations nobody asked for.
+    """
+
+    sparse_actions = ('list', 'retrieve')
+
+    def sparse_field_names(self):
+        if not hasattr(self, '_sparse_field_names'):
+            serializer_class = self.get_serializer_class()
+            self._sparse_field_names = None
+            if issubclass(serializer_class, SparseFieldsSerializerMixin):
+                self._sparse_field_names = rendered_field_names(serializer_class, self.request)
+        return self._sparse_field_names
+
+    def wants_field(self, name):
+        names = self.sparse_field_names()
+        return names is None or name in names
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action not in self.sparse_actions:
+            return queryset
+        names = self.sparse_field_names()
+        if names is None:
+            return queryset
+        plan = self.get_serializer_class().queryset_plan(names)
+        if plan is None:
+            return queryset
+
+        only = set(plan['only'])
+        # Keyset pagination reads the ordering field of the first and last rows
+        only.update(field.lstrip('-') for field in getattr(self, 'ordering', None) or [])
+        queryset = queryset.select_related(None).prefetch_related(None).only(*only)
+        # select_related() with no arguments would follow every foreign key
+        if plan['select_related']:
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan['prefetch_related']:
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        return queryset
@@ -0,0 +1,411 @@
+import gzip
+import json
+import os
+import tempfile
+import uuid
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+from clients.models import Client
+from invoices.models import Invoice, Payment
+from subscriptions.models import AITool, CreditUsage
+from config import metrics
+from config.authentication import AUTH_CACHE, TOKEN_KEY, USER_VERSION_KEY
+from config.instrumentation import RequestInstrumentationMiddleware
+from config.renderers import FastJSONRenderer
+from config.query_budget import discover_endpoints, seed_budget_dataset, QueryBudgetTestMixin
+
+# Constants
+DEFAULT_P95_MS = 300  # Generous enough for a loaded CI runner
+PDF_P95_MS = 1500
+# p95 latency budgets depend on the machine: opt-in, query counts always run
+LATENCY_BUDGETS = os.environ.get('QUERY_BUDGET_LATENCY', 'False').lower() == 'true'
+
+# Query budgets per URL name. Counts are for an authenticated GET with a cold
+# cache and must not grow with the dataset: an N+1 regression fails here.
+ENDPOINT_BUDGETS = {
+    # Clients
+    'client-list': {'queries': 2},
+    'client-detail': {'queries': 3},
+    'client-history': {'queries': 6},
+    # Projects
+    'project-list': {'queries': 2},
+    'project-calendar': {'queries': 1},
+    'project-deadlines': {'queries': 1},
+    'project-detail': {'queries': 4},
+    # Invoices
+    'invoice-list': {'queries': 2},
+    'invoice-overdue': {'queries': 2},
+    'invoice-detail': {'queries': 3},
+    'invoice-pdf': {'queries': 3, 'p95_ms': PDF_P95_MS},
+    'invoice-download-pdf': {'queries': 3, 'p95_ms': PDF_P95_MS},
+    'payment-list': {'queries': 2},
+    'payment-by-invoice': {'queries': 1, 'params': {'invoice_id': 'invoice'}},
+    'payment-detail': {'queries': 1},
+    # Services
+    'service-list': {'queries': 2},
+    'service-detail': {'queries': 1},
+    'servicepricing-list': {'queries': 3},  # + table_version() stamp
+    'servicepricing-detail': {'queries': 1},
+    # Analytics
+    'analytics-overview': {'queries': 4},
+    'analytics-revenue': {'queries': 1},
+    'analytics-clients': {'queries': 4},
+    'analytics-services': {'queries': 2},
+    'analytics-payments': {'queries': 3},
+    'analytics-deadlines': {'queries': 4},
+    'analytics-profitability': {'queries': 4},
+    # Subscriptions
+    'aitool-list': {'queries': 2},
+    'aitool-active': {'queries': 2},  # + table_version() stamp
+    'aitool-detail': {'queries': 1},
+    'subscription-list': {'queries': 2},
+    'subscription-current-month': {'queries': 1},
+    'subscription-detail': {'queries': 1},
+    'subscription-usage-by-client': {'queries': 5},
+    'creditusage-list': {'queries': 2},
+    'creditusage-by-client': {'queries': 8, 'params': {'client_id': 'client'}},
+    'creditusage-spool-status': {'queries': 0},
+    'creditusage-detail': {'queries': 1},
+    'clientserviceselection-list': {'queries': 2},
+    'clientserviceselection-by-client': {'queries': 1, 'params': {'client_id': 'client'}},
+    'clientserviceselection-detail': {'queries': 1},
+    'cost-analytics': {'queries': 1},
+    'monthly-overview': {'queries': 2},
+    # Search
+    'search': {'queries': 1, 'params': {'q': 'budget client'}},
+    # Exports
+    'export': {'skip': 'Streams whole tables (one query per batch), see ExportTests'},
+}
+
+
+class EndpointQueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    """Every GET endpoint stays within its query budget (and p95 latency budget) as data grows."""
+
+    base_scale = 5
+    scaled = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(cls.base_scale)
+        cls.user = User.objects.create_user(username='budget', password='budget')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        # Resolve placeholder params ('client', 'invoice') to seeded primary keys, others are literal
+        objects = {
+            'client': Client.objects.order_by('pk').first(),
+            'invoice': Invoice.objects.order_by('pk').first(),
+        }
+        self.budgets = {
+            name: {
+                'p95_ms': DEFAULT_P95_MS,
+                **budget,
+                'params': {
+                    key: objects[value].pk if value in objects else value
+                    for key, value in budget.get('params', {}).items()
+                },
+            }
+            for name, budget in ENDPOINT_BUDGETS.items()
+        }
+
+    def test_every_endpoint_has_a_budget(self):
+        missing = [name for name, _, _ in discover_endpoints() if name not in ENDPOINT_BUDGETS]
+        self.assertEqual(missing, [], 'Add these endpoints to ENDPOINT_BUDGETS in config/tests.py')
+
+    def test_endpoints_within_budget(self):
+        self.assert_budgets(
+            lambda: seed_budget_dataset(self.scaled - self.base_scale, prefix='scaled')
+        )
+
+    @skipUnless(LATENCY_BUDGETS, 'set QUERY_BUDGET_LATENCY=True to check p95 latency budgets')
+    def test_endpoints_within_latency_budget(self):
+        self.check_latency = True
+        self.test_endpoints_within_budget()
+
+
+class KeysetPaginationTests(APITestCase):
+    """?cursor= walks every row exactly once, ties on the ordering field included."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Invoices are all issued today, so pages split inside a run of equal dates
+        seed_budget_dataset(12)
+        cls.user = User.objects.create_user(username='keyset', password='keyset')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [str(row['id']) for row in response.data['results']]
+            pages.append(response.data)
+            url = response.data['next']
+        return ids, pages
+
+    def test_cursor_walk_matches_ordering(self):
+        for url, queryset in [
+            ('/api/invoices/?cursor=', Invoice.objects.order_by('-issued_date', '-pk')),
+            ('/api/subscriptions/usage/?cursor=', CreditUsage.objects.order_by('-usage_date', '-pk')),
+        ]:
+            ids, pages = self.walk(url)
+            self.assertGreater(len(pages), 1, url)
+            self.assertEqual(ids, [str(pk) for pk in queryset.values_list('pk', flat=True)], url)
+
+            # Stepping back from page 2 lands on the first page, which has no previous
+            previous = self.client.get(pages[1]['previous']).data
+            self.assertEqual(previous['results'], pages[0]['results'])
+            self.assertIsNone(previous['previous'])
+
+    def test_count_only_on_request(self):
+        response = self.client.get('/api/payments/?cursor=&count=1')
+        self.assertEqual(response.data['count'], Payment.objects.count())
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/projects/?cursor=not-a-cursor').status_code, 404)
+
+
+class SparseFieldsTests(APITestCase):
+    """?fields= and ?expand= trim both the response and the queries behind it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(3)
+        cls.user = User.objects.create_user(username='sparse', password='sparse')
+        cls.invoice = Invoice.objects.order_by('pk').first()
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/invoices/{self.invoice.pk}/'
+
+    def test_default_response_unchanged(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertIn('items', response.data)
+        self.assertIn('payments', response.data)
+
+    def test_fields(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'fields': 'id,invoice_number,amount_remaining'})
+        self.assertEqual(list(response.data), ['id', 'invoice_number', 'amount_remaining'])
+        self.assertEqual(response.data['amount_remaining'], self.invoice.amount_remaining)
+
+    def test_expand(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'expand': 'items'})
+        self.assertIn('items', response.data)
+        self.assertNotIn('payments', response.data)
+        self.assertIn('client_name', response.data)
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/invoices/', {'fields': 'id,nope'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nope', response.data['error'])
+
+
+class CompressedCacheTests(APITestCase):
+    """Cacheable views answer repeat requests with stored, precompressed bytes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.user = User.objects.create_user(username='compressed', password='compressed')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_request_served_from_cache(self):
+        first = self.client.get('/api/analytics/profitability/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/analytics/profitability/', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', second['Vary'])
+        self.assertEqual(gzip.decompress(second.content), gzip.decompress(first.content))
+
+        plain = self.client.get('/api/analytics/profitability/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(plain.content, gzip.decompress(first.content))
+
+    def test_write_invalidates_tool_catalog(self):
+        self.client.get('/api/subscriptions/tools/active/')
+        AITool.objects.create(name='compressed_tool', display_name='Compressed tool', tool_type='image')
+        names = [tool['name'] for tool in self.client.get('/api/subscriptions/tools/active/').json()]
+        self.assertIn('compressed_tool', names)
+
+    def test_tool_catalog_follows_other_workers_writes(self):
+        tool = AITool.objects.filter(is_active=True).first()
+        self.client.get('/api/subscriptions/tools/active/')
+        # A write made by another worker: nothing in this process is told
+        AITool.objects.filter(pk=tool.pk).update(display_name='Renamed elsewhere', updated_at=timezone.now())
+        names = [entry['display_name'] for entry in self.client.get('/api/subscriptions/tools/active/').json()]
+        self.assertIn('Renamed elsewhere', names)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """FastJSONRenderer output is byte-identical to DRF's JSONRenderer."""
+
+    def test_matches_json_renderer(self):
+        data = {
+            'amount': Decimal('1234.50'),
+            'id': uuid.uuid4(),
+            'at': timezone.now(),
+            'day': timezone.now().date(),
+            'text': 'Atlas Média\u2028',
+            1: [None, True, 2.5],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    """The user behind a token is cached until the user is saved."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='jwt', password='jwt-password')
+
+    def setUp(self):
+        caches[AUTH_CACHE].clear()
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_user_lookup_cached_and_invalidated(self):
+        self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 401)
+
+    def test_evicted_version_is_a_miss(self):
+        self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        # The version key is evicted before the stale entry expires
+        caches[AUTH_CACHE].delete(USER_VERSION_KEY.format(user_id=self.user.pk))
+        self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 401)
+
+    def test_cache_shared_without_password(self):
+        # A per-process cache would keep other workers serving a deactivated user
+        self.assertNotIsInstance(caches[AUTH_CACHE], LocMemCache)
+        self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 200)
+        entry = caches[AUTH_CACHE].get(TOKEN_KEY.format(jti=self.token['jti']))
+        self.assertNotIn(self.user.password, entry[1])
+
+        response = self.client.get('/api/subscriptions/usage/spool_status/')
+        user = response.wsgi_request.user
+        self.assertEqual((user.pk, user.username, user.is_active), (self.user.pk, 'jwt', True))
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_stateless_reads_only_on_opted_in_views(self):
+        self.client.get('/api/analytics/overview/')  # Warms the response cache
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/analytics/overview/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.wsgi_request.user, TokenUser)
+        self.assertIsNone(caches[AUTH_CACHE].get(TOKEN_KEY.format(jti=self.token['jti'])))
+
+        # Views without the opt-in keep the real User
+        response = self.client.get('/api/subscriptions/usage/spool_status/')
+        self.assertIsInstance(response.wsgi_request.user, User)
+
+
+class RequestInstrumentationTests(APITestCase):
+    """The instrumentation middleware only runs when REQUEST_INSTRUMENTATION_ENABLED is set."""
+
+    url = '/api/subscriptions/usage/spool_status/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='timing', password='timing-password')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    @override_settings(REQUEST_INSTRUMENTATION_ENABLED=False)
+    def test_disabled_leaves_the_stack(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestInstrumentationMiddleware(lambda request: None)
+        self.assertFalse(self.client.get(self.url).has_header('Server-Timing'))
+
+    @override_settings(REQUEST_INSTRUMENTATION_ENABLED=True, SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_enabled_times_and_logs(self):
+        with self.assertLogs('config.instrumentation', 'WARNING') as logs:
+            response = self.client.get(self.url)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", view;dur=')
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('slow_request method=GET path=/api/subscriptions/usage/spool_status/ status=200', logs.output[0])
+
+
+class MetricsTests(APITestCase):
+    """Requests are counted per route and /api/metrics/ merges every worker's snapshot."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='ops', password='ops-password', is_staff=True)
+        cls.user = User.objects.create_user(username='member', password='member-password')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # A registry of our own: no flusher thread, no atexit flush into a deleted directory
+        self.registry = metrics.MetricsRegistry(self.directory)
+        self.enterContext(patch.object(metrics, '_serving', True))
+        self.enterContext(patch.object(metrics, '_registry', self.registry))
+        self.enterContext(override_settings(METRICS_ENABLED=True, METRICS_DIR=self.directory, METRICS_TOKEN=''))
+
+    def scrape(self, user=None, **headers):
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+        return self.client.get('/api/metrics/', **headers)
+
+    def test_not_recorded_outside_servers(self):
+        with patch.object(metrics, '_serving', False):
+            self.assertFalse(metrics.metrics_enabled())
+
+    def test_scrape_requires_staff_or_token(self):
+        self.assertEqual(self.scrape().status_code, 401)
+        self.assertEqual(self.scrape(self.user).status_code, 403)
+        self.assertEqual(self.scrape(self.staff).status_code, 200)
+        with override_settings(METRICS_TOKEN='scrape-token'):
+            self.assertEqual(self.scrape(self.staff).status_code, 401)
+            self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer scrape-token').status_code, 200)
+
+    def test_middleware_counts_and_scrape_merges_workers(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get('/api/subscriptions/usage/spool_status/').status_code, 200)
+        self.client.force_authenticate(None)
+        key = ('http_requests_total', metrics._label_key(
+            {'method': 'GET', 'route': 'creditusage-spool-status', 'status': 200}
+        ))
+        self.assertEqual(self.registry.counters[key], 1)
+
+        # A worker that has exited: counted, then folded into archive.json
+        with open(os.path.join(self.directory, 'worker-999999999.json'), 'w', encoding='utf-8') as snapshot:
+            json.dump({'pid': 999999999, 'counters': [[key[0], [list(pair) for pair in key[1]], 2]]}, snapshot)
+
+        body = self.scrape(self.staff).content.decode()
+        self.assertIn('http_requests_total{method="GET",route="creditusage-spool-status",status="200"} 3', body)
+        self.assertIn(f'worker_info{{pid="{os.getpid()}"', body)
+        self.assertEqual(sorted(os.listdir(self.directory)), [
+            'archive.json', 'metrics.lock', f'worker-{os.getpid()}.json'
+        ])
@@ -12,6 +12,8 @@ from rest_framework_simplejwt.views import (
 )
 from django.http import JsonResponse
 
+from .metrics import metrics_view
+
 
 def health_check(request):
     """Public health check endpoint for Docker healthcheck."""
@@ -21,6 +23,8 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     # Health check (public, for Docker healthcheck)
     path("api/health/", health_check, name="health_check"),
+    # Prometheus scrape endpoint (token-protected when METRICS_TOKEN is set)
+    path("api/metrics/", metrics_view, name="metrics"),
     # JWT Authentication
     path("api/auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
@@ -30,6 +34,8 @@ urlpatterns = [
     path("api/", include("invoices.urls")),
     path("api/", include("services.urls")),
     path("api/", include("analytics.urls")),
+    path("api/", include("search.urls")),
+    path("api/", include("exports.urls")),
     path("api/subscriptions/", include("subscriptions.urls")),
 ]
 
@@ -0,0 +1,60 @@
+"""
+Warm read-only, process-wide data before gunicorn forks its workers.
+
+Called from gunicorn.conf.py (when_ready) in the preloaded master. Every
+worker inherits the loaded modules and caches as copy-on-write pages
+instead of building its own copy on its first requests:
+
+    pdf_stack         ReportLab/pypdf imported, fonts registered and warmed
+    invoice_template  template PDF bytes (invoices.pdf_generator)
+    pricing_snapshot  ServicePricing rows for the cost calculator
+    ai_tool_catalog   serialized active AI tools
+
+Nothing here may start threads or leave database connections open, since
+neither survives a fork.
+"""
+
+import os
+import time
+from django.db import connections
+
+from invoices import pdf_generator
+from services.pricing import get_pricing_snapshot
+from subscriptions.catalog import get_active_tool_catalog
+
+
+def _warm_invoice_template():
+    template_path = pdf_generator.get_template_path()
+    if os.path.exists(template_path):
+        pdf_generator.get_template_bytes(template_path)
+
+
+WARMERS = [
+    ('pdf_stack', pdf_generator.warm_up_pdf_stack),
+    ('invoice_template', _warm_invoice_template),
+    ('pricing_snapshot', get_pricing_snapshot),
+    ('ai_tool_catalog', get_active_tool_catalog),
+]
+
+
+def warm_shared_caches():
+    """
+    Run every warmer and close the database connections they opened.
+
+    Returns:
+        list: (name, seconds, error message or None) per warmer
+    """
+    results = []
+    try:
+        for name, warmer in WARMERS:
+            start = time.perf_counter()
+            try:
+                warmer()
+                error = None
+            except Exception as e:
+                # A cold cache only costs the first request, never block startup
+                error = str(e)
+            results.append((name, time.perf_counter() - start, error))
+    finally:
+        connections.close_all()
+    return results
@@ -0,0 +1,189 @@
+"""
+Bulk export of invoices, payments, credit usages, clients and projects
+as CSV or NDJSON, streamed in bounded memory.
+
+Rows are read with values_list() (no model instances) in keyset batches
+on (date field, id), the same composite indexes the cursor pagination
+uses, so each batch is one short indexed query. A single long
+QuerySet.iterator() would work too, but on SQLite it keeps a read
+transaction open for the whole download and a slow client would hold
+off every writer; between batches the database is free. Memory is one
+batch regardless of table size.
+
+The export is not a snapshot: rows written while it runs may or may not
+be included, like paging through the API.
+"""
+
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+# Constants
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Text starting with these is run as a formula by spreadsheet apps (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# entity: model label, date field (keyset + date range), [(column, lookup)]
+EXPORTS = {
+    'invoices': ('invoices.Invoice', 'issued_date', [
+        ('id', 'id'),
+        ('invoice_number', 'invoice_number'),
+        ('issued_date', 'issued_date'),
+        ('due_date', 'due_date'),
+        ('client_id', 'client_id'),
+        ('client_name', 'client__name'),
+        ('client_ice', 'client__ice_number'),
+        ('project_id', 'project_id'),
+        ('project_title', 'project__title'),
+        ('total_amount', 'total_amount'),
+        ('tva_rate', 'tva_rate'),
+        ('deposit_amount', 'deposit_amount'),
+        ('amount_paid', 'amount_paid'),
+        ('payment_status', 'payment_status'),
+    ]),
+    'payments': ('invoices.Payment', 'payment_date', [
+        ('id', 'id'),
+        ('payment_date', 'payment_date'),
+        ('invoice_id', 'invoice_id'),
+        ('invoice_number', 'invoice__invoice_number'),
+        ('client_name', 'invoice__client__name'),
+        ('amount', 'amount'),
+        ('payment_method', 'payment_method'),
+        ('transaction_id', 'transaction_id'),
+    ]),
+    'usages': ('subscriptions.CreditUsage', 'usage_date', [
+        ('id', 'id'),
+        ('usage_date', 'usage_date'),
+        ('client_id', 'client_id'),
+        ('client_name', 'client__name'),
+        ('project_id', 'project_id'),
+        ('tool', 'subscription__tool__name'),
+        ('billing_month', 'subscription__billing_month'),
+        ('generation_type', 'generation_type'),
+        ('items_generated', 'items_generated'),
+        ('credits_used', 'credits_used'),
+        ('video_seconds', 'video_seconds'),
+        ('calculated_cost_mad', 'calculated_cost_mad'),
+        ('manual_cost_mad', 'manual_cost_mad'),
+        ('description', 'description'),
+    ]),
+    'clients': ('clients.Client', 'created_at', [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('name', 'name'),
+        ('company', 'company'),
+        ('email', 'email'),
+        ('phone', 'phone'),
+        ('ice_number', 'ice_number'),
+        ('city', 'city'),
+        ('is_active', 'is_active'),
+    ]),
+    'projects': ('projects.Project', 'created_at', [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('client_id', 'client_id'),
+        ('client_name', 'client__name'),
+        ('title', 'title'),
+        ('service_type', 'service_type'),
+        ('status', 'status'),
+        ('deadline', 'deadline'),
+        ('completed_at', 'completed_at'),
+    ]),
+}
+
+
+def columns(entity):
+    return [column for column, _ in EXPORTS[entity][2]]
+
+
+def _bound(field, value, end=False):
+    """Date range bound for a DateField or (in the current timezone) a DateTimeField."""
+    if field.get_internal_type() != 'DateTimeField':
+        return value + timedelta(days=1) if end else value
+    day = value + timedelta(days=1) if end else value
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def iter_row_chunks(entity, date_from=None, date_to=None, chunk_size=None):
+    """
+    Yield lists of value tuples (in columns() order), oldest first.
+    date_from / date_to are inclusive dates.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    label, date_field, spec = EXPORTS[entity]
+    model = apps.get_model(label)
+    field = model._meta.get_field(date_field)
+    lookups = [lookup for _, lookup in spec]
+    date_index, pk_index = lookups.index(date_field), lookups.index('id')
+
+    queryset = model.objects.order_by(date_field, 'pk')
+    if date_from:
+        queryset = queryset.filter(**{f'{date_field}__gte': _bound(field, date_from)})
+    if date_to:
+        queryset = queryset.filter(**{f'{date_field}__lt': _bound(field, date_to, end=True)})
+    queryset = queryset.values_list(*lookups)
+
+    position = None
+    while True:
+        batch = queryset
+        if position is not None:
+            value, pk = position
+            batch = batch.filter(
+                Q(**{f'{date_field}__gte': value})
+                & (Q(**{f'{date_field}__gt': value}) | Q(pk__gt=pk))
+            )
+        rows = list(batch[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1][date_index], rows[-1][pk_index])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Quoted so Excel/LibreOffice show it as text; numbers (-5.00) are left alone
+        return f"'{value}"
+    return value
+
+
+class _Buffer:
+    """File-like sink for csv.writer that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def format_chunk(fmt, entity, rows):
+    if fmt == 'csv':
+        writer = csv.writer(_Buffer())
+        return ''.join(writer.writerow([_csv_value(value) for value in row]) for row in rows)
+    names = columns(entity)
+    return ''.join(
+        json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n' for row in rows
+    )
+
+
+def iter_export(entity, fmt, date_from=None, date_to=None, chunk_size=None, counter=None):
+    """
+    Yield the export as text, one string per batch (CSV starts with a header).
+    `counter`, a dict, receives the running row count under 'rows'.
+    """
+    if fmt == 'csv':
+        yield csv.writer(_Buffer()).writerow(columns(entity))
+    for rows in iter_row_chunks(entity, date_from, date_to, chunk_size):
+        if counter is not None:
+            counter['rows'] = counter.get('rows', 0) + len(rows)
+        yield format_chunk(fmt, entity, rows)
@@ -0,0 +1,57 @@
+"""
+Export a table as CSV or NDJSON, the same stream as /api/export/<entity>.<format>.
+
+    manage.py export_data invoices --format csv --from 2026-01-01 --to 2026-03-31 --output q1.csv.gz
+"""
+
+import gzip
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from exports import datasets
+from exports.views import parse_date_range
+
+
+class Command(BaseCommand):
+    help = 'Stream invoices, payments, usages, clients or projects to CSV/NDJSON in bounded memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entity', choices=list(datasets.EXPORTS))
+        parser.add_argument('--format', choices=list(datasets.FORMATS), default='csv')
+        parser.add_argument('--from', dest='from', help='First date included (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='to', help='Last date included (YYYY-MM-DD)')
+        parser.add_argument('--output', help='Output file, gzip-compressed when it ends in .gz (default stdout)')
+        parser.add_argument('--chunk-size', type=int, default=datasets.DEFAULT_CHUNK_SIZE,
+                            help=f'Rows per query (default {datasets.DEFAULT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        try:
+            date_from, date_to = parse_date_range(options)
+        except ValueError:
+            raise CommandError('--from and --to must be in YYYY-MM-DD format')
+
+        output = options['output']
+        if not output:
+            out = sys.stdout
+        elif output.endswith('.gz'):
+            out = gzip.open(output, 'wt', encoding='utf-8', newline='')
+        else:
+            out = open(output, 'w', encoding='utf-8', newline='')
+
+        counter = {}
+        started = time.perf_counter()
+        try:
+            for text in datasets.iter_export(
+                options['entity'], options['format'], date_from, date_to, options['chunk_size'], counter
+            ):
+                out.write(text)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        if output:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] Exported {counter.get("rows", 0)} {options["entity"]} to {output} in {elapsed:.1f}s'
+            ))
@@ -0,0 +1,55 @@
+import csv
+import gzip
+import json
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+
+from subscriptions.models import CreditUsage
+from config.query_budget import seed_budget_dataset
+
+
+class ExportTests(APITestCase):
+    """Exports stream every row in keyset batches, gzip-compressed on request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(5)
+        cls.user = User.objects.create_user(username='export', password='export')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_ndjson_in_batches(self):
+        with patch('exports.datasets.DEFAULT_CHUNK_SIZE', 7):
+            response = self.client.get('/api/export/usages.ndjson', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            body = gzip.decompress(b''.join(response.streaming_content)).decode()
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [str(pk) for pk in CreditUsage.objects.order_by('usage_date', 'pk').values_list('pk', flat=True)]
+        )
+
+    def test_csv_date_range(self):
+        response = self.client.get('/api/export/invoices.csv', {'from': '2000-01-01', 'to': '2000-12-31'},
+                                   HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'invoice_number'])
+        self.assertEqual(len(lines), 1)
+
+        response = self.client.get('/api/export/invoices.csv', {'from': '01/01/2026'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/export/users.csv').status_code, 404)
+
+    def test_csv_neutralizes_formulas(self):
+        usage = CreditUsage.objects.order_by('usage_date', 'pk').first()
+        CreditUsage.objects.filter(pk=usage.pk).update(
+            description='=HYPERLINK("http://evil.example")', manual_cost_mad=-5
+        )
+        response = self.client.get('/api/export/usages.csv')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[1][-1], '\'=HYPERLINK("http://evil.example")')
+        self.assertEqual(rows[1][-2], '-5.00')
@@ -0,0 +1,6 @@
+from django.urls import re_path
+from .views import ExportView
+
+urlpatterns = [
+    re_path(r'^export/(?P<entity>\w+)\.(?P<fmt>csv|ndjson)$', ExportView.as_view(), name='export'),
+]
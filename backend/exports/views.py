@@ -0,0 +1,62 @@
+from datetime import datetime
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from . import datasets
+
+
+def parse_date_range(params):
+    """Returns (date_from, date_to) from ?from=/&to= (YYYY-MM-DD, inclusive); raises ValueError."""
+    bounds = []
+    for name in ('from', 'to'):
+        value = params.get(name)
+        bounds.append(datetime.strptime(value, '%Y-%m-%d').date() if value else None)
+    return tuple(bounds)
+
+
+class URLFormatNegotiation(BaseContentNegotiation):
+    """The format is in the URL; an Accept: text/csv header must not end in a 406."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class ExportView(APIView):
+    """
+    Stream a whole table as CSV or NDJSON: /api/export/<entity>.<csv|ndjson>
+
+    Entities: invoices, payments, usages, clients, projects.
+    Query params:
+        from, to: inclusive YYYY-MM-DD range on the entity's date field
+
+    GZipMiddleware compresses the stream chunk by chunk for clients that
+    send Accept-Encoding: gzip.
+    """
+
+    content_negotiation_class = URLFormatNegotiation
+
+    def get(self, request, entity, fmt):
+        if entity not in datasets.EXPORTS:
+            return Response(
+                {'error': f'Unknown export {entity}. Valid: {", ".join(datasets.EXPORTS)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        try:
+            date_from, date_to = parse_date_range(request.query_params)
+        except ValueError:
+            return Response({'error': 'from and to must be in YYYY-MM-DD format'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            datasets.iter_export(entity, fmt, date_from, date_to),
+            content_type=datasets.FORMATS[fmt]
+        )
+        suffix = ''.join(f'-{bound}' for bound in (date_from, date_to) if bound)
+        response['Content-Disposition'] = f'attachment; filename="{entity}{suffix}.{fmt}"'
+        return response
@@ -0,0 +1,137 @@
+"""
+Gunicorn configuration for the API (gunicorn -c gunicorn.conf.py config.wsgi:application).
+
+The master preloads Django and warms read-only data (config.warmup: PDF
+stack, invoice template, pricing snapshot, AI tool catalog) before forking,
+so the workers share those pages copy-on-write instead of each importing
+and loading its own copy. The garbage collector is kept off while loading
+and everything loaded is moved to the permanent generation with
+gc.freeze(), otherwise the first collection in each worker would write to
+every object header and unshare the pages.
+
+Each worker runs a monitor thread that publishes its RSS/PSS to
+/api/metrics/ and asks gunicorn to replace it gracefully (like
+max_requests) once its private memory passes WORKER_MAX_MEMORY_MB. With
+GENERATION_SPOOL_ENABLED it also starts the spool flusher
+(subscriptions/spool.py) once the application is loaded, replaying
+anything a crash left in the spool.
+
+Environment:
+    GUNICORN_BIND            default 0.0.0.0:8000
+    GUNICORN_WORKERS         default 4 (2x CPU cores recommended)
+    GUNICORN_THREADS         default 4 per worker for I/O bound requests
+    GUNICORN_WORKER_CLASS    default gthread; uvicorn.workers.UvicornWorker with
+                             config.asgi:application serves the async analytics views
+    GUNICORN_PRELOAD         default true
+    WORKER_MAX_MEMORY_MB     private memory limit per worker, 0 disables (default 256)
+    WORKER_MEMORY_CHECK_INTERVAL  seconds between checks (default 30)
+"""
+
+import gc
+import os
+import threading
+import time
+
+# Constants
+MB = 1024 * 1024
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+timeout = 120
+keepalive = 5
+max_requests = 1000
+max_requests_jitter = 50
+accesslog = '-'
+errorlog = '-'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+worker_max_memory_mb = float(os.environ.get('WORKER_MAX_MEMORY_MB', 256))
+worker_memory_check_interval = float(os.environ.get('WORKER_MEMORY_CHECK_INTERVAL', 30))
+
+if preload_app:
+    # This module is loaded before the master imports the application;
+    # no collections until everything is loaded and frozen in when_ready
+    gc.disable()
+
+
+class WorkerMemoryMonitor(threading.Thread):
+    """Publishes the worker's memory and retires the worker above the limit."""
+
+    def __init__(self, worker, limit_bytes, interval):
+        super().__init__(name='worker-memory-monitor', daemon=True)
+        self.worker = worker
+        self.limit_bytes = limit_bytes
+        self.interval = interval
+
+    def run(self):
+        from config import metrics
+
+        while self.worker.alive:
+            time.sleep(self.interval)
+            memory = metrics.process_memory()
+            if metrics.metrics_enabled():
+                # Refresh the RSS/PSS gauges of idle workers too
+                metrics.get_registry().flush()
+
+            # Pages still shared with the master are not freed by a restart
+            private = (memory['rss'] or 0) - (memory['shared'] or 0)
+            if self.limit_bytes and private > self.limit_bytes:
+                self.worker.log.warning(
+                    'Worker %s private memory %.0f MB over %.0f MB, recycling',
+                    self.worker.pid, private / MB, self.limit_bytes / MB
+                )
+                metrics.inc('worker_recycles_total', {'reason': 'memory'})
+                # Same graceful path as max_requests: finish in-flight requests, then exit
+                self.worker.alive = False
+                return
+
+
+def _format_memory(memory):
+    parts = [f'{key} {value / MB:.1f} MB' for key, value in memory.items() if value is not None]
+    return ', '.join(parts) or 'unavailable'
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from config import metrics
+    from config.warmup import warm_shared_caches
+
+    for name, seconds, error in warm_shared_caches():
+        if error:
+            server.log.warning('Warm-up %s failed after %.0f ms: %s', name, seconds * 1000, error)
+        else:
+            server.log.info('Warmed %s in %.0f ms', name, seconds * 1000)
+
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+    server.log.info('Master ready, %d objects frozen, %s', gc.get_freeze_count(),
+                    _format_memory(metrics.process_memory()))
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Objects the master allocated since when_ready (replacement workers)
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    WorkerMemoryMonitor(worker, worker_max_memory_mb * MB, worker_memory_check_interval).start()
+
+
+def post_worker_init(worker):
+    from subscriptions.spool import get_spool, spool_enabled
+
+    if spool_enabled():
+        # The flusher's first pass replays segments a crash left behind
+        get_spool()
+
+
+def worker_exit(server, worker):
+    from config import metrics
+
+    server.log.info('Worker %s exiting after %s requests, %s', worker.pid, worker.nr,
+                    _format_memory(metrics.process_memory()))
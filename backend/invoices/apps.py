@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class InvoicesConfig(AppConfig):
     name = "invoices"
+
+    def ready(self):
+        # The PDF stack is lazy; servers can opt into loading it at boot instead
+        if getattr(settings, 'PDF_WARMUP', False):
+            from .pdf_generator import warm_up_pdf_stack
+            warm_up_pdf_stack()
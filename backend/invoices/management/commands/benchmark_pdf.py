@@ -0,0 +1,212 @@
+"""
+Benchmark and profile invoice PDF rendering.
+
+Renders N invoices through the same stage functions generate_invoice_pdf
+uses and reports renders/sec, per-stage timings (overlay, template load,
+merge, serialise), output size and peak memory. --profile dumps a cProfile
+file for snakeviz, flameprof or `python -m pstats`.
+
+Usage:
+    python manage.py benchmark_pdf --count 200 --items 1,2,4,8
+    python manage.py benchmark_pdf --source db --profile pdf.prof
+"""
+
+import cProfile
+import math
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from django.core.management.base import BaseCommand, CommandError
+
+from invoices import pdf_generator
+from invoices import pdf_coordinates as coords
+from invoices.models import Invoice
+from invoices.management.commands.generate_test_invoice import (
+    MockClient, MockInvoice, MockInvoiceItem, MockItemQuerySet,
+)
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    # Windows: no getrusage, peak RSS is not reported
+    RESOURCE_AVAILABLE = False
+
+# Constants
+STAGES = ['overlay', 'template_load', 'merge', 'serialize']
+MEMORY_SAMPLE_SIZE = 20  # Renders traced with tracemalloc (slow) for peak memory
+
+
+def synthetic_template():
+    """A one-page A4 background roughly as busy as the Canva export, for trees without the real template."""
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(coords.PAGE_WIDTH, coords.PAGE_HEIGHT))
+    c.setFillColorRGB(0.96, 0.94, 0.90)
+    c.rect(0, 0, coords.PAGE_WIDTH, coords.PAGE_HEIGHT, fill=1, stroke=0)
+    c.setFillColorRGB(0.2, 0.2, 0.25)
+    c.rect(0, coords.PAGE_HEIGHT - 120, coords.PAGE_WIDTH, 120, fill=1, stroke=0)
+    c.setStrokeColorRGB(0.6, 0.6, 0.6)
+    for row_y in coords.ITEM_ROWS_Y:
+        c.line(40, row_y - 8, coords.PAGE_WIDTH - 40, row_y - 8)
+    for i in range(200):
+        c.circle(30 + (i * 37) % 540, 40 + (i * 53) % 200, 2 + i % 5, fill=0)
+    c.setFont('Helvetica-Bold', 28)
+    c.drawString(40, coords.PAGE_HEIGHT - 80, 'FACTURE')
+    c.setFont('Helvetica', 9)
+    for line in range(12):
+        c.drawString(40, 30 + line * 11, 'Conditions de paiement, coordonnées bancaires et mentions légales ' * 2)
+    c.save()
+    return buffer.getvalue()
+
+
+def synthetic_invoice(index, item_count):
+    invoice = MockInvoice()
+    invoice.invoice_number = f'SB{index + 9}-1'
+    invoice.issued_date = date(2025, 1, 1 + index % 28)
+    invoice.tva_rate = Decimal('20')
+    invoice.client = MockClient()
+    items = [
+        MockInvoiceItem(f'Prestation {k + 1}', 'Création de visuels', k % 5 + 1, Decimal('750'))
+        for k in range(item_count)
+    ]
+    invoice.items = MockItemQuerySet(items)
+    invoice.total_amount = sum(item.total_price for item in items)
+    return invoice
+
+
+class Command(BaseCommand):
+    help = 'Benchmark invoice PDF rendering: renders/sec, per-stage timings and peak memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100, help='Invoices to render (default 100)')
+        parser.add_argument('--items', default='1,2,4,8',
+                            help='Comma-separated item counts cycled across synthetic invoices (default 1,2,4,8)')
+        parser.add_argument('--source', choices=['synthetic', 'db'], default='synthetic',
+                            help='Render synthetic invoices or the most recent database invoices')
+        parser.add_argument('--template', help='Template PDF (default static/templates/invoice_template.pdf)')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured renders first (default 5)')
+        parser.add_argument('--profile', help='Write a cProfile dump of the measured renders to this file')
+
+    def handle(self, *args, **options):
+        invoices = self.load_invoices(options)
+        template = self.load_template(options)
+
+        for invoice in invoices[:options['warmup']]:
+            self.render(invoice, template)
+
+        profiler = cProfile.Profile() if options['profile'] else None
+        timings = {stage: [] for stage in STAGES}
+        sizes = []
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        for invoice in invoices:
+            stage_seconds, pdf_bytes = self.render(invoice, template)
+            for stage, seconds in stage_seconds.items():
+                timings[stage].append(seconds)
+            sizes.append(len(pdf_bytes))
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        peak_bytes = self.peak_memory(invoices[:MEMORY_SAMPLE_SIZE], template)
+        self.report(options, timings, sizes, elapsed, peak_bytes, len(invoices))
+
+        if profiler:
+            profiler.dump_stats(options['profile'])
+            self.stdout.write(self.style.SUCCESS(f'[OK] Profile written to {options["profile"]}'))
+            self.stdout.write(f'  View with: snakeviz {options["profile"]}  or  python -m pstats {options["profile"]}')
+
+    def load_invoices(self, options):
+        count = options['count']
+        if options['source'] == 'db':
+            invoices = list(
+                Invoice.objects.select_related('client').prefetch_related('items').order_by('-issued_date')[:count]
+            )
+            if not invoices:
+                raise CommandError('No invoices in the database, use --source synthetic or seed_scale')
+            return [invoices[i % len(invoices)] for i in range(count)]
+
+        try:
+            item_counts = [int(value) for value in options['items'].split(',')]
+        except ValueError:
+            raise CommandError('--items must be comma-separated integers, e.g. 1,2,4,8')
+        return [synthetic_invoice(i, item_counts[i % len(item_counts)]) for i in range(count)]
+
+    def load_template(self, options):
+        """Returns template bytes, or None when pypdf is missing (overlay-only, as in production)."""
+        if not pdf_generator.PYPDF_AVAILABLE:
+            self.stdout.write(self.style.WARNING('[WARN] pypdf not installed, only the overlay stage is measured'))
+            return None
+        path = options['template'] or pdf_generator.get_template_path()
+        if os.path.exists(path):
+            with open(path, 'rb') as template_file:
+                return template_file.read()
+        if options['template']:
+            raise CommandError(f'Template not found: {path}')
+        self.stdout.write(self.style.WARNING(f'[WARN] {path} not found, using a synthetic template'))
+        return synthetic_template()
+
+    def render(self, invoice, template):
+        """Render one invoice stage by stage. Returns ({stage: seconds}, pdf bytes)."""
+        seconds = {}
+        mark = time.perf_counter()
+        overlay_bytes = pdf_generator.create_text_overlay(invoice)
+        seconds['overlay'], mark = time.perf_counter() - mark, time.perf_counter()
+        if template is None:
+            return seconds, overlay_bytes
+
+        # Production keeps the template bytes in memory and parses them on every render
+        template_page = pdf_generator.load_template_page(BytesIO(template))
+        seconds['template_load'], mark = time.perf_counter() - mark, time.perf_counter()
+        writer = pdf_generator.merge_overlay(template_page, overlay_bytes)
+        seconds['merge'], mark = time.perf_counter() - mark, time.perf_counter()
+        pdf_bytes = pdf_generator.serialize_pdf(writer)
+        seconds['serialize'] = time.perf_counter() - mark
+        return seconds, pdf_bytes
+
+    def peak_memory(self, invoices, template):
+        """Largest Python heap growth during a single render (tracemalloc)."""
+        peak = 0
+        tracemalloc.start()
+        try:
+            for invoice in invoices:
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                self.render(invoice, template)
+                _, render_peak = tracemalloc.get_traced_memory()
+                peak = max(peak, render_peak - baseline)
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    def report(self, options, timings, sizes, elapsed, peak_bytes, count):
+        self.stdout.write(f'\nRendered {count} invoices ({options["source"]}) in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'  {count / elapsed:.1f} renders/sec'))
+
+        total_ms = sum(sum(values) for values in timings.values()) * 1000
+        self.stdout.write(f'\n  {"stage":15} {"mean ms":>9} {"p50 ms":>9} {"p95 ms":>9} {"share":>7}')
+        for stage in STAGES:
+            values = timings[stage]
+            if not values:
+                continue
+            ordered = sorted(value * 1000 for value in values)
+            share = sum(ordered) / total_ms * 100 if total_ms else 0
+            p50 = ordered[max(0, math.ceil(len(ordered) * 0.50) - 1)]
+            p95 = ordered[max(0, math.ceil(len(ordered) * 0.95) - 1)]
+            self.stdout.write(
+                f'  {stage:15} {statistics.mean(ordered):9.2f} {p50:9.2f} {p95:9.2f} {share:6.1f}%'
+            )
+
+        self.stdout.write(f'\n  Output size: {statistics.mean(sizes) / 1024:.1f} KB mean')
+        self.stdout.write(f'  Peak heap per render: {peak_bytes / 1024 / 1024:.2f} MB (tracemalloc)')
+        if RESOURCE_AVAILABLE:
+            # ru_maxrss is KB on Linux
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.stdout.write(f'  Process max RSS: {max_rss / 1024:.1f} MB')
@@ -45,6 +45,7 @@ class MockInvoice:
         self.issued_date = date(2024, 12, 15)
         self.client = MockClient()
         self.total_amount = Decimal("7500")
+        self.tva_rate = Decimal("0")
 
         # Create mock items
         mock_items = [
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_client_address_line1_client_address_line2_and_more'),
+        ('invoices', '0003_payment_invoices_pa_payment_9bbb9c_idx_and_more'),
+        ('projects', '0002_add_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='invoices_pa_payment_9bbb9c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['issued_date', 'id'], name='invoices_in_issued__2582de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'id'], name='invoices_pa_payment_346724_idx'),
+        ),
+    ]
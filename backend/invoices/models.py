@@ -61,6 +61,7 @@ class Invoice(models.Model):
             models.Index(fields=['payment_status']),
             models.Index(fields=['due_date']),
             models.Index(fields=['client', 'payment_status']),
+            models.Index(fields=['issued_date', 'id']),  # Keyset pagination (config.pagination)
         ]
 
     def __str__(self):
@@ -173,7 +174,7 @@ class Payment(models.Model):
     class Meta:
         ordering = ['-payment_date']
         indexes = [
-            models.Index(fields=['payment_date']),  # For date range queries in analytics
+            models.Index(fields=['payment_date', 'id']),  # Date ranges in analytics, keyset pagination
             models.Index(fields=['invoice', 'payment_date']),  # For invoice payment history
             models.Index(fields=['payment_method']),  # For payment method analytics
         ]
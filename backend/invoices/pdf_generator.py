@@ -8,28 +8,42 @@ This generator creates invoices by:
 Template: static/templates/invoice_template.pdf (A4 size, exported from Canva)
 """
 
+import importlib.util
+import logging
 import os
+import threading
+import time
 from io import BytesIO
 from django.conf import settings
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from config import metrics
 
 from . import pdf_coordinates as coords
 
-try:
-    from pypdf import PdfReader, PdfWriter
-    PYPDF_AVAILABLE = True
-except ImportError:
-    PYPDF_AVAILABLE = False
-    print("Warning: pypdf not installed. Run: pip install pypdf")
+logger = logging.getLogger(__name__)
+
+# ReportLab and pypdf are imported on first render (or by warm_up_pdf_stack),
+# so workers, manage.py commands and tests that never render a PDF skip the cost
+PYPDF_AVAILABLE = importlib.util.find_spec('pypdf') is not None
+if not PYPDF_AVAILABLE:
+    logger.warning('pypdf not installed, invoices render without the template. Run: pip install pypdf')
+
+# Set by load_pdf_stack()
+FONTS = {}
+BODY_FONT = 'Helvetica'
+BOLD_FONT = 'Helvetica-Bold'
+_pdf_stack_loaded = False
+_pdf_stack_lock = threading.Lock()
+
+# Template file contents keyed by (path, mtime), see get_template_bytes()
+_template_cache = {}
 
 
 def register_fonts():
     """Register custom Quicksand fonts if available."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
     fonts_registered = {}
     try:
         font_dir = os.path.join(settings.BASE_DIR, 'static', 'fonts')
@@ -47,14 +61,43 @@ def register_fonts():
                 pdfmetrics.registerFont(TTFont(font_name, font_path))
                 fonts_registered[font_name] = True
     except Exception as e:
-        print(f"Font registration error: {e}")
+        logger.warning('Font registration error: %s', e)
 
     return fonts_registered
 
 
-FONTS = register_fonts()
-BODY_FONT = 'Quicksand' if 'Quicksand' in FONTS else 'Helvetica'
-BOLD_FONT = 'Quicksand-Bold' if 'Quicksand-Bold' in FONTS else 'Helvetica-Bold'
+def load_pdf_stack():
+    """Import ReportLab/pypdf and register fonts, once per process."""
+    global FONTS, BODY_FONT, BOLD_FONT, _pdf_stack_loaded
+    if _pdf_stack_loaded:
+        return
+    with _pdf_stack_lock:
+        if _pdf_stack_loaded:
+            return
+        import reportlab.pdfgen.canvas  # noqa: F401
+        if PYPDF_AVAILABLE:
+            import pypdf  # noqa: F401
+
+        FONTS = register_fonts()
+        BODY_FONT = 'Quicksand' if 'Quicksand' in FONTS else 'Helvetica'
+        BOLD_FONT = 'Quicksand-Bold' if 'Quicksand-Bold' in FONTS else 'Helvetica-Bold'
+        _pdf_stack_loaded = True
+
+
+def warm_up_pdf_stack():
+    """
+    Load the PDF stack and draw a throwaway overlay so font metrics and
+    glyph tables are ready before the first real request (PDF_WARMUP).
+    """
+    from reportlab.pdfgen import canvas
+
+    load_pdf_stack()
+    c = canvas.Canvas(BytesIO(), pagesize=(coords.PAGE_WIDTH, coords.PAGE_HEIGHT))
+    for font in (BODY_FONT, BOLD_FONT):
+        c.setFont(font, coords.FONT_SIZE_NORMAL)
+        c.drawString(0, 0, 'SB9-1 0123456789 dhs %')
+        c.stringWidth('0123456789', font, coords.FONT_SIZE_NORMAL)
+    c.save()
 
 
 def create_text_overlay(invoice):
@@ -62,6 +105,10 @@ def create_text_overlay(invoice):
     Create a transparent PDF with just the invoice text.
     Returns PDF bytes that can be merged onto the template.
     """
+    from reportlab.lib import colors
+    from reportlab.pdfgen import canvas
+
+    load_pdf_stack()
     buffer = BytesIO()
     # Use same page size as template (596 x 842 points)
     c = canvas.Canvas(buffer, pagesize=(coords.PAGE_WIDTH, coords.PAGE_HEIGHT))
@@ -155,6 +202,52 @@ def create_text_overlay(invoice):
     return buffer.getvalue()
 
 
+def get_template_path():
+    return os.path.join(settings.BASE_DIR, 'static', 'templates', 'invoice_template.pdf')
+
+
+def get_template_bytes(template_path):
+    """
+    Template file contents, read once per process and again only when the
+    file changes. The bytes (not a parsed PdfReader, which seeks a shared
+    stream lazily and is not thread-safe) are what gets shared between
+    gthread threads and, with gunicorn preload, between workers.
+    """
+    key = (template_path, os.path.getmtime(template_path))
+    template = _template_cache.get(key)
+    if template is None:
+        with open(template_path, 'rb') as template_file:
+            template = template_file.read()
+        _template_cache.clear()
+        _template_cache[key] = template
+    return template
+
+
+def load_template_page(template):
+    """Parse the PDF template (path or file object) and return its first page."""
+    from pypdf import PdfReader
+
+    return PdfReader(template).pages[0]
+
+
+def merge_overlay(template_page, overlay_bytes):
+    """Merge the text overlay onto the template page. Returns a PdfWriter."""
+    from pypdf import PdfReader, PdfWriter
+
+    overlay_page = PdfReader(BytesIO(overlay_bytes)).pages[0]
+    template_page.merge_page(overlay_page)
+
+    writer = PdfWriter()
+    writer.add_page(template_page)
+    return writer
+
+
+def serialize_pdf(writer):
+    result_buffer = BytesIO()
+    writer.write(result_buffer)
+    return result_buffer.getvalue()
+
+
 def generate_invoice_pdf(invoice):
     """
     Generate a PDF invoice by merging text onto the PDF template.
@@ -165,44 +258,33 @@ def generate_invoice_pdf(invoice):
     Returns:
         bytes: PDF file content
     """
+    start = time.perf_counter()
+    pdf_bytes, template = _render_invoice_pdf(invoice)
+    metrics.observe('pdf_render_seconds', {'template': template}, time.perf_counter() - start)
+    return pdf_bytes
+
+
+def _render_invoice_pdf(invoice):
+    """Returns (pdf bytes, 'merged' or 'overlay_only')."""
     # Create the text overlay
     overlay_bytes = create_text_overlay(invoice)
 
     # Path to PDF template
-    template_path = os.path.join(settings.BASE_DIR, 'static', 'templates', 'invoice_template.pdf')
+    template_path = get_template_path()
 
     # If pypdf is available and template exists, merge them
     if PYPDF_AVAILABLE and os.path.exists(template_path):
         try:
-            # Load template
-            template_pdf = PdfReader(template_path)
-            template_page = template_pdf.pages[0]
-
-            # Load overlay
-            overlay_pdf = PdfReader(BytesIO(overlay_bytes))
-            overlay_page = overlay_pdf.pages[0]
-
-            # Merge overlay onto template
-            template_page.merge_page(overlay_page)
-
-            # Write to buffer
-            writer = PdfWriter()
-            writer.add_page(template_page)
-
-            result_buffer = BytesIO()
-            writer.write(result_buffer)
-            result_buffer.seek(0)
-
-            return result_buffer.getvalue()
+            template_page = load_template_page(BytesIO(get_template_bytes(template_path)))
+            return serialize_pdf(merge_overlay(template_page, overlay_bytes)), 'merged'
 
         except Exception as e:
-            print(f"PDF merge error: {e}")
+            logger.warning('PDF merge error: %s', e)
             # Fall back to overlay-only
 
     # Fallback: return just the text overlay (no template background)
     # This can happen if template is missing or pypdf is not installed
     if not os.path.exists(template_path):
-        print(f"Warning: PDF template not found at {template_path}")
-        print("Please export your Canva template as PDF and save it there.")
+        logger.warning('PDF template not found at %s, export the Canva template as PDF there', template_path)
 
-    return overlay_bytes
+    return overlay_bytes, 'overlay_only'
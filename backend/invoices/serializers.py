@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from decimal import Decimal
 from .models import Invoice, InvoiceItem, Payment
+from config.sparse_fields import SparseFieldsSerializerMixin
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -17,7 +18,7 @@ class InvoiceItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'total_price']
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     payment_method_display = serializers.CharField(source='get_payment_method_display', read_only=True)
     # Add validation for payment amount
     amount = serializers.DecimalField(
@@ -34,7 +35,7 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'payment_date']
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.name', read_only=True)
     project_title = serializers.CharField(source='project.title', read_only=True)
     payment_status_display = serializers.CharField(source='get_payment_status_display', read_only=True)
@@ -70,9 +71,16 @@ class InvoiceSerializer(serializers.ModelSerializer):
             'notes', 'pdf_file', 'is_overdue', 'items', 'payments'
         ]
         read_only_fields = ['id', 'invoice_number', 'issued_date', 'amount_paid']
+        expandable_fields = ['items', 'payments']
+        field_dependencies = {
+            'amount_remaining': ['total_amount', 'amount_paid'],
+            'tva_amount': ['total_amount', 'tva_rate'],
+            'total_with_tva': ['total_amount', 'tva_rate'],
+            'is_overdue': ['payment_status', 'due_date'],
+        }
 
 
-class InvoiceListSerializer(serializers.ModelSerializer):
+class InvoiceListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Lighter serializer for list views."""
     client_name = serializers.CharField(source='client.name', read_only=True)
     project_title = serializers.CharField(source='project.title', read_only=True)
@@ -87,6 +95,10 @@ class InvoiceListSerializer(serializers.ModelSerializer):
             'amount_paid', 'amount_remaining', 'deposit_amount', 'tva_rate',
             'payment_status', 'payment_status_display', 'due_date', 'issued_date', 'is_overdue'
         ]
+        field_dependencies = {
+            'amount_remaining': ['total_amount', 'amount_paid'],
+            'is_overdue': ['payment_status', 'due_date'],
+        }
 
 
 class InvoiceCreateSerializer(serializers.ModelSerializer):
@@ -1,3 +1,53 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from reportlab import rl_config
 
-# Create your tests here.
+from invoices import pdf_generator
+from invoices.management.commands.benchmark_pdf import Command as BenchmarkPdfCommand
+from invoices.management.commands.benchmark_pdf import synthetic_invoice, synthetic_template
+
+
+class InvoicePdfTests(SimpleTestCase):
+    """Invoice PDFs render the same whichever path produced them."""
+
+    def setUp(self):
+        # No timestamps or random document ids, so renders compare byte for byte
+        self.enterContext(patch.object(rl_config, 'invariant', 1))
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.template = synthetic_template()
+        self.template_path = os.path.join(directory, 'invoice_template.pdf')
+        with open(self.template_path, 'wb') as template_file:
+            template_file.write(self.template)
+        self.enterContext(patch.object(pdf_generator, 'get_template_path', return_value=self.template_path))
+        self.invoice = synthetic_invoice(0, 3)
+
+    def test_benchmark_renders_like_production(self):
+        _, staged = BenchmarkPdfCommand().render(self.invoice, self.template)
+        self.assertEqual(staged, pdf_generator.generate_invoice_pdf(self.invoice))
+
+        out = StringIO()
+        call_command('benchmark_pdf', '--count', '4', '--warmup', '1', '--template', self.template_path, stdout=out)
+        self.assertIn('Rendered 4 invoices (synthetic)', out.getvalue())
+        self.assertIn('serialize', out.getvalue())
+
+    def test_lazy_load_renders_like_warm_up(self):
+        cold = {'_pdf_stack_loaded': False, 'FONTS': {}, 'BODY_FONT': 'Helvetica', 'BOLD_FONT': 'Helvetica-Bold'}
+        with patch.multiple(pdf_generator, **cold):
+            lazy = pdf_generator.generate_invoice_pdf(self.invoice)
+            self.assertTrue(pdf_generator._pdf_stack_loaded)
+        with patch.multiple(pdf_generator, **cold):
+            pdf_generator.warm_up_pdf_stack()
+            warmed = pdf_generator.generate_invoice_pdf(self.invoice)
+        self.assertTrue(lazy.startswith(b'%PDF'))
+        self.assertEqual(lazy, warmed)
+
+    def test_missing_template_is_logged(self):
+        os.remove(self.template_path)
+        with self.assertLogs('invoices.pdf_generator', 'WARNING') as logs:
+            pdf_bytes = pdf_generator.generate_invoice_pdf(self.invoice)
+        self.assertTrue(pdf_bytes.startswith(b'%PDF'))
+        self.assertIn('PDF template not found', logs.output[0])
@@ -11,16 +11,21 @@ from .serializers import (
     InvoiceItemSerializer, PaymentSerializer
 )
 from .pdf_generator import generate_invoice_pdf
+from config.pagination import KeysetPagination
+from config.sparse_fields import SparseFieldsViewMixin
+from search.filters import FullTextSearchFilter
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['client', 'project', 'payment_status']
     search_fields = ['invoice_number', 'client__name', 'project__title']
+    search_index_entity = 'invoice'
     ordering_fields = ['due_date', 'issued_date', 'total_amount']
     ordering = ['-issued_date']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Optimize queryset with select_related and prefetch_related."""
@@ -54,7 +59,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         # Fetch updated invoices
         invoices = Invoice.objects.filter(
             payment_status='overdue'
-        ).order_by('due_date')
+        ).select_related('client', 'project').order_by('due_date')
 
         serializer = InvoiceListSerializer(invoices, many=True)
         return Response(serializer.data)
@@ -162,12 +167,13 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             )
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['invoice', 'payment_method']
     ordering = ['-payment_date']
+    pagination_class = KeysetPagination
 
     @action(detail=False, methods=['get'])
     def by_invoice(self, request):
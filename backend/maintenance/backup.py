@@ -0,0 +1,344 @@
+"""
+Online SQLite backups: compressed, checksummed snapshots with rotation.
+
+A snapshot is taken with the SQLite online backup API, `pages` pages per
+step with a short sleep in between, so the copy only holds the database
+read lock for one step at a time and writers get in between steps. The
+API restarts by itself when another connection writes mid-copy, so the
+snapshot is always a consistent database (WAL content included), never a
+torn file copy; a copy that keeps restarting under constant writes falls
+back to a single step.
+
+Two kinds of backup are written to BACKUP_DIR:
+
+    db-<stamp>-full.sqlite3.gz     gzip of the whole snapshot
+    db-<stamp>-incr.pagedelta.gz   pages that differ from the latest full
+
+Each has a <name>.json manifest (written last, so a backup without one is
+incomplete and ignored) with SHA-256 checksums of the stored file and of
+the restored database. A full backup also keeps <name>.pagehash, one
+BLAKE2b digest per page, which incremental backups compare against: only
+changed pages are compressed and written. Incrementals are differential
+(always against the latest full), so a restore needs the full plus one
+delta file.
+
+Delta format (inside gzip): DELTA_MAGIC, page size and page count as two
+big-endian uint32, then (uint32 page number, page bytes) per changed page.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Constants
+DEFAULT_STEP_PAGES = 256  # 1 MB per step with 4 KB pages
+DEFAULT_STEP_SLEEP = 0.005  # Seconds between steps, lets writers in
+DEFAULT_MAX_RESTARTS = 3
+COMPRESS_LEVEL = 6
+PAGE_DIGEST_BYTES = 16
+DELTA_MAGIC = b'SQLDELTA1'
+DELTA_HEADER = struct.Struct('>II')
+DELTA_RECORD = struct.Struct('>I')
+READ_CHUNK = 1024 * 1024
+FULL_SUFFIX = '-full.sqlite3.gz'
+INCREMENTAL_SUFFIX = '-incr.pagedelta.gz'
+
+
+class BackupError(Exception):
+    pass
+
+
+class _Restarted(Exception):
+    pass
+
+
+def snapshot(source_path, target_path, pages=DEFAULT_STEP_PAGES, sleep=DEFAULT_STEP_SLEEP,
+             max_restarts=DEFAULT_MAX_RESTARTS):
+    """
+    Copy a live database to target_path with the online backup API.
+
+    Every write from another connection between two steps restarts the
+    copy. After `max_restarts` of those the copy is done in one step
+    instead, which holds the read lock for the whole copy but always ends.
+
+    Returns:
+        dict: page_size, page_count, steps, restarts
+    """
+    state = {'steps': 0, 'restarts': 0, 'remaining': None}
+
+    def progress(status, remaining, total):
+        state['steps'] += 1
+        if state['remaining'] is not None and remaining > state['remaining']:
+            state['restarts'] += 1
+            if state['restarts'] > max_restarts:
+                raise _Restarted()
+        state['remaining'] = remaining
+
+    source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        except _Restarted:
+            source.backup(target)
+            state['steps'] += 1
+        page_size = target.execute('PRAGMA page_size').fetchone()[0]
+        page_count = target.execute('PRAGMA page_count').fetchone()[0]
+        # A standalone file: no -wal/-shm sidecars to ship with it
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+        source.close()
+    return {'page_size': page_size, 'page_count': page_count,
+            'steps': state['steps'], 'restarts': state['restarts']}
+
+
+def quick_check(path):
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = connection.execute('PRAGMA quick_check').fetchone()[0]
+    finally:
+        connection.close()
+    if result != 'ok':
+        raise BackupError(f'Integrity check failed for {path}: {result}')
+
+
+def iter_pages(path, page_size):
+    with open(path, 'rb') as db_file:
+        while True:
+            page = db_file.read(page_size)
+            if not page:
+                return
+            yield page
+
+
+def page_digest(page):
+    return hashlib.blake2b(page, digest_size=PAGE_DIGEST_BYTES).digest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stored:
+        for chunk in iter(lambda: stored.read(READ_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, write):
+    """Write through a temporary file so a crash never leaves a partial file under `path`."""
+    temporary = path.with_name(path.name + '.tmp')
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+
+def _write_full(snapshot_path, info, path):
+    db_digest = hashlib.sha256()
+    page_digests = []
+
+    def write(temporary):
+        with gzip.open(temporary, 'wb', compresslevel=COMPRESS_LEVEL) as out:
+            for page in iter_pages(snapshot_path, info['page_size']):
+                db_digest.update(page)
+                page_digests.append(page_digest(page))
+                out.write(page)
+
+    _write_atomic(path, write)
+    pagehash_path = _pagehash_path(path)
+    _write_atomic(pagehash_path, lambda temporary: temporary.write_bytes(b''.join(page_digests)))
+    return {'db_sha256': db_digest.hexdigest(), 'changed_pages': info['page_count']}
+
+
+def _write_delta(snapshot_path, info, base, path):
+    if base['page_size'] != info['page_size']:
+        raise BackupError('Page size changed since the last full backup, take a full backup')
+    base_digests = _pagehash_path(base['path']).read_bytes()
+    db_digest = hashlib.sha256()
+    changed = 0
+
+    def write(temporary):
+        nonlocal changed
+        with gzip.open(temporary, 'wb', compresslevel=COMPRESS_LEVEL) as out:
+            out.write(DELTA_MAGIC + DELTA_HEADER.pack(info['page_size'], info['page_count']))
+            for number, page in enumerate(iter_pages(snapshot_path, info['page_size'])):
+                db_digest.update(page)
+                offset = number * PAGE_DIGEST_BYTES
+                if base_digests[offset:offset + PAGE_DIGEST_BYTES] != page_digest(page):
+                    out.write(DELTA_RECORD.pack(number) + page)
+                    changed += 1
+
+    _write_atomic(path, write)
+    return {'db_sha256': db_digest.hexdigest(), 'changed_pages': changed, 'base': base['name']}
+
+
+def _pagehash_path(path):
+    return Path(path).with_name(Path(path).name.replace(FULL_SUFFIX, '.pagehash'))
+
+
+def _manifest_path(path):
+    return Path(f'{path}.json')
+
+
+def list_backups(backup_dir):
+    """Completed backups (those with a manifest), oldest first."""
+    backups = []
+    for manifest in sorted(Path(backup_dir).glob('db-*.json')):
+        data = json.loads(manifest.read_text())
+        data['path'] = manifest.with_name(data['name'])
+        backups.append(data)
+    return sorted(backups, key=lambda backup: backup['created_at'])
+
+
+def latest_full(backup_dir):
+    fulls = [backup for backup in list_backups(backup_dir) if backup['kind'] == 'full']
+    return fulls[-1] if fulls else None
+
+
+def create_backup(source_path, backup_dir, incremental=False, pages=DEFAULT_STEP_PAGES,
+                  sleep=DEFAULT_STEP_SLEEP, max_incremental=None, full_threshold=None, check=True):
+    """
+    Snapshot source_path into backup_dir.
+
+    With incremental=True only pages changed since the latest full backup
+    are stored; a full backup is taken instead when there is none, when
+    `max_incremental` deltas already depend on it, or when more than
+    `full_threshold` (0-1) of the pages changed.
+
+    Returns:
+        dict: the backup manifest
+    """
+    backup_dir = Path(backup_dir)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    created_at = datetime.now()
+    stamp = created_at.strftime('%Y%m%d-%H%M%S-%f')
+    snapshot_path = backup_dir / f'.snapshot-{stamp}.sqlite3'
+
+    try:
+        info = snapshot(source_path, snapshot_path, pages=pages, sleep=sleep)
+        if check:
+            quick_check(snapshot_path)
+
+        base = latest_full(backup_dir) if incremental else None
+        if base is not None and max_incremental is not None:
+            dependents = [b for b in list_backups(backup_dir) if b.get('base') == base['name']]
+            if len(dependents) >= max_incremental:
+                base = None
+
+        result = None
+        if base is not None:
+            path = backup_dir / f'db-{stamp}{INCREMENTAL_SUFFIX}'
+            result = _write_delta(snapshot_path, info, base, path)
+            if full_threshold is not None and result['changed_pages'] > full_threshold * info['page_count']:
+                # The delta is nearly a full copy, start a new chain
+                path.unlink()
+                result = None
+        if result is None:
+            path = backup_dir / f'db-{stamp}{FULL_SUFFIX}'
+            result = _write_full(snapshot_path, info, path)
+    finally:
+        if snapshot_path.exists():
+            snapshot_path.unlink()
+
+    manifest = {
+        'name': path.name,
+        'kind': 'incremental' if 'base' in result else 'full',
+        'created_at': created_at.isoformat(),
+        'source': str(source_path),
+        'page_size': info['page_size'],
+        'page_count': info['page_count'],
+        'db_bytes': info['page_size'] * info['page_count'],
+        'file_bytes': path.stat().st_size,
+        'file_sha256': file_sha256(path),
+        'steps': info['steps'],
+        'restarts': info['restarts'],
+        'seconds': round(time.perf_counter() - started, 3),
+        **result,
+    }
+    _write_atomic(_manifest_path(path), lambda temporary: temporary.write_text(json.dumps(manifest, indent=2)))
+    manifest['path'] = path
+    return manifest
+
+
+def rotate(backup_dir, keep):
+    """
+    Keep the newest `keep` full backups and the incrementals built on them.
+
+    Returns:
+        list: names of deleted backups
+    """
+    backups = list_backups(backup_dir)
+    fulls = [backup for backup in backups if backup['kind'] == 'full']
+    kept = {backup['name'] for backup in fulls[-keep:]} if keep > 0 else {b['name'] for b in fulls}
+    deleted = []
+    for backup in backups:
+        owner = backup['name'] if backup['kind'] == 'full' else backup.get('base')
+        if owner in kept:
+            continue
+        # Manifest first: a backup without one is already ignored
+        _manifest_path(backup['path']).unlink(missing_ok=True)
+        backup['path'].unlink(missing_ok=True)
+        if backup['kind'] == 'full':
+            _pagehash_path(backup['path']).unlink(missing_ok=True)
+        deleted.append(backup['name'])
+    return deleted
+
+
+def find_backup(backup_dir, name):
+    for backup in list_backups(backup_dir):
+        if backup['name'] == name:
+            return backup
+    raise BackupError(f'No completed backup named {name} in {backup_dir}')
+
+
+def verify_stored(backup):
+    if file_sha256(backup['path']) != backup['file_sha256']:
+        raise BackupError(f'Checksum mismatch for {backup["name"]}')
+
+
+def restore(backup_dir, name, target_path, check=True):
+    """Rebuild the database of backup `name` at target_path and verify its checksum."""
+    backup = find_backup(backup_dir, name)
+    chain = [backup] if backup['kind'] == 'full' else [find_backup(backup_dir, backup['base']), backup]
+    for item in chain:
+        verify_stored(item)
+
+    target_path = Path(target_path)
+
+    def write(temporary):
+        with gzip.open(chain[0]['path'], 'rb') as full, open(temporary, 'wb') as out:
+            for chunk in iter(lambda: full.read(READ_CHUNK), b''):
+                out.write(chunk)
+        if len(chain) > 1:
+            _apply_delta(chain[1]['path'], temporary)
+        if file_sha256(temporary) != backup['db_sha256']:
+            raise BackupError(f'Restored database does not match the checksum of {name}')
+        if check:
+            quick_check(temporary)
+
+    _write_atomic(target_path, write)
+    return backup
+
+
+def _apply_delta(delta_path, db_path):
+    with gzip.open(delta_path, 'rb') as delta, open(db_path, 'r+b') as db_file:
+        if delta.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+            raise BackupError(f'{delta_path} is not a page delta')
+        page_size, page_count = DELTA_HEADER.unpack(delta.read(DELTA_HEADER.size))
+        while True:
+            header = delta.read(DELTA_RECORD.size)
+            if not header:
+                break
+            (number,) = DELTA_RECORD.unpack(header)
+            db_file.seek(number * page_size)
+            db_file.write(delta.read(page_size))
+        db_file.truncate(page_count * page_size)
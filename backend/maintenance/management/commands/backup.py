@@ -0,0 +1,112 @@
+"""
+Online backup of the SQLite database (see maintenance/backup.py).
+
+    manage.py backup                      full snapshot, then rotation
+    manage.py backup --incremental        changed pages since the latest full
+    manage.py backup --list
+    manage.py backup --verify NAME        checksums + restore to a temp file + quick_check
+    manage.py backup --restore NAME --output restored.sqlite3
+"""
+
+import os
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from maintenance import backup
+
+# Constants
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = 'Write a compressed, checksummed online snapshot of the SQLite database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=str(settings.BACKUP_DIR),
+                            help=f'Backup directory (default BACKUP_DIR: {settings.BACKUP_DIR})')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Store only the pages changed since the latest full backup')
+        parser.add_argument('--keep', type=int, default=settings.BACKUP_KEEP,
+                            help=f'Full backups to keep with their incrementals, 0 keeps all '
+                                 f'(default {settings.BACKUP_KEEP})')
+        parser.add_argument('--max-incremental', type=int, default=settings.BACKUP_MAX_INCREMENTAL,
+                            help='Take a full backup once this many incrementals depend on the latest one')
+        parser.add_argument('--full-threshold', type=float, default=0.5,
+                            help='Take a full backup when more than this fraction of pages changed')
+        parser.add_argument('--pages', type=int, default=backup.DEFAULT_STEP_PAGES,
+                            help='Pages copied per backup step (default %(default)s)')
+        parser.add_argument('--sleep', type=float, default=backup.DEFAULT_STEP_SLEEP,
+                            help='Seconds between steps so writers get in (default %(default)s)')
+        parser.add_argument('--no-check', action='store_true', help='Skip PRAGMA quick_check on the snapshot')
+        parser.add_argument('--list', action='store_true', help='List completed backups')
+        parser.add_argument('--verify', metavar='NAME', help='Verify a backup (checksums and integrity)')
+        parser.add_argument('--restore', metavar='NAME', help='Restore a backup to --output')
+        parser.add_argument('--output', help='Database file written by --restore (must not exist)')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('backup only supports the SQLite database')
+        backup_dir = options['output_dir']
+
+        try:
+            if options['list']:
+                return self.list_backups(backup_dir)
+            if options['verify']:
+                return self.verify(backup_dir, options['verify'])
+            if options['restore']:
+                return self.restore(backup_dir, options['restore'], options['output'])
+
+            manifest = backup.create_backup(
+                database['NAME'], backup_dir,
+                incremental=options['incremental'],
+                pages=options['pages'],
+                sleep=options['sleep'],
+                max_incremental=options['max_incremental'],
+                full_threshold=options['full_threshold'],
+                check=not options['no_check'],
+            )
+        except (backup.BackupError, OSError) as e:
+            raise CommandError(str(e))
+
+        detail = f'{manifest["db_bytes"] / MB:.1f} MB -> {manifest["file_bytes"] / MB:.1f} MB'
+        if manifest['kind'] == 'incremental':
+            detail += f', {manifest["changed_pages"]}/{manifest["page_count"]} pages changed since {manifest["base"]}'
+        if options['incremental'] and manifest['kind'] == 'full':
+            self.stdout.write(self.style.WARNING('[WARN] Full backup taken instead of an incremental'))
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {manifest["kind"].capitalize()} backup {manifest["name"]} ({detail}) '
+            f'in {manifest["seconds"]:.1f}s, {manifest["steps"]} steps, {manifest["restarts"]} restarts'
+        ))
+        self.stdout.write(f'  sha256 {manifest["file_sha256"]}')
+
+        for name in backup.rotate(backup_dir, options['keep']):
+            self.stdout.write(f'[OK] Rotated out {name}')
+
+    def list_backups(self, backup_dir):
+        backups = backup.list_backups(backup_dir)
+        if not backups:
+            self.stdout.write(f'No backups in {backup_dir}')
+            return
+        for item in backups:
+            base = f' (base {item["base"]})' if item.get('base') else ''
+            self.stdout.write(
+                f'  {item["name"]:48} {item["kind"]:12} {item["file_bytes"] / MB:8.1f} MB '
+                f'{item["changed_pages"]:>8} pages{base}'
+            )
+
+    def verify(self, backup_dir, name):
+        # Restoring is the only proof a backup is usable: checksums, delta, quick_check
+        with tempfile.TemporaryDirectory() as directory:
+            backup.restore(backup_dir, name, os.path.join(directory, 'verify.sqlite3'))
+        self.stdout.write(self.style.SUCCESS(f'[OK] {name} verified'))
+
+    def restore(self, backup_dir, name, output):
+        if not output:
+            raise CommandError('--restore needs --output')
+        if os.path.exists(output):
+            # Never overwrite a database in place, least of all the live one
+            raise CommandError(f'{output} already exists')
+        backup.restore(backup_dir, name, output)
+        self.stdout.write(self.style.SUCCESS(f'[OK] Restored {name} to {output}'))
@@ -0,0 +1,59 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase
+
+from maintenance import backup
+
+
+class BackupTests(SimpleTestCase):
+    """Full and page-delta backups restore to byte-identical databases."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.source = self.root / 'source.sqlite3'
+        with sqlite3.connect(self.source) as connection:
+            connection.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, body TEXT)')
+            connection.executemany('INSERT INTO t (body) VALUES (?)', [('x' * 500,)] * 2000)
+        self.backups = self.root / 'backups'
+
+    def restored_rows(self, name):
+        target = self.root / f'restored-{name}'
+        backup.restore(self.backups, name, target)
+        with sqlite3.connect(target) as connection:
+            return connection.execute('SELECT COUNT(*), MAX(body) FROM t').fetchone()
+
+    def test_incremental_round_trip(self):
+        full = backup.create_backup(self.source, self.backups, incremental=True)
+        self.assertEqual(full['kind'], 'full')
+
+        with sqlite3.connect(self.source) as connection:
+            connection.execute("UPDATE t SET body = 'y' WHERE id = 7")
+        delta = backup.create_backup(self.source, self.backups, incremental=True)
+        self.assertEqual(delta['kind'], 'incremental')
+        self.assertEqual(delta['base'], full['name'])
+        self.assertLess(delta['changed_pages'], 5)
+
+        self.assertEqual(self.restored_rows(full['name']), (2000, 'x' * 500))
+        self.assertEqual(self.restored_rows(delta['name']), (2000, 'y'))
+
+    def test_rotation_keeps_incrementals_of_kept_fulls(self):
+        old = backup.create_backup(self.source, self.backups)
+        backup.create_backup(self.source, self.backups, incremental=True)
+        new = backup.create_backup(self.source, self.backups, incremental=True, max_incremental=1)
+        self.assertEqual(new['kind'], 'full')
+
+        deleted = backup.rotate(self.backups, keep=1)
+        self.assertEqual(len(deleted), 2)
+        self.assertIn(old['name'], deleted)
+        self.assertEqual([item['name'] for item in backup.list_backups(self.backups)], [new['name']])
+
+    def test_corrupted_backup_is_rejected(self):
+        full = backup.create_backup(self.source, self.backups)
+        with open(full['path'], 'r+b') as stored:
+            stored.seek(100)
+            stored.write(b'corrupt')
+        with self.assertRaises(backup.BackupError):
+            backup.restore(self.backups, full['name'], self.root / 'restored.sqlite3')
@@ -40,6 +40,7 @@ class Project(models.Model):
             models.Index(fields=['deadline']),
             models.Index(fields=['client', 'status']),
             models.Index(fields=['client', 'deadline']),
+            models.Index(fields=['created_at', 'id']),  # Keyset pagination (config.pagination)
         ]
 
     def __str__(self):
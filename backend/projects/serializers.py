@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import Project
 from clients.serializers import ClientListSerializer
+from config.sparse_fields import SparseFieldsSerializerMixin
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     client_name = serializers.CharField(source='client.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     service_type_display = serializers.CharField(source='get_service_type_display', read_only=True)
@@ -19,9 +20,13 @@ class ProjectSerializer(serializers.ModelSerializer):
             'is_overdue', 'days_until_deadline'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        field_dependencies = {
+            'is_overdue': ['status', 'deadline'],
+            'days_until_deadline': ['status', 'deadline'],
+        }
 
 
-class ProjectListSerializer(serializers.ModelSerializer):
+class ProjectListSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Lighter serializer for list views."""
     client_name = serializers.CharField(source='client.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
@@ -34,6 +39,10 @@ class ProjectListSerializer(serializers.ModelSerializer):
             'id', 'client', 'client_name', 'title', 'status', 'status_display',
             'service_type', 'deadline', 'is_overdue', 'days_until_deadline'
         ]
+        field_dependencies = {
+            'is_overdue': ['status', 'deadline'],
+            'days_until_deadline': ['status', 'deadline'],
+        }
 
 
 class ProjectDetailSerializer(ProjectSerializer):
@@ -42,3 +51,4 @@ class ProjectDetailSerializer(ProjectSerializer):
 
     class Meta(ProjectSerializer.Meta):
         fields = ProjectSerializer.Meta.fields + ['client_details']
+        expandable_fields = ['client_details']
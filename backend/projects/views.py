@@ -6,19 +6,24 @@ from django.utils import timezone
 from datetime import timedelta
 from .models import Project
 from .serializers import ProjectSerializer, ProjectListSerializer, ProjectDetailSerializer
+from config.pagination import KeysetPagination
+from config.sparse_fields import SparseFieldsViewMixin
+from search.filters import FullTextSearchFilter
 
 # Constants
 DEFAULT_DEADLINE_DAYS = 7  # Default number of days for deadline queries
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['client', 'status', 'service_type']
     search_fields = ['title', 'description', 'client__name']
+    search_index_entity = 'project'
     ordering_fields = ['deadline', 'created_at', 'title']
     ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Optimize queryset with select_related to avoid N+1 queries."""
@@ -45,7 +50,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         projects = Project.objects.filter(
             status__in=['pending', 'in_progress', 'review'],
             deadline__lte=deadline_date
-        ).order_by('deadline')
+        ).select_related('client').order_by('deadline')
 
         serializer = ProjectListSerializer(projects, many=True)
         return Response(serializer.data)
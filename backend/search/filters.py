@@ -0,0 +1,22 @@
+from rest_framework import filters
+
+from . import index
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ?search= answered from the full-text index for views that set
+    `search_index_entity`, so list searches use the FTS5 table instead of
+    LIKE '%term%' scans over search_fields. Views without it, and
+    databases without FTS5, keep the regular SearchFilter behaviour.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        entity = getattr(view, 'search_index_entity', None)
+        if entity is None or not index.fts_available():
+            return super().filter_queryset(request, queryset, view)
+        text = ' '.join(self.get_search_terms(request))
+        subquery = index.match_subquery(entity, text)
+        if subquery is None:
+            return queryset
+        return queryset.filter(pk__in=subquery)
@@ -0,0 +1,232 @@
+"""
+Full-text search index over clients, projects, invoices and AI usage descriptions.
+
+Each indexed object has one SearchDocument (title + body text) mirrored into
+the search_fts FTS5 table by triggers. Documents are kept current by the
+model signals in search/signals.py; bulk writes that bypass signals
+(bulk_create, queryset.update) call index_instances() or rely on
+`manage.py rebuild_search_index`.
+
+Queries match every term as a prefix ("sa" finds "Saïd"), accents and case
+are ignored, and results are ranked with bm25 weighting title matches
+above body matches. On databases without FTS5 the same documents are
+searched with LIKE.
+"""
+
+import re
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import SearchDocument
+
+# Constants
+FTS_TABLE = 'search_fts'
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+MAX_QUERY_TERMS = 8
+SNIPPET_TOKENS = 12
+DEFAULT_LIMIT = 20
+REBUILD_CHUNK_SIZE = 2000
+
+_fts_available = None
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def _client_document(client):
+    return client.name, _join(client.company, client.email, client.city, client.ice_number)
+
+
+def _project_document(project):
+    return project.title, _join(project.client.name, project.description)
+
+
+def _invoice_document(invoice):
+    return invoice.invoice_number, _join(
+        invoice.client.name, invoice.project.title if invoice.project_id else None, invoice.notes
+    )
+
+
+def _usage_document(usage):
+    # Body stays free of client/project names so renames do not fan out to every usage
+    return usage.description, usage.get_generation_type_display()
+
+
+# entity: (model label, document builder, select_related for the builder)
+ENTITIES = {
+    'client': ('clients.Client', _client_document, []),
+    'project': ('projects.Project', _project_document, ['client']),
+    'invoice': ('invoices.Invoice', _invoice_document, ['client', 'project']),
+    'usage': ('subscriptions.CreditUsage', _usage_document, []),
+}
+
+
+def entity_queryset(entity):
+    label, _, related = ENTITIES[entity]
+    queryset = apps.get_model(label).objects.all()
+    return queryset.select_related(*related) if related else queryset
+
+
+def fts_available():
+    """True when the FTS5 table exists (SQLite with migrations applied)."""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names(include_views=False)
+        )
+    return _fts_available
+
+
+def _object_id(pk):
+    return pk.hex if hasattr(pk, 'hex') else str(pk)
+
+
+def _documents(entity, instances):
+    builder = ENTITIES[entity][1]
+    documents = []
+    for instance in instances:
+        title, body = builder(instance)
+        if title:
+            documents.append(SearchDocument(
+                entity=entity, object_id=_object_id(instance.pk), title=title[:500], body=body or ''
+            ))
+    return documents
+
+
+def index_instances(entity, instances):
+    """(Re)index objects of one entity; objects with an empty title are removed."""
+    instances = list(instances)
+    if not instances:
+        return
+    with transaction.atomic():
+        remove_instances(entity, [instance.pk for instance in instances])
+        SearchDocument.objects.bulk_create(_documents(entity, instances), batch_size=REBUILD_CHUNK_SIZE)
+
+
+def index_instance(entity, instance):
+    index_instances(entity, [instance])
+
+
+def remove_instances(entity, pks):
+    SearchDocument.objects.filter(entity=entity, object_id__in=[_object_id(pk) for pk in pks]).delete()
+
+
+def rebuild(entities=None, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Reindex every object of the given entities (default all).
+
+    Returns:
+        dict: {entity: documents indexed}
+    """
+    counts = {}
+    with transaction.atomic():
+        for entity in entities or ENTITIES:
+            SearchDocument.objects.filter(entity=entity).delete()
+            counts[entity] = 0
+            batch = []
+            for instance in entity_queryset(entity).iterator(chunk_size=chunk_size):
+                batch.append(instance)
+                if len(batch) >= chunk_size:
+                    counts[entity] += len(SearchDocument.objects.bulk_create(_documents(entity, batch)))
+                    batch = []
+            counts[entity] += len(SearchDocument.objects.bulk_create(_documents(entity, batch)))
+    optimize()
+    return counts
+
+
+def optimize():
+    """Merge the FTS5 b-tree segments left by many small writes."""
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def query_terms(text):
+    return re.findall(r'\w+', text or '')[:MAX_QUERY_TERMS]
+
+
+def build_match_query(text):
+    """FTS5 MATCH expression: every term, as a quoted prefix. None when there is nothing to match."""
+    terms = query_terms(text)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search(text, entities=None, limit=DEFAULT_LIMIT):
+    """
+    Ranked matches across entities.
+
+    Returns:
+        list: {'type', 'id', 'title', 'snippet', 'score'} dicts, best first
+    """
+    entities = list(entities or ENTITIES)
+    if not fts_available():
+        return _search_like(text, entities, limit)
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(entities))
+    sql = f"""
+        SELECT d.entity, d.object_id, d.title,
+               snippet({FTS_TABLE}, 1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}),
+               bm25({FTS_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+        FROM {FTS_TABLE}
+        JOIN search_searchdocument d ON d.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND d.entity IN ({placeholders})
+        ORDER BY score
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, *entities, limit])
+        rows = cursor.fetchall()
+    return [
+        {'type': entity, 'id': _format_id(object_id), 'title': title, 'snippet': snippet,
+         'score': round(-score, 4)}
+        for entity, object_id, title, snippet, score in rows
+    ]
+
+
+def _search_like(text, entities, limit):
+    terms = query_terms(text)
+    if not terms:
+        return []
+    queryset = SearchDocument.objects.filter(entity__in=entities)
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    return [
+        {'type': document.entity, 'id': _format_id(document.object_id), 'title': document.title,
+         'snippet': document.body[:200], 'score': None}
+        for document in queryset[:limit]
+    ]
+
+
+def _format_id(object_id):
+    # Back to the dashed UUID form the API uses everywhere else
+    if len(object_id) == 32:
+        return f'{object_id[:8]}-{object_id[8:12]}-{object_id[12:16]}-{object_id[16:20]}-{object_id[20:]}'
+    return object_id
+
+
+def match_subquery(entity, text):
+    """
+    SQL selecting the primary keys of `entity` objects matching `text`,
+    for queryset.filter(pk__in=...). None when the text has no terms.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return None
+    return RawSQL(
+        f"""
+        SELECT d.object_id FROM {FTS_TABLE}
+        JOIN search_searchdocument d ON d.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND d.entity = %s
+        """,
+        [match, entity],
+    )
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+
+from search import index
+from search.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from clients, projects, invoices and AI usages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entity', choices=list(index.ENTITIES), action='append',
+                            help='Entity to reindex (repeatable, default all)')
+        parser.add_argument('--if-empty', action='store_true',
+                            help='Only build when the index has no documents (container start)')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and SearchDocument.objects.exists():
+            self.stdout.write('[OK] Search index already populated, skipping')
+            return
+
+        started = time.perf_counter()
+        counts = index.rebuild(options['entity'])
+        elapsed = time.perf_counter() - started
+        for entity, count in counts.items():
+            self.stdout.write(f'  {entity}: {count}')
+        if not index.fts_available():
+            self.stdout.write(self.style.WARNING('[WARN] FTS5 not available, search falls back to LIKE'))
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Indexed {sum(counts.values())} documents in {elapsed:.1f}s'
+        ))
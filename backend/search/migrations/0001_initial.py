@@ -0,0 +1,77 @@
+from django.db import migrations, models
+
+FTS_TABLE_SQL = [
+    # External-content FTS5 table over search_searchdocument. remove_diacritics
+    # makes matching accent-insensitive, the prefix indexes serve "abc"* queries.
+    """
+    CREATE VIRTUAL TABLE search_fts USING fts5(
+        title, body,
+        content='search_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER search_document_ai AFTER INSERT ON search_searchdocument BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER search_document_ad AFTER DELETE ON search_searchdocument BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER search_document_au AFTER UPDATE ON search_searchdocument BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+DROP_FTS_TABLE_SQL = [
+    "DROP TRIGGER IF EXISTS search_document_au",
+    "DROP TRIGGER IF EXISTS search_document_ad",
+    "DROP TRIGGER IF EXISTS search_document_ai",
+    "DROP TABLE IF EXISTS search_fts",
+]
+
+
+def create_fts_table(apps, schema_editor):
+    # FTS5 is SQLite only; other databases fall back to LIKE on search_searchdocument
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in FTS_TABLE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_FTS_TABLE_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('client', 'Client'), ('project', 'Projet'), ('invoice', 'Facture'), ('usage', 'Utilisation IA')], max_length=20)),
+                ('object_id', models.CharField(max_length=32)),
+                ('title', models.CharField(max_length=500)),
+                ('body', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Document de recherche',
+                'verbose_name_plural': 'Documents de recherche',
+                'unique_together': {('entity', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,29 @@
+from django.db import models
+
+# Constants
+ENTITY_TYPES = [
+    ('client', 'Client'),
+    ('project', 'Projet'),
+    ('invoice', 'Facture'),
+    ('usage', 'Utilisation IA'),
+]
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable row per indexed object. Triggers (migration 0001) mirror
+    title and body into the search_fts FTS5 table, keyed by this row's id.
+    """
+
+    entity = models.CharField(max_length=20, choices=ENTITY_TYPES)
+    object_id = models.CharField(max_length=32)  # UUID hex, as Django stores UUIDs on SQLite
+    title = models.CharField(max_length=500)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ['entity', 'object_id']
+        verbose_name = "Document de recherche"
+        verbose_name_plural = "Documents de recherche"
+
+    def __str__(self):
+        return f"{self.get_entity_display()}: {self.title}"
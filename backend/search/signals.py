@@ -0,0 +1,58 @@
+"""Keep SearchDocument rows in step with the indexed models."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from clients.models import Client
+from invoices.models import Invoice
+from projects.models import Project
+from subscriptions.models import CreditUsage
+
+from . import index
+
+
+@receiver(post_save, sender=Client)
+def index_client(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    index.index_instance('client', instance)
+    # Project and invoice documents carry the client name: reindex them only
+    # when it was saved with a new value (a new client has none, an unknown
+    # loaded name counts as changed)
+    name_saved = update_fields is None or 'name' in update_fields
+    loaded_name = getattr(instance, '_loaded_name', None)
+    if name_saved:
+        instance._loaded_name = instance.name
+    if created or not name_saved or loaded_name == instance.name:
+        return
+    index.index_instances('project', index.entity_queryset('project').filter(client=instance))
+    index.index_instances('invoice', index.entity_queryset('invoice').filter(client=instance))
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index.index_instance('project', instance)
+    index.index_instances('invoice', index.entity_queryset('invoice').filter(project=instance))
+
+
+@receiver(post_save, sender=Invoice)
+def index_invoice(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.index_instance('invoice', instance)
+
+
+@receiver(post_save, sender=CreditUsage)
+def index_usage(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.index_instance('usage', instance)
+
+
+@receiver(post_delete, sender=Client)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=CreditUsage)
+def remove_document(sender, instance, **kwargs):
+    entity = {Client: 'client', Project: 'project', Invoice: 'invoice', CreditUsage: 'usage'}[sender]
+    index.remove_instances(entity, [instance.pk])
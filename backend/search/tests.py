@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from clients.models import Client
+from projects.models import Project
+from config.query_budget import seed_budget_dataset
+
+
+class SearchTests(APITestCase):
+    """Global search and ?search= on lists read the FTS5 index kept current by signals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(3)
+        cls.user = User.objects.create_user(username='search', password='search')
+        cls.target = Client.objects.create(
+            name='Saïd Benali', email='said@example.ma', phone='0600000000', company='Atlas Média'
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_prefix_and_accent_insensitive(self):
+        response = self.client.get('/api/search/', {'q': 'said med'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [str(self.target.pk)])
+
+        response = self.client.get('/api/clients/', {'search': 'media'})
+        self.assertEqual([row['id'] for row in response.data['results']], [str(self.target.pk)])
+
+    def test_index_follows_saves_and_deletes(self):
+        project = Project.objects.create(
+            client=self.target, title='Campagne Ramadan', service_type='image', deadline=self.target.created_at
+        )
+        results = self.client.get('/api/search/', {'q': 'ramadan', 'types': 'project'}).data['results']
+        self.assertEqual([row['id'] for row in results], [str(project.pk)])
+
+        # Renaming the client reindexes its projects, which carry the client name
+        self.target.name = 'Youssef Amrani'
+        self.target.save()
+        results = self.client.get('/api/search/', {'q': 'youssef', 'types': 'project'}).data['results']
+        self.assertEqual([row['id'] for row in results], [str(project.pk)])
+
+        project.delete()
+        self.assertEqual(self.client.get('/api/search/', {'q': 'ramadan'}).data['count'], 0)
+
+    def test_client_cascade_only_on_name_change(self):
+        def cascaded(save):
+            with CaptureQueriesContext(connection) as queries:
+                save()
+            return any('projects_project' in q['sql'] or 'invoices_invoice' in q['sql'] for q in queries)
+
+        client = Client.objects.get(email='budget0@example.ma')
+        client.phone = '0611111111'
+        self.assertFalse(cascaded(client.save))
+        client.name = 'Nadia Tazi'
+        self.assertFalse(cascaded(lambda: client.save(update_fields=['phone'])))
+        self.assertTrue(cascaded(lambda: client.save(update_fields=['name'])))
+        self.assertFalse(cascaded(client.save))
+
+        results = self.client.get('/api/search/', {'q': 'nadia', 'types': 'invoice'}).data['results']
+        self.assertEqual(len(results), 2)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'a', 'types': 'nope'}).status_code, 400)
@@ -0,0 +1,40 @@
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+
+from . import index
+
+# Constants
+MAX_LIMIT = 50
+
+
+class SearchView(APIView):
+    """
+    Global search across clients, projects, invoices and AI usage.
+
+    Query params:
+        q: search text, every word matched as a prefix (required)
+        types: comma-separated subset of client,project,invoice,usage
+        limit: max results (default 20, max 50)
+    """
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        if not index.query_terms(text):
+            return Response({'error': 'q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = [name.strip() for name in request.query_params.get('types', '').split(',') if name.strip()]
+        unknown = [name for name in types if name not in index.ENTITIES]
+        if unknown:
+            return Response(
+                {'error': f'Unknown type(s): {", ".join(unknown)}. Valid: {", ".join(index.ENTITIES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', index.DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = index.search(text, types or None, limit)
+        return Response({'query': text, 'count': len(results), 'results': results})
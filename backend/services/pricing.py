@@ -0,0 +1,42 @@
+"""
+Pricing snapshot used by the cost calculator.
+
+Every ServicePricing row keyed by ai_tool, loaded with one query and kept
+in the default cache for CACHE_TIMEOUT_STATIC. The gunicorn master builds
+it before forking (config.warmup) so workers start with it in memory.
+
+The cache is local to each worker, so the snapshot is stored with the
+table_version() it was loaded at and reloaded as soon as the table's
+stamp differs: a price saved through any worker (or the admin) is seen by
+all of them on their next request.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from config.compressed_cache import table_version
+
+# Constants
+PRICING_SNAPSHOT_CACHE_KEY = 'services:pricing_snapshot'
+PRICING_RESPONSE_CACHE = 'servicepricing_list'  # Compressed response cache name
+
+
+def pricing_version(request=None):
+    """Stamp of the ServicePricing table (also the compressed response cache key)."""
+    from .models import ServicePricing
+
+    return table_version(ServicePricing)
+
+
+def get_pricing_snapshot():
+    """Returns {ai_tool: ServicePricing}."""
+    version = pricing_version()
+    cached = cache.get(PRICING_SNAPSHOT_CACHE_KEY)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    from .models import ServicePricing
+
+    snapshot = {pricing.ai_tool: pricing for pricing in ServicePricing.objects.all()}
+    cache.set(PRICING_SNAPSHOT_CACHE_KEY, (version, snapshot), getattr(settings, 'CACHE_TIMEOUT_STATIC', 3600))
+    return snapshot
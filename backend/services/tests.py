@@ -1,3 +1,28 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from .models import ServicePricing
+from .pricing import get_pricing_snapshot
+
+
+class PricingSnapshotTests(TestCase):
+    """The per-process snapshot is reloaded when the table changes in any process."""
+
+    def setUp(self):
+        cache.clear()
+        self.pricing = ServicePricing.objects.create(
+            service_type='image', ai_tool='snapshot_tool', display_name='Snapshot tool', standard_price=10,
+        )
+
+    def test_reused_until_the_table_changes(self):
+        get_pricing_snapshot()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_pricing_snapshot()['snapshot_tool'].standard_price, 10)
+
+        # Saved by another worker: only the database knows
+        ServicePricing.objects.filter(pk=self.pricing.pk).update(standard_price=25, updated_at=timezone.now())
+        self.assertEqual(get_pricing_snapshot()['snapshot_tool'].standard_price, 25)
+
+        ServicePricing.objects.filter(pk=self.pricing.pk).delete()
+        self.assertNotIn('snapshot_tool', get_pricing_snapshot())
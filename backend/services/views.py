@@ -2,9 +2,13 @@ from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
 from decimal import Decimal
+from config.compressed_cache import compressed_cache
+from config.authentication import STATELESS_READ_AUTHENTICATION
 from .models import Service, ServicePricing
 from .serializers import ServiceSerializer, ServicePricingSerializer, CostCalculatorSerializer
+from .pricing import get_pricing_snapshot, pricing_version, PRICING_RESPONSE_CACHE
 
 
 class ServiceViewSet(viewsets.ModelViewSet):
@@ -21,6 +25,11 @@ class ServicePricingViewSet(viewsets.ModelViewSet):
     filterset_fields = ['service_type', 'is_active']
     search_fields = ['display_name', 'ai_tool']
     ordering = ['display_name']
+    authentication_classes = STATELESS_READ_AUTHENTICATION  # Writes still get the cached User
+
+    @compressed_cache(PRICING_RESPONSE_CACHE, settings.CACHE_TIMEOUT_STATIC, key=pricing_version)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
 
 class CostCalculatorView(APIView):
@@ -32,11 +41,11 @@ class CostCalculatorView(APIView):
 
         total_cost = Decimal('0.00')
         breakdown = []
+        pricing_by_tool = get_pricing_snapshot()
 
         for item in serializer.validated_data:
-            try:
-                pricing = ServicePricing.objects.get(ai_tool=item['ai_tool'])
-            except ServicePricing.DoesNotExist:
+            pricing = pricing_by_tool.get(item['ai_tool'])
+            if pricing is None:
                 continue
 
             # Get tier price
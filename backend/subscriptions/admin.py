@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AITool, Subscription, CreditUsage, ClientServiceSelection
+from .models import AITool, Subscription, CreditUsage, CostRollup, ClientServiceSelection
 
 
 @admin.register(AITool)
@@ -24,6 +24,14 @@ class CreditUsageAdmin(admin.ModelAdmin):
     date_hierarchy = 'usage_date'
 
 
+@admin.register(CostRollup)
+class CostRollupAdmin(admin.ModelAdmin):
+    list_display = ['client', 'tool', 'month', 'total_cost_mad', 'total_credits_used', 'usage_count', 'updated_at']
+    list_filter = ['tool', 'month']
+    search_fields = ['client__name']
+    date_hierarchy = 'month'
+
+
 @admin.register(ClientServiceSelection)
 class ClientServiceSelectionAdmin(admin.ModelAdmin):
     list_display = ['client', 'tool', 'is_active', 'added_at']
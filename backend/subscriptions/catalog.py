@@ -0,0 +1,46 @@
+"""
+Active AI tool catalog (GET /api/subscriptions/tools/active/).
+
+The serialized list is kept in the default cache for CACHE_TIMEOUT_STATIC
+and built by the gunicorn master before forking (config.warmup). Like the
+pricing snapshot (services/pricing.py) it is stored with the AITool
+table_version() it was built at and rebuilt once the stamp differs, so a
+tool saved through one worker is seen by every other on its next request.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from config.compressed_cache import table_version
+
+# Constants
+ACTIVE_TOOLS_CACHE_KEY = 'subscriptions:active_tools'
+ACTIVE_TOOLS_RESPONSE_CACHE = 'aitool_active'  # Compressed response cache name
+
+
+def catalog_version(request=None):
+    """Stamp of the AITool table (also the compressed response cache key), read once per request."""
+    version = getattr(request, 'catalog_version', None)
+    if version is None:
+        from .models import AITool
+
+        version = table_version(AITool)
+        if request is not None:
+            request.catalog_version = version
+    return version
+
+
+def get_active_tool_catalog(request=None):
+    """Serialized active tools, as returned by AIToolViewSet.active."""
+    version = catalog_version(request)
+    cached = cache.get(ACTIVE_TOOLS_CACHE_KEY)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    from .models import AITool
+    from .serializers import AIToolSerializer
+
+    catalog = AIToolSerializer(AITool.objects.filter(is_active=True), many=True).data
+    catalog = [dict(tool) for tool in catalog]
+    cache.set(ACTIVE_TOOLS_CACHE_KEY, (version, catalog), getattr(settings, 'CACHE_TIMEOUT_STATIC', 3600))
+    return catalog
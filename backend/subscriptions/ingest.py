@@ -0,0 +1,187 @@
+"""
+Batched ingest of generation logs into CreditUsage.
+
+The single log_generation endpoint costs ~5 queries per generation. This
+module takes a whole batch and resolves clients, projects and subscriptions
+with one query each, computes costs in memory, bulk inserts the usages and
+applies a single credits_remaining delta per subscription and one
+CostRollup refresh for the whole batch.
+
+Rows may carry an idempotency_key, which becomes the CreditUsage primary
+key; rows whose key already exists for the same client and tool are
+skipped, so a batch can be safely retried or replayed from the write-behind
+spool. A key already taken by a usage of another client or tool is an
+error, not a silent skip.
+"""
+
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework import serializers
+
+from clients.models import Client
+from projects.models import Project
+from search import index as search_index
+from .models import Subscription, CreditUsage, COST_QUANTUM
+from .rollups import refresh_cost_rollup
+from .serializers import GenerationLogSerializer
+
+# Constants
+MAX_BULK_GENERATIONS = 5000  # Upper bound on rows accepted in one request
+BULK_CREATE_BATCH_SIZE = 500  # Rows per INSERT statement
+
+
+def billing_month_for(usage_date):
+    """First day of the month a usage is billed to."""
+    return timezone.localtime(usage_date).date().replace(day=1)
+
+
+def ingest_generations(rows):
+    """
+    Validate and insert a batch of generation dicts.
+
+    Args:
+        rows: list of dicts in the log_generation format, optionally with usage_date
+
+    Returns:
+        tuple: (created, skipped, errors) where created is a list of
+        (index, CreditUsage), skipped lists the indexes of rows whose
+        idempotency_key was already logged for the same client and tool,
+        and errors is a list of
+        {'index': int, 'errors': dict}, all in input order
+    """
+    errors = []
+    valid = []
+    skipped = []
+    seen_keys = set()
+
+    # Pass 1: field validation, no database access. One serializer for the
+    # whole batch: building one per row deep-copies every field each time,
+    # which cost more than the rest of the ingest together.
+    serializer = GenerationLogSerializer()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['Expected an object']}})
+            continue
+        try:
+            data = serializer.run_validation(row)
+        except serializers.ValidationError as e:
+            errors.append({'index': index, 'errors': e.detail})
+            continue
+        data.setdefault('usage_date', timezone.now())
+        key = data.get('idempotency_key')
+        if key is not None:
+            if key in seen_keys:
+                skipped.append(index)
+                continue
+            seen_keys.add(key)
+        valid.append((index, data))
+
+    if seen_keys:
+        already_logged = {
+            pk: (client_id, tool_id)
+            for pk, client_id, tool_id in CreditUsage.objects.filter(pk__in=seen_keys).values_list(
+                'pk', 'client_id', 'subscription__tool_id'
+            )
+        }
+        if already_logged:
+            remaining = []
+            for index, data in valid:
+                logged = already_logged.get(data.get('idempotency_key'))
+                if logged is None:
+                    remaining.append((index, data))
+                elif logged == (data['client_id'], data['tool_id']):
+                    skipped.append(index)
+                else:
+                    # The key is the id of an unrelated usage: not a retry of this row
+                    errors.append({'index': index, 'errors': {
+                        'idempotency_key': ['Already used by a different generation']
+                    }})
+            valid = remaining
+            skipped.sort()
+
+    if not valid:
+        errors.sort(key=lambda error: error['index'])
+        return [], skipped, errors
+
+    # Pass 2: resolve every foreign key with one query per table
+    client_ids = {data['client_id'] for _, data in valid}
+    project_ids = {data['project_id'] for _, data in valid if data.get('project_id')}
+    tool_ids = {data['tool_id'] for _, data in valid}
+    months = {billing_month_for(data['usage_date']) for _, data in valid}
+
+    known_clients = set(
+        Client.objects.filter(pk__in=client_ids).values_list('pk', flat=True)
+    )
+    known_projects = set(
+        Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True)
+    ) if project_ids else set()
+    subscriptions = {
+        (sub.tool_id, sub.billing_month): sub
+        for sub in Subscription.objects.filter(
+            tool_id__in=tool_ids,
+            billing_month__in=months,
+            is_active=True
+        ).select_related('tool')
+    }
+
+    # Pass 3: build usages and compute costs in memory
+    created = []
+    credit_deltas = defaultdict(int)
+    for index, data in valid:
+        row_errors = {}
+        if data['client_id'] not in known_clients:
+            row_errors['client_id'] = ['Client not found']
+        project_id = data.get('project_id')
+        if project_id and project_id not in known_projects:
+            row_errors['project_id'] = ['Project not found']
+        subscription = subscriptions.get((data['tool_id'], billing_month_for(data['usage_date'])))
+        if subscription is None:
+            row_errors['tool_id'] = ['No active subscription found for this tool this month']
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+
+        usage = CreditUsage(
+            id=data.get('idempotency_key') or uuid.uuid4(),
+            subscription=subscription,
+            client_id=data['client_id'],
+            project_id=project_id,
+            generation_type=data['generation_type'],
+            items_generated=data['items_generated'],
+            credits_used=data['credits_used'],
+            video_seconds=data['video_seconds'],
+            description=data['description'],
+            usage_date=data['usage_date'],
+        )
+        # Quantized like the column, so the response matches what is stored
+        usage.calculated_cost_mad = Decimal(usage.calculate_cost()).quantize(COST_QUANTUM)
+        created.append((index, usage))
+        if usage.credits_used > 0:
+            credit_deltas[subscription.pk] += usage.credits_used
+
+    if created:
+        with transaction.atomic():
+            CreditUsage.objects.bulk_create(
+                [usage for _, usage in created],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+            now = timezone.now()
+            for subscription_id, delta in credit_deltas.items():
+                Subscription.objects.filter(
+                    pk=subscription_id,
+                    credits_remaining__isnull=False
+                ).update(
+                    credits_remaining=Greatest(F('credits_remaining') - delta, Value(0)),
+                    updated_at=now
+                )
+            refresh_cost_rollup({(usage.client_id, usage.subscription_id) for _, usage in created})
+            # bulk_create sends no post_save
+            search_index.index_instances('usage', [usage for _, usage in created])
+
+    errors.sort(key=lambda error: error['index'])
+    return created, skipped, errors
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from subscriptions.spool import GenerationSpool
+
+
+class Command(BaseCommand):
+    help = 'Replay the write-behind generation spool into the database (run on startup)'
+
+    def handle(self, *args, **options):
+        spool = GenerationSpool(settings.GENERATION_SPOOL_DIR)
+        pending = spool.stats()['depth']
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('Generation spool is empty'))
+            return
+
+        written = spool.flush()
+        if written is None:
+            self.stdout.write(self.style.WARNING('Another process is flushing the spool, skipped'))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed {written} of {pending} spooled generations')
+        )
@@ -0,0 +1,70 @@
+"""
+Import a tool's usage export, same pipeline as POST /api/subscriptions/usage/import/.
+
+    manage.py import_usage_export kling_ai kling-october.csv --rules rules.json --dry-run
+    manage.py import_usage_export runway tasks.json --client contact@atlas.ma
+"""
+
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from subscriptions.usage_imports import (
+    ADAPTERS, MAX_REPORTED_ERRORS, UsageImportError, import_usage_export,
+)
+
+# Constants
+SHOWN_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Import the usage history exported by an AI tool (CSV, JSON or NDJSON) into credit usages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tool', help=f'AITool name; dedicated adapters: {", ".join(sorted(ADAPTERS))}')
+        parser.add_argument('path', help='Export file (.csv, .json, .ndjson)')
+        parser.add_argument('--rules', help='JSON file of client/project mapping rules')
+        parser.add_argument('--client', help='Client id, email or name for every record (instead of --rules)')
+        parser.add_argument('--project', help='Project id or title of --client')
+        parser.add_argument('--dry-run', action='store_true', help='Report without saving')
+        parser.add_argument('--report', help=f'Write the full report (up to {MAX_REPORTED_ERRORS} errors) as JSON')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} not found')
+        if options['rules']:
+            with open(options['rules'], encoding='utf-8') as rules_file:
+                rules = json.load(rules_file)
+        elif options['client']:
+            rules = {'default': {'client': options['client'], 'project': options['project']}}
+        else:
+            raise CommandError('Give --rules or --client')
+
+        started = time.perf_counter()
+        try:
+            with open(path, 'rb') as export:
+                report = import_usage_export(options['tool'], export, path, rules, dry_run=options['dry_run'])
+        except UsageImportError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for error in report['errors'][:SHOWN_ERRORS]:
+            details = '; '.join(f'{field}: {" ".join(map(str, messages))}'
+                                for field, messages in error['errors'].items())
+            self.stdout.write(self.style.WARNING(f'[WARN] Record {error["record"]}: {details}'))
+        if report['failed'] > SHOWN_ERRORS:
+            self.stdout.write(self.style.WARNING(f'[WARN] ... {report["failed"] - SHOWN_ERRORS} more records failed'))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as report_file:
+                json.dump(report, report_file, indent=2, ensure_ascii=False, default=str)
+
+        prefix = '[DRY RUN]' if options['dry_run'] else '[OK]'
+        summary = (
+            f'{prefix} {report["rows"]} records in {elapsed:.1f}s ({report["adapter"]}): '
+            f'{report["created"]} usages created ({report["cost_mad"]} MAD), '
+            f'{report["skipped"]} already imported, {report["failed"]} failed'
+        )
+        self.stdout.write(self.style.WARNING(summary) if options['dry_run'] else self.style.SUCCESS(summary))
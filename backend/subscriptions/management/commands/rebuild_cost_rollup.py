@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from subscriptions.rollups import rebuild_cost_rollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the client x tool x month CostRollup table from credit usages'
+
+    def handle(self, *args, **options):
+        written = rebuild_cost_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} cost rollup rows'))
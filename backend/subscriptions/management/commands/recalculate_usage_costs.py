@@ -0,0 +1,75 @@
+"""
+Management command to recompute stale CreditUsage costs.
+Run with: python manage.py recalculate_usage_costs [--tool kling_ai] [--month 2025-12] [--dry-run]
+"""
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions.models import Subscription
+from subscriptions.recalculation import recalculate_usage_costs
+
+# Constants
+DIFF_PREVIEW_LIMIT = 50  # Changed usages listed in the output
+
+
+class Command(BaseCommand):
+    help = "Recompute calculated_cost_mad for usages from their subscription's current cost"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the cost diff without applying it',
+        )
+        parser.add_argument(
+            '--subscription',
+            action='append',
+            default=[],
+            help='Subscription id to recalculate (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--tool',
+            help='Only subscriptions of this AI tool (AITool.name)',
+        )
+        parser.add_argument(
+            '--month',
+            help='Only subscriptions billed in this month (YYYY-MM)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        subscriptions = Subscription.objects.all()
+        if options['subscription']:
+            subscriptions = subscriptions.filter(pk__in=options['subscription'])
+        if options['tool']:
+            subscriptions = subscriptions.filter(tool__name=options['tool'])
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must be in YYYY-MM format')
+            subscriptions = subscriptions.filter(billing_month=month)
+
+        changes = recalculate_usage_costs(subscriptions, dry_run=dry_run)
+
+        if not changes:
+            self.stdout.write(self.style.SUCCESS('[OK] All usage costs are up to date'))
+            return
+
+        self.stdout.write(f'\n{len(changes)} usages with a stale cost:\n')
+        for change in changes[:DIFF_PREVIEW_LIMIT]:
+            self.stdout.write(
+                f"  {change['usage_id']}: {change['old_cost_mad']} -> {change['new_cost_mad']} MAD"
+            )
+        if len(changes) > DIFF_PREVIEW_LIMIT:
+            self.stdout.write(f'  ... and {len(changes) - DIFF_PREVIEW_LIMIT} more')
+
+        delta = sum(change['new_cost_mad'] - change['old_cost_mad'] for change in changes)
+        self.stdout.write(f'\nTotal cost change: {delta:+} MAD')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('\n[DRY RUN] No changes applied.'))
+            self.stdout.write('Run without --dry-run to apply changes.')
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'\n[OK] Recalculated {len(changes)} usage costs'))
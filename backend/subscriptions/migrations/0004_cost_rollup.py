@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:32
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+from django.db.models import Sum, Count, F
+from django.db.models.functions import Coalesce
+
+
+def backfill_cost_rollup(apps, schema_editor):
+    CreditUsage = apps.get_model('subscriptions', 'CreditUsage')
+    CostRollup = apps.get_model('subscriptions', 'CostRollup')
+
+    rows = CreditUsage.objects.values(
+        'client_id',
+        tool_id=F('subscription__tool_id'),
+        month=F('subscription__billing_month'),
+    ).annotate(
+        total_cost_mad=Sum('calculated_cost_mad'),
+        final_cost_mad=Sum(Coalesce('manual_cost_mad', 'calculated_cost_mad')),
+        total_credits_used=Sum('credits_used'),
+        total_items_generated=Sum('items_generated'),
+        usage_count=Count('id'),
+    ).order_by()
+
+    CostRollup.objects.bulk_create(
+        [CostRollup(**row) for row in rows],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_client_address_line1_client_address_line2_and_more'),
+        ('subscriptions', '0003_add_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('total_cost_mad', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('final_cost_mad', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_credits_used', models.IntegerField(default=0)),
+                ('total_items_generated', models.IntegerField(default=0)),
+                ('usage_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_rollups', to='clients.client')),
+                ('tool', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_rollups', to='subscriptions.aitool')),
+            ],
+            options={
+                'verbose_name': 'Cumul des coûts',
+                'verbose_name_plural': 'Cumuls des coûts',
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month'], name='subscriptio_month_c75c7c_idx')],
+                'unique_together': {('client', 'tool', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_cost_rollup, migrations.RunPython.noop),
+    ]
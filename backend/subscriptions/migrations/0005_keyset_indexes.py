@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0002_client_address_line1_client_address_line2_and_more'),
+        ('projects', '0003_keyset_indexes'),
+        ('subscriptions', '0004_cost_rollup'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='creditusage',
+            name='subscriptio_usage_d_035fd9_idx',
+        ),
+        migrations.AddIndex(
+            model_name='creditusage',
+            index=models.Index(fields=['usage_date', 'id'], name='subscriptio_usage_d_8c57b3_idx'),
+        ),
+    ]
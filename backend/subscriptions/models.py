@@ -7,6 +7,8 @@ from projects.models import Project
 
 # Constants
 BASELINE_ITEMS_PER_MONTH = 100  # Estimated items per month for cost calculation fallback
+COST_QUANTUM = Decimal('0.01')  # MAD amounts have 2 decimal places
+COST_BASIS_FIELDS = ('total_cost_mad', 'total_credits')  # Inputs of CreditUsage.calculate_cost
 
 
 class AITool(models.Model):
@@ -118,6 +120,7 @@ class AITool(models.Model):
 
     icon = models.CharField(max_length=50, blank=True)
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['display_name']
@@ -128,6 +131,75 @@ class AITool(models.Model):
         return self.display_name
 
 
+# Fields of CreditUsage.update() that move a usage to another rollup key
+ROLLUP_KEY_FIELDS = {'client': 'client_id', 'client_id': 'client_id',
+                     'subscription': 'subscription_id', 'subscription_id': 'subscription_id'}
+# Fields summed into CostRollup; updates of other fields leave it alone
+ROLLUP_VALUE_FIELDS = {'calculated_cost_mad', 'manual_cost_mad', 'credits_used', 'items_generated'}
+
+
+class SubscriptionQuerySet(models.QuerySet):
+    """Bulk deletes/updates (admin actions) keep CostRollup in step like the model methods."""
+
+    def delete(self):
+        keys = list(self.order_by().values_list('tool_id', 'billing_month'))
+        result = super().delete()
+        # Usages cascade with their subscription; one subscription per tool and month
+        for tool_id, month in keys:
+            CostRollup.objects.filter(tool_id=tool_id, month=month).delete()
+        return result
+
+    def update(self, **kwargs):
+        if not {'tool', 'tool_id', 'billing_month'}.intersection(kwargs):
+            return super().update(**kwargs)
+        from .rollups import refresh_cost_rollup
+
+        subscriptions = list(self.order_by().values_list('pk', 'tool_id', 'billing_month'))
+        rows = super().update(**kwargs)
+        # The usages' rollup key (tool, month) moved: drop the old rows, rebuild the new ones
+        for _, tool_id, month in subscriptions:
+            CostRollup.objects.filter(tool_id=tool_id, month=month).delete()
+        refresh_cost_rollup(CreditUsage.objects.filter(
+            subscription_id__in=[pk for pk, _, _ in subscriptions]
+        ).order_by().values_list('client_id', 'subscription_id').distinct())
+        return rows
+
+
+class CreditUsageQuerySet(models.QuerySet):
+    """Bulk deletes/updates (admin actions) keep CostRollup in step like save()/delete()."""
+
+    def _rollup_keys(self):
+        return set(self.order_by().values_list('client_id', 'subscription_id').distinct())
+
+    def delete(self):
+        from .rollups import refresh_cost_rollup
+
+        keys = self._rollup_keys()
+        result = super().delete()
+        refresh_cost_rollup(keys)
+        return result
+
+    def update(self, **kwargs):
+        if not (ROLLUP_VALUE_FIELDS | set(ROLLUP_KEY_FIELDS)).intersection(kwargs):
+            return super().update(**kwargs)
+        from .rollups import refresh_cost_rollup, rebuild_cost_rollup
+
+        keys = self._rollup_keys()
+        rows = super().update(**kwargs)
+        moved = {ROLLUP_KEY_FIELDS[name]: value for name, value in kwargs.items() if name in ROLLUP_KEY_FIELDS}
+        if any(hasattr(value, 'resolve_expression') for value in moved.values()):
+            # New keys are computed per row in SQL, unknown here
+            rebuild_cost_rollup()
+            return rows
+
+        moved = {name: value.pk if isinstance(value, models.Model) else value for name, value in moved.items()}
+        refresh_cost_rollup(keys | {
+            (moved.get('client_id', client_id), moved.get('subscription_id', subscription_id))
+            for client_id, subscription_id in keys
+        })
+        return rows
+
+
 class Subscription(models.Model):
     """
     Monthly subscription to an AI tool.
@@ -183,6 +255,8 @@ class Subscription(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = SubscriptionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-billing_month']
         unique_together = ['tool', 'billing_month']
@@ -210,10 +284,30 @@ class Subscription(models.Model):
         total = self.usages.aggregate(total=models.Sum('credits_used'))['total']
         return total or 0
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the cost basis so edits can detect when usage costs go stale
+        instance._loaded_cost_basis = instance._cost_basis()
+        return instance
+
+    def _cost_basis(self):
+        """(total_cost_mad, total_credits), None while either is deferred (.only()/.defer())."""
+        if self.get_deferred_fields().intersection(COST_BASIS_FIELDS):
+            return None
+        return (self.total_cost_mad, self.total_credits)
+
+    def delete(self, *args, **kwargs):
+        # Usages cascade with the subscription, so their rollup rows go too
+        CostRollup.objects.filter(tool_id=self.tool_id, month=self.billing_month).delete()
+        return super().delete(*args, **kwargs)
+
     def save(self, *args, **kwargs):
         # Calculate MAD amount from foreign currency if needed
         if self.original_currency != 'MAD' and self.original_amount and self.exchange_rate:
-            self.total_cost_mad = self.original_amount * self.exchange_rate
+            # Rounded like the column, or the unrounded product would never
+            # match the stored value and every save would look like a correction
+            self.total_cost_mad = (self.original_amount * self.exchange_rate).quantize(COST_QUANTUM)
 
         # Initialize remaining credits
         if self.credits_remaining is None and self.total_credits:
@@ -221,6 +315,19 @@ class Subscription(models.Model):
 
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not set(update_fields).intersection(COST_BASIS_FIELDS):
+            return
+
+        # Recompute usage costs if total_cost_mad or total_credits was corrected.
+        # Unknown when they were not loaded: the row is left as it is.
+        loaded = getattr(self, '_loaded_cost_basis', None)
+        current = self._cost_basis()
+        if loaded is not None and current is not None and loaded != current:
+            from .recalculation import recalculate_usage_costs
+            recalculate_usage_costs([self.pk])
+        self._loaded_cost_basis = current
+
 
 class CreditUsage(models.Model):
     """
@@ -281,6 +388,8 @@ class CreditUsage(models.Model):
     usage_date = models.DateTimeField(default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CreditUsageQuerySet.as_manager()
+
     class Meta:
         ordering = ['-usage_date']
         verbose_name = "Utilisation"
@@ -288,13 +397,23 @@ class CreditUsage(models.Model):
         indexes = [
             models.Index(fields=['client']),
             models.Index(fields=['subscription']),
-            models.Index(fields=['usage_date']),
+            models.Index(fields=['usage_date', 'id']),  # Date ranges, keyset pagination
             models.Index(fields=['client', 'usage_date']),
         ]
 
     def __str__(self):
         return f"{self.client.name} - {self.subscription.tool.display_name} ({self.items_generated} items)"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the row was rolled up so a moved usage refreshes both keys
+        instance._loaded_rollup_key = (
+            instance.__dict__.get('client_id'),
+            instance.__dict__.get('subscription_id'),
+        )
+        return instance
+
     @property
     def final_cost_mad(self):
         """Return manual cost if set, otherwise calculated cost."""
@@ -347,6 +466,67 @@ class CreditUsage(models.Model):
 
         super().save(*args, **kwargs)
 
+        from .rollups import refresh_cost_rollup
+        refresh_cost_rollup(self._rollup_keys())
+
+    def delete(self, *args, **kwargs):
+        keys = self._rollup_keys()
+        result = super().delete(*args, **kwargs)
+
+        from .rollups import refresh_cost_rollup
+        refresh_cost_rollup(keys)
+        return result
+
+    def _rollup_keys(self):
+        """(client_id, subscription_id) pairs whose CostRollup rows this usage affects."""
+        keys = {(self.client_id, self.subscription_id)}
+        loaded = getattr(self, '_loaded_rollup_key', None)
+        if loaded and None not in loaded:
+            keys.add(loaded)
+        return keys
+
+
+class CostRollup(models.Model):
+    """
+    Pre-aggregated usage cost per client, tool and billing month.
+    Kept in sync by subscriptions.rollups.refresh_cost_rollup whenever usages
+    are written; rebuild from scratch with `manage.py rebuild_cost_rollup`.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        related_name='cost_rollups'
+    )
+    tool = models.ForeignKey(
+        AITool,
+        on_delete=models.CASCADE,
+        related_name='cost_rollups'
+    )
+    # Billing month of the subscription the usages belong to
+    month = models.DateField()
+
+    total_cost_mad = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Same total with manual_cost_mad overrides applied
+    final_cost_mad = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_credits_used = models.IntegerField(default=0)
+    total_items_generated = models.IntegerField(default=0)
+    usage_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-month']
+        unique_together = ['client', 'tool', 'month']
+        verbose_name = "Cumul des coûts"
+        verbose_name_plural = "Cumuls des coûts"
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+
+    def __str__(self):
+        return f"{self.client.name} - {self.tool.display_name} ({self.month.strftime('%Y-%m')})"
+
 
 class ClientServiceSelection(models.Model):
     """Which services/tools are assigned to each client."""
@@ -0,0 +1,81 @@
+"""
+Recalculation of stale CreditUsage.calculated_cost_mad values.
+
+calculated_cost_mad is computed once at save time from the subscription's
+cost basis. When a subscription's total_cost_mad or total_credits is
+corrected, this module recomputes every affected usage in memory with the
+same CreditUsage.calculate_cost rules, writes only the rows that changed
+with chunked bulk_update; CreditUsageQuerySet.update(), which bulk_update
+goes through, refreshes the matching CostRollup rows.
+"""
+
+from decimal import Decimal
+from django.db import transaction
+
+from .models import Subscription, CreditUsage, COST_QUANTUM
+
+# Constants
+RECALCULATION_CHUNK_SIZE = 2000  # Usages read per round trip
+RECALCULATION_BATCH_SIZE = 500  # Usages per UPDATE statement
+
+USAGE_COST_FIELDS = [
+    'id', 'client_id', 'subscription_id', 'generation_type', 'credits_used',
+    'items_generated', 'video_seconds', 'calculated_cost_mad', 'manual_cost_mad',
+]
+
+
+def recalculate_usage_costs(subscriptions, dry_run=False):
+    """
+    Recompute calculated_cost_mad for every usage of the given subscriptions.
+
+    Usages with a manual_cost_mad override are left alone, as in CreditUsage.save.
+
+    Args:
+        subscriptions: Subscription queryset or iterable of subscription ids
+        dry_run: compute the diff without writing anything
+
+    Returns:
+        list: one dict per changed usage with usage_id, subscription_id,
+        client_id, old_cost_mad and new_cost_mad
+    """
+    if not hasattr(subscriptions, 'select_related'):
+        subscriptions = Subscription.objects.filter(pk__in=list(subscriptions))
+    subscriptions = {sub.pk: sub for sub in subscriptions.select_related('tool')}
+    if not subscriptions:
+        return []
+
+    changes = []
+    pending = []
+    usages = CreditUsage.objects.filter(
+        subscription_id__in=subscriptions.keys(),
+        manual_cost_mad__isnull=True
+    ).only(*USAGE_COST_FIELDS).order_by()
+
+    with transaction.atomic():
+        for usage in usages.iterator(chunk_size=RECALCULATION_CHUNK_SIZE):
+            # Reuse the loaded subscription so calculate_cost never hits the database
+            usage.subscription = subscriptions[usage.subscription_id]
+            new_cost = Decimal(usage.calculate_cost()).quantize(COST_QUANTUM)
+            if new_cost == usage.calculated_cost_mad:
+                continue
+
+            changes.append({
+                'usage_id': usage.pk,
+                'subscription_id': usage.subscription_id,
+                'client_id': usage.client_id,
+                'old_cost_mad': usage.calculated_cost_mad,
+                'new_cost_mad': new_cost,
+            })
+            if dry_run:
+                continue
+
+            usage.calculated_cost_mad = new_cost
+            pending.append(usage)
+            if len(pending) >= RECALCULATION_BATCH_SIZE:
+                CreditUsage.objects.bulk_update(pending, ['calculated_cost_mad'])
+                pending = []
+
+        if pending:
+            CreditUsage.objects.bulk_update(pending, ['calculated_cost_mad'])
+
+    return changes
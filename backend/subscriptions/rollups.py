@@ -0,0 +1,130 @@
+"""
+Maintenance of the CostRollup table (client x tool x billing month).
+
+Rollup rows are always recomputed from CreditUsage for the affected keys
+rather than patched with deltas, so edits that move a usage between
+clients or subscriptions, manual cost overrides and deletes all stay exact.
+
+Model save()/delete() and the CreditUsage/Subscription querysets'
+delete() and update() (admin bulk actions included) keep the table
+current. Raw SQL and update() with expressions on client/subscription do
+not: run `manage.py rebuild_cost_rollup` after those.
+"""
+
+from django.db import transaction
+from django.db.models import Sum, Count, F, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from .models import Subscription, CreditUsage, CostRollup
+
+# Constants
+ROLLUP_BATCH_SIZE = 500  # Rows per upsert statement
+
+ROLLUP_UPDATE_FIELDS = [
+    'total_cost_mad', 'final_cost_mad', 'total_credits_used',
+    'total_items_generated', 'usage_count', 'updated_at',
+]
+
+
+def _aggregate(usages):
+    """Group usages by rollup key. Returns a values() queryset of rollup dicts."""
+    return usages.values(
+        'client_id',
+        tool_id=F('subscription__tool_id'),
+        month=F('subscription__billing_month'),
+    ).annotate(
+        total_cost_mad=Coalesce(Sum('calculated_cost_mad'), Value(0), output_field=DecimalField()),
+        final_cost_mad=Coalesce(
+            Sum(Coalesce('manual_cost_mad', 'calculated_cost_mad')),
+            Value(0),
+            output_field=DecimalField()
+        ),
+        total_credits_used=Coalesce(Sum('credits_used'), Value(0)),
+        total_items_generated=Coalesce(Sum('items_generated'), Value(0)),
+        usage_count=Count('id'),
+    ).order_by()
+
+
+def _upsert(rows):
+    CostRollup.objects.bulk_create(
+        [CostRollup(**row) for row in rows],
+        batch_size=ROLLUP_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['client', 'tool', 'month'],
+        update_fields=ROLLUP_UPDATE_FIELDS,
+    )
+
+
+def _normalize_pairs(pairs):
+    """
+    Coerce ids to the types values() returns (UUID): views pass the strings
+    from request data, and a string key would never match its recomputed row.
+    """
+    client_pk = CreditUsage._meta.get_field('client').target_field
+    subscription_pk = CreditUsage._meta.get_field('subscription').target_field
+    return {
+        (client_pk.to_python(client_id), subscription_pk.to_python(subscription_id))
+        for client_id, subscription_id in pairs
+        if client_id is not None and subscription_id is not None
+    }
+
+
+def refresh_cost_rollup(pairs):
+    """
+    Recompute the rollup rows touched by a set of usages.
+
+    Args:
+        pairs: iterable of (client_id, subscription_id) for the written/deleted usages
+    """
+    pairs = _normalize_pairs(pairs)
+    if not pairs:
+        return
+
+    subscription_keys = {
+        pk: (tool_id, month)
+        for pk, tool_id, month in Subscription.objects.filter(
+            pk__in={subscription_id for _, subscription_id in pairs}
+        ).values_list('pk', 'tool_id', 'billing_month')
+    }
+    keys = {
+        (client_id,) + subscription_keys[subscription_id]
+        for client_id, subscription_id in pairs
+        if subscription_id in subscription_keys
+    }
+    if not keys:
+        return
+
+    client_ids = {key[0] for key in keys}
+    tool_ids = {key[1] for key in keys}
+    months = {key[2] for key in keys}
+
+    # One grouped query over the (small) superset of affected keys
+    rows = [
+        row for row in _aggregate(CreditUsage.objects.filter(
+            client_id__in=client_ids,
+            subscription__tool_id__in=tool_ids,
+            subscription__billing_month__in=months,
+        ))
+        if (row['client_id'], row['tool_id'], row['month']) in keys
+    ]
+    emptied = keys - {(row['client_id'], row['tool_id'], row['month']) for row in rows}
+
+    with transaction.atomic():
+        if rows:
+            _upsert(rows)
+        for client_id, tool_id, month in emptied:
+            CostRollup.objects.filter(client_id=client_id, tool_id=tool_id, month=month).delete()
+
+
+def rebuild_cost_rollup():
+    """
+    Rebuild the whole rollup table from CreditUsage.
+
+    Returns:
+        int: number of rollup rows written
+    """
+    rows = list(_aggregate(CreditUsage.objects.all()))
+    with transaction.atomic():
+        CostRollup.objects.all().delete()
+        _upsert(rows)
+    return len(rows)
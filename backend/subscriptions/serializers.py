@@ -2,6 +2,7 @@ from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from decimal import Decimal
 from .models import AITool, Subscription, CreditUsage, ClientServiceSelection
+from config.sparse_fields import SparseFieldsSerializerMixin
 
 
 def remove_unique_together_validators(serializer):
@@ -12,7 +13,7 @@ def remove_unique_together_validators(serializer):
     ]
 
 
-class AIToolSerializer(serializers.ModelSerializer):
+class AIToolSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     # Add validation for numeric fields
     default_monthly_cost_mad = serializers.DecimalField(
         max_digits=10, decimal_places=2,
@@ -49,14 +50,14 @@ class AIToolSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Read serializer for subscriptions with computed fields."""
     tool_name = serializers.CharField(source='tool.display_name', read_only=True)
     tool_type = serializers.CharField(source='tool.tool_type', read_only=True)
     cost_per_credit_mad = serializers.DecimalField(
         max_digits=10, decimal_places=4, read_only=True
     )
-    credits_used = serializers.IntegerField(read_only=True)
+    credits_used = serializers.SerializerMethodField()
     # Validation for writable numeric fields
     total_cost_mad = serializers.DecimalField(
         max_digits=10, decimal_places=2,
@@ -90,6 +91,17 @@ class SubscriptionSerializer(serializers.ModelSerializer):
             'notes', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        expandable_fields = ['credits_used']
+        field_dependencies = {
+            'credits_used': ['_credits_used'],
+            'cost_per_credit_mad': ['total_cost_mad', 'total_credits'],
+        }
+
+    def get_credits_used(self, obj):
+        """Use annotated field if available, else fallback to property."""
+        if hasattr(obj, '_credits_used'):
+            return obj._credits_used or 0
+        return obj.credits_used
 
 
 class SubscriptionCreateSerializer(serializers.ModelSerializer):
@@ -130,7 +142,7 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         remove_unique_together_validators(self)
 
 
-class CreditUsageSerializer(serializers.ModelSerializer):
+class CreditUsageSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     tool_name = serializers.CharField(
         source='subscription.tool.display_name',
         read_only=True
@@ -171,6 +183,7 @@ class CreditUsageSerializer(serializers.ModelSerializer):
             'final_cost_mad', 'created_at'
         ]
         read_only_fields = ['id', 'calculated_cost_mad', 'created_at']
+        field_dependencies = {'final_cost_mad': ['manual_cost_mad', 'calculated_cost_mad']}
 
 
 class CreditUsageCreateSerializer(serializers.ModelSerializer):
@@ -203,6 +216,37 @@ class CreditUsageCreateSerializer(serializers.ModelSerializer):
         ]
 
 
+class GenerationLogSerializer(serializers.Serializer):
+    """
+    One row of a bulk log_generation payload.
+    Foreign keys are plain UUIDs here - existence is checked in batch by the ingest.
+    """
+    tool_id = serializers.UUIDField()
+    client_id = serializers.UUIDField()
+    project_id = serializers.UUIDField(required=False, allow_null=True)
+    generation_type = serializers.ChoiceField(
+        choices=CreditUsage.GENERATION_TYPES, required=False, default='image'
+    )
+    credits_used = serializers.IntegerField(
+        min_value=0, max_value=1000000,
+        required=False, default=0
+    )
+    items_generated = serializers.IntegerField(
+        min_value=0, max_value=100000,
+        required=False, default=1
+    )
+    video_seconds = serializers.IntegerField(
+        min_value=0, max_value=86400,
+        required=False, default=0
+    )
+    description = serializers.CharField(
+        max_length=500, required=False, allow_blank=True, default=''
+    )
+    usage_date = serializers.DateTimeField(required=False)
+    # Used as the CreditUsage primary key so retried/replayed rows are not inserted twice
+    idempotency_key = serializers.UUIDField(required=False)
+
+
 class ClientServiceSelectionSerializer(serializers.ModelSerializer):
     """Read serializer for client service selections."""
     tool_name = serializers.CharField(source='tool.display_name', read_only=True)
@@ -212,9 +256,9 @@ class ClientServiceSelectionSerializer(serializers.ModelSerializer):
         model = ClientServiceSelection
         fields = [
             'id', 'client', 'tool', 'tool_name', 'tool_type',
-            'is_active', 'notes', 'created_at', 'updated_at'
+            'is_active', 'notes', 'added_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'added_at']
 
 
 class ClientServiceSelectionCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,278 @@
+"""
+Write-behind spool for generation logs.
+
+When GENERATION_SPOOL_ENABLED is set, deferred log_generation calls are
+validated, appended to a local NDJSON spool file and acknowledged with an
+idempotency key straight away. A background flusher thread then moves the
+spooled rows into CreditUsage in large transactions through
+ingest_generations, so request latency no longer waits on the SQLite
+write lock.
+
+Files in GENERATION_SPOOL_DIR:
+    active.ndjson      rows accepted since the last rotation
+    segment-*.ndjson   rotated rows waiting to be flushed (replayed after a crash)
+    rejected.ndjson    rows that failed at flush time, with their errors
+
+Every worker process runs its own flusher, started by gunicorn's
+post_worker_init hook (gunicorn.conf.py) so segments left by a crash are
+replayed as soon as the workers are up, or on first use under runserver.
+File locks make sure only one of them flushes at a time and that appends
+never interleave with rotation. Rejected rows are logged, counted in
+generation_spool_rejected_total (/api/metrics/) and in spool_status.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from config import metrics
+from .ingest import ingest_generations, MAX_BULK_GENERATIONS
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    # Windows dev machines: fall back to in-process locks (single runserver process)
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Constants
+DEFAULT_FLUSH_INTERVAL = 2  # Seconds between flushes
+
+
+class GenerationSpool:
+    """Durable append-only spool of accepted generation rows."""
+
+    _process_locks = {}
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.active_path = os.path.join(self.directory, 'active.ndjson')
+        self.rejected_path = os.path.join(self.directory, 'rejected.ndjson')
+        self.last_flush_at = None
+        self.last_flush_rows = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @contextmanager
+    def _lock(self, name, blocking=True):
+        """Exclusive lock shared by every worker process. Yields False if busy and non-blocking."""
+        if not FCNTL_AVAILABLE:
+            lock = self._process_locks.setdefault(name, threading.Lock())
+            acquired = lock.acquire(blocking)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    lock.release()
+            return
+
+        with open(os.path.join(self.directory, f'{name}.lock'), 'a') as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'segment-*.ndjson')))
+
+    def append(self, rows):
+        """
+        Durably append rows (already field-validated) to the spool.
+
+        Rows without usage_date get the acceptance time, so deferred rows are
+        billed to the month they were logged in, not the month they are flushed.
+
+        Returns:
+            list: idempotency keys, one per row
+        """
+        accepted_at = timezone.now().isoformat()
+        keys = []
+        lines = []
+        for row in rows:
+            record = dict(row)
+            record['idempotency_key'] = str(record.get('idempotency_key') or uuid.uuid4())
+            record.setdefault('usage_date', accepted_at)
+            record['accepted_at'] = accepted_at
+            keys.append(record['idempotency_key'])
+            lines.append(json.dumps(record, default=str))
+
+        payload = ('\n'.join(lines) + '\n').encode('utf-8')
+        with self._lock('append'):
+            with open(self.active_path, 'ab') as spool_file:
+                spool_file.write(payload)
+                spool_file.flush()
+                os.fsync(spool_file.fileno())
+        return keys
+
+    def _rotate(self):
+        """Move the active file aside so appends continue while it is flushed."""
+        with self._lock('append'):
+            if os.path.exists(self.active_path) and os.path.getsize(self.active_path) > 0:
+                segment = os.path.join(
+                    self.directory, f'segment-{time.time_ns()}-{os.getpid()}.ndjson'
+                )
+                os.replace(self.active_path, segment)
+
+    def _read_rows(self, path):
+        rows = []
+        with open(path, 'rb') as spool_file:
+            for line_number, line in enumerate(spool_file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # A torn final line from a crash mid-append; it was never acknowledged
+                    logger.warning('Skipping unreadable spool line %s in %s', line_number, path)
+        return rows
+
+    def _reject(self, batch, errors):
+        with open(self.rejected_path, 'a', encoding='utf-8') as rejected_file:
+            for error in errors:
+                rejected_file.write(json.dumps({
+                    'row': batch[error['index']],
+                    'errors': error['errors'],
+                    'rejected_at': timezone.now().isoformat(),
+                }, default=str) + '\n')
+        metrics.inc('generation_spool_rejected_total', {}, len(errors))
+        logger.warning('Rejected %s spooled generations, see %s', len(errors), self.rejected_path)
+
+    def _flush_segment(self, segment):
+        rows = self._read_rows(segment)
+        written = 0
+        for start in range(0, len(rows), MAX_BULK_GENERATIONS):
+            batch = rows[start:start + MAX_BULK_GENERATIONS]
+            created, skipped, errors = ingest_generations(batch)
+            written += len(created)
+            if errors:
+                self._reject(batch, errors)
+        # Only drop the segment once every batch committed; a crash before this
+        # replays it and idempotency keys skip the rows already written
+        os.remove(segment)
+        return written
+
+    def flush(self):
+        """
+        Flush every pending segment into the database.
+
+        Returns:
+            int or None: rows written, or None if another process is flushing
+        """
+        with self._lock('flush', blocking=False) as acquired:
+            if not acquired:
+                return None
+            self._rotate()
+            written = 0
+            for segment in self._segments():
+                written += self._flush_segment(segment)
+            self.last_flush_at = timezone.now()
+            self.last_flush_rows = written
+            return written
+
+    def stats(self):
+        """Spool depth and flush lag for monitoring."""
+        depth = 0
+        size = 0
+        oldest_accepted_at = None
+        paths = self._segments() + [self.active_path]
+        for path in paths:
+            try:
+                with open(path, 'rb') as spool_file:
+                    first_line = spool_file.readline()
+                    data = first_line + spool_file.read()
+            except FileNotFoundError:
+                continue
+            depth += data.count(b'\n')
+            size += len(data)
+            if oldest_accepted_at is None and first_line.strip():
+                try:
+                    oldest_accepted_at = datetime.fromisoformat(json.loads(first_line)['accepted_at'])
+                except (ValueError, KeyError):
+                    pass
+
+        try:
+            with open(self.rejected_path, 'rb') as rejected_file:
+                rejected = sum(1 for _ in rejected_file)
+        except FileNotFoundError:
+            rejected = 0
+
+        flush_lag = (timezone.now() - oldest_accepted_at).total_seconds() if oldest_accepted_at else 0
+        return {
+            'enabled': spool_enabled(),
+            'depth': depth,
+            'bytes': size,
+            'segments': len(paths) - 1,
+            'oldest_accepted_at': oldest_accepted_at,
+            'flush_lag_seconds': round(flush_lag, 3),
+            'last_flush_at': self.last_flush_at,
+            'last_flush_rows': self.last_flush_rows,
+            'rejected': rejected,
+        }
+
+
+class SpoolFlusher(threading.Thread):
+    """Daemon thread that flushes the spool every `interval` seconds."""
+
+    def __init__(self, spool, interval=DEFAULT_FLUSH_INTERVAL):
+        super().__init__(name='generation-spool-flusher', daemon=True)
+        self.spool = spool
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        # First pass runs immediately so segments left by a crash are replayed on startup
+        while not self._stop_event.is_set():
+            try:
+                self.spool.flush()
+            except Exception:
+                # Segment stays on disk and is retried next round (e.g. database locked)
+                logger.exception('Generation spool flush failed')
+            finally:
+                close_old_connections()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def spool_enabled():
+    return getattr(settings, 'GENERATION_SPOOL_ENABLED', False)
+
+
+def get_spool():
+    """
+    Return the process-wide spool, starting its flusher thread on first use
+    and again in a forked worker (the thread does not survive the fork).
+    """
+    global _spool
+    spool = _spool
+    if spool is not None and spool.pid == os.getpid():
+        return spool
+    with _spool_lock:
+        if _spool is None or _spool.pid != os.getpid():
+            _spool = GenerationSpool(settings.GENERATION_SPOOL_DIR)
+            _spool.pid = os.getpid()
+            interval = getattr(settings, 'GENERATION_SPOOL_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+            SpoolFlusher(_spool, interval).start()
+        return _spool
@@ -1,3 +1,327 @@
+import json
+import os
+import tempfile
+import uuid
+import warnings
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.paginator import UnorderedObjectListWarning
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from subscriptions.models import AITool, CostRollup, CreditUsage, Subscription
+from subscriptions.spool import GenerationSpool
+from clients.models import Client
+from config.query_budget import seed_budget_dataset
+
+
+class UsageExportImportTests(APITestCase):
+    """Tool exports map to clients by rule and dedupe on the tool's generation id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.user = User.objects.create_user(username='usage-import', password='usage-import')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def upload(self, records):
+        upload = SimpleUploadedFile('export.json', json.dumps(records).encode(), content_type='application/json')
+        rules = {'rules': [{'match': {'description': '*ramadan*'}, 'client': 'budget0@example.ma'}]}
+        return self.client.post('/api/subscriptions/usage/import/', {
+            'tool': 'budget_tool_0', 'file': upload, 'rules': json.dumps(rules),
+        }, format='multipart')
+
+    def test_import_maps_and_dedupes(self):
+        now = timezone.now().isoformat()
+        records = [
+            {'id': 'g1', 'created_at': now, 'type': 'image', 'credits': 10, 'prompt': 'Ramadan poster'},
+            {'id': 'g2', 'created_at': now, 'type': 'video', 'duration': '0:10', 'prompt': 'ramadan teaser'},
+            {'id': 'g3', 'created_at': now, 'prompt': 'unrelated'},
+        ]
+        response = self.upload(records)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['errors'][0]['record'], 3)
+        self.assertEqual(CreditUsage.objects.filter(client__email='budget0@example.ma', video_seconds=10).count(), 1)
+
+        response = self.upload(records[:2])
+        self.assertEqual((response.data['created'], response.data['skipped']), (0, 2))
+
+
+class ClientServiceSelectionTests(APITestCase):
+    """Client service selections list with the model's own timestamp field."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.user = User.objects.create_user(username='selections', password='selections')
+
+    def test_list_fields(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/subscriptions/client-services/')
+        self.assertEqual(response.status_code, 200)
+        selection = response.json()['results'][0]
+        self.assertEqual(selection['tool_name'], 'budget tool 0')
+        self.assertIn('added_at', selection)
+        self.assertNotIn('created_at', selection)
+
+class SubscriptionListTests(APITestCase):
+    """Subscriptions list newest month first, annotated or not."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='subscriptions', password='subscriptions')
+        months = [date(2026, month, 1) for month in (3, 1, 2)]
+        for index, name in enumerate(['order_a', 'order_b']):
+            tool = AITool.objects.create(name=name, display_name=name, tool_type='image')
+            for month in months:
+                Subscription.objects.create(tool=tool, billing_month=month, total_cost_mad=100 + index)
+
+    def test_list_keeps_its_order(self):
+        self.client.force_authenticate(self.user)
+        expected = list(Subscription.objects.order_by('-billing_month', 'pk').values_list('pk', flat=True))
+        for params in ({}, {'fields': 'id,billing_month'}):
+            with warnings.catch_warnings():
+                warnings.simplefilter('error', UnorderedObjectListWarning)
+                response = self.client.get('/api/subscriptions/subscriptions/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [row['id'] for row in response.json()['results']],
+                [str(pk) for pk in expected],
+                params
+            )
+
+class CostRollupTests(APITestCase):
+    """CostRollup rows follow usages written through the API and bulk querysets."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.user = User.objects.create_user(username='rollup', password='rollup')
+        cls.tool = AITool.objects.get(name='budget_tool_0')
+        cls.customer = Client.objects.get(email='budget0@example.ma')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def rollup(self):
+        return list(CostRollup.objects.filter(client=self.customer, tool=self.tool).values_list(
+            'usage_count', 'total_credits_used'
+        ))
+
+    def test_log_generation_updates_rollup(self):
+        self.assertEqual(self.rollup(), [(6, 60)])
+        response = self.client.post('/api/subscriptions/usage/log_generation/', {
+            'tool_id': str(self.tool.pk), 'client_id': str(self.customer.pk), 'credits_used': 7,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.rollup(), [(7, 67)])
+
+    def test_queryset_delete_and_update(self):
+        usages = CreditUsage.objects.filter(client=self.customer)
+        usages.filter(pk=usages.first().pk).delete()
+        self.assertEqual(self.rollup(), [(5, 50)])
+
+        usages.update(credits_used=1)
+        self.assertEqual(self.rollup(), [(5, 5)])
+
+        other = Client.objects.create(name='Other', email='other@example.ma', phone='0600000009')
+        usages.update(client=other)
+        self.assertEqual(self.rollup(), [])
+        self.assertEqual(
+            list(CostRollup.objects.filter(client=other).values_list('usage_count', flat=True)), [5]
+        )
+
+        Subscription.objects.filter(tool=self.tool).delete()
+        self.assertFalse(CostRollup.objects.filter(tool=self.tool).exists())
+
+
+class BulkGenerationLogTests(APITestCase):
+    """log_generation_bulk inserts the valid rows, reports the others and dedupes on idempotency_key."""
+
+    url = '/api/subscriptions/usage/log_generation_bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.user = User.objects.create_user(username='bulk', password='bulk')
+        cls.tool = AITool.objects.get(name='budget_tool_0')
+        cls.customer = Client.objects.get(email='budget0@example.ma')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def row(self, **extra):
+        return {'tool_id': str(self.tool.pk), 'client_id': str(self.customer.pk), 'credits_used': 7, **extra}
+
+    def test_partial_failure(self):
+        # 100 MAD for 3000 credits: 7 credits cost 0.2333...
+        Subscription.objects.filter(tool=self.tool).update(total_cost_mad=100)
+        rows = [self.row(), {'client_id': str(self.customer.pk)}, self.row(client_id=str(uuid.uuid4())), 'nope']
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 3))
+        self.assertEqual(response.data['usages'][0]['index'], 0)
+        self.assertEqual(response.data['usages'][0]['calculated_cost_mad'], '0.23')
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('tool_id', response.data['errors'][0]['errors'])
+        self.assertEqual(response.data['errors'][1]['errors']['client_id'], ['Client not found'])
+
+        response = self.client.post(self.url, [{'client_id': str(self.customer.pk)}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_row_cap(self):
+        with patch('subscriptions.views.MAX_BULK_GENERATIONS', 2):
+            response = self.client.post(self.url, {'generations': [self.row()] * 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('maximum is 2', response.data['error'])
+        self.assertEqual(CreditUsage.objects.filter(client=self.customer).count(), 6)
+
+    def test_idempotency_key_dedupe(self):
+        key = str(uuid.uuid4())
+        rows = [self.row(idempotency_key=key), self.row(idempotency_key=key), self.row()]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual((response.data['created'], response.data['skipped']), (2, [1]))
+        self.assertEqual(response.data['usages'][0]['id'], key)
+
+        response = self.client.post(self.url, rows[:1], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['skipped']), (0, [0]))
+        self.assertEqual(CreditUsage.objects.filter(client=self.customer).count(), 8)
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(self.row(credits_used=credits)) for credits in (1, 2)) + '\n\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+
+        response = self.client.post(self.url, json.dumps(self.row()) + '\n{oops', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.data['detail'])
+
+
+class GenerationSpoolTests(TestCase):
+    """Spooled rows reach CreditUsage once, including after a crash."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.tool = AITool.objects.get(name='budget_tool_0')
+        cls.customer = Client.objects.get(email='budget0@example.ma')
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.spool = GenerationSpool(self.directory)
+
+    def row(self, **extra):
+        return {'tool_id': str(self.tool.pk), 'client_id': str(self.customer.pk), 'credits_used': 3, **extra}
+
+    def usages(self):
+        return CreditUsage.objects.filter(client=self.customer).count()
+
+    def test_append_and_flush(self):
+        keys = self.spool.append([self.row(), self.row()])
+        self.assertEqual(len(set(keys)), 2)
+        self.assertEqual(self.spool.stats()['depth'], 2)
+
+        self.assertEqual(self.spool.flush(), 2)
+        self.assertEqual(self.usages(), 8)
+        self.assertTrue(CreditUsage.objects.filter(pk=keys[0]).exists())
+        self.assertEqual(self.spool.stats()['depth'], 0)
+
+    def test_replay_after_crash(self):
+        # Rotated but never flushed: the process died mid-flush
+        self.spool.append([self.row()])
+        self.spool._rotate()
+        self.assertEqual(self.spool.stats()['segments'], 1)
+
+        restarted = GenerationSpool(self.directory)
+        self.assertEqual(restarted.flush(), 1)
+        self.assertEqual(restarted._segments(), [])
+        self.assertEqual(self.usages(), 7)
+
+    def test_duplicates_and_rejections(self):
+        key = str(uuid.uuid4())
+        self.spool.append([self.row(idempotency_key=key)])
+        self.spool.flush()
+        # Replayed row, a key taken by another client's usage and an unknown client
+        other = Client.objects.create(name='Other', email='other@example.ma', phone='0600000009')
+        other_usage = CreditUsage.objects.create(
+            subscription=Subscription.objects.get(tool=self.tool), client=other, credits_used=1
+        )
+        self.spool.append([
+            self.row(idempotency_key=key),
+            self.row(idempotency_key=str(other_usage.pk)),
+            self.row(client_id=str(uuid.uuid4())),
+        ])
+        with self.assertLogs('subscriptions.spool', 'WARNING'):
+            self.assertEqual(self.spool.flush(), 0)
+        self.assertEqual(self.usages(), 7)
+
+        stats = self.spool.stats()
+        self.assertEqual(stats['rejected'], 2)
+        with open(os.path.join(self.directory, 'rejected.ndjson'), encoding='utf-8') as rejected_file:
+            rejected = [json.loads(line) for line in rejected_file]
+        self.assertIn('idempotency_key', rejected[0]['errors'])
+        self.assertEqual(rejected[1]['errors']['client_id'], ['Client not found'])
+
+
+class UsageCostRecalculationTests(TestCase):
+    """Correcting a subscription's cost basis recomputes its usages, and only then."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_budget_dataset(1)
+        cls.subscription = Subscription.objects.get(tool__name='budget_tool_0')
+
+    def costs(self):
+        return set(self.subscription.usages.values_list('calculated_cost_mad', flat=True))
+
+    def test_cost_correction_recalculates(self):
+        subscription = Subscription.objects.get(pk=self.subscription.pk)
+        subscription.total_cost_mad = Decimal('600')
+        subscription.save()
+        self.assertEqual(self.costs(), {Decimal('2.00')})
+
+    def test_unchanged_or_unloaded_basis_is_left_alone(self):
+        with patch('subscriptions.recalculation.recalculate_usage_costs') as recalculate:
+            subscription = Subscription.objects.only('id', 'notes').get(pk=self.subscription.pk)
+            subscription.notes = 'renewed'
+            subscription.save()
+
+            subscription = Subscription.objects.get(pk=self.subscription.pk)
+            subscription.original_currency = 'USD'
+            subscription.original_amount = Decimal('29.99')
+            subscription.exchange_rate = Decimal('10.0310')
+            subscription.save()
+            self.assertEqual(recalculate.call_count, 1)
+
+            # 29.99 x 10.0310 = 300.829690, stored as 300.83
+            subscription = Subscription.objects.get(pk=self.subscription.pk)
+            self.assertEqual(subscription.total_cost_mad, Decimal('300.83'))
+            subscription.notes = 'checked'
+            subscription.save()
+            self.assertEqual(recalculate.call_count, 1)
+
+    def test_command_dry_run(self):
+        self.subscription.usages.update(calculated_cost_mad=Decimal('5.00'))
+        out = StringIO()
+        call_command('recalculate_usage_costs', '--dry-run', stdout=out)
+        self.assertIn('6 usages with a stale cost', out.getvalue())
+        self.assertIn('Total cost change: -24.00 MAD', out.getvalue())
+        self.assertIn('[DRY RUN]', out.getvalue())
+        self.assertEqual(self.costs(), {Decimal('5.00')})
+
+        call_command('recalculate_usage_costs', '--tool', 'budget_tool_0', stdout=StringIO())
+        self.assertEqual(self.costs(), {Decimal('1.00')})
+        out = StringIO()
+        call_command('recalculate_usage_costs', stdout=out)
+        self.assertIn('[OK] All usage costs are up to date', out.getvalue())
@@ -0,0 +1,484 @@
+"""
+Import of the usage history exported by the AI tools (Kling, Freepik, Runway...).
+
+Each tool gets an adapter that knows its export: which columns hold the
+generation id, date, type, credits, duration and prompt, and how to read
+them. Adding a tool is a subclass with a `columns` map, registered with
+@register. Tools without a dedicated adapter use GenericUsageAdapter,
+which expects this module's own column names.
+
+The file is parsed as a stream (CSV, JSON array, or NDJSON) and every
+record is:
+
+1. normalized by the adapter into log_generation fields,
+2. assigned a client (and optionally a project) by MappingRules,
+3. given idempotency_key = uuid5(tool, generation id), so the same
+   generation imported twice, from overlapping exports or a re-run,
+   is skipped,
+4. handed to ingest_generations() in batches, which resolves
+   subscriptions per month, computes costs in memory and bulk inserts.
+
+Mapping rules (JSON), first match wins:
+
+    {
+      "rules": [
+        {"match": {"project": "ramadan*"}, "client": "contact@atlas.ma", "project": "Campagne Ramadan"},
+        {"match": {"description": "*atlas*"}, "client": "Atlas Média"}
+      ],
+      "default": {"client": "2f1c...uuid"}
+    }
+
+`match` compares record fields (description, generation_type, project,
+or any export column) with case-insensitive glob patterns; all must
+match. Clients are referenced by id, email or name; projects by id or
+title within that client.
+"""
+
+import codecs
+import csv
+import fnmatch
+import hashlib
+import json
+import re
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from clients.models import Client
+from projects.models import Project
+from .ingest import ingest_generations, MAX_BULK_GENERATIONS
+from .models import AITool
+
+# Constants
+READ_SIZE = 64 * 1024
+MAX_REPORTED_ERRORS = 1000
+GENERATION_NAMESPACE = uuid.UUID('6f1d3c2e-8a57-4c1b-9d0e-5b7a2f4e9c31')  # Fixed: keys must be stable
+JSON_LIST_KEYS = ('data', 'items', 'results', 'tasks', 'generations', 'history')
+WHITESPACE_COMMA = re.compile(r'[\s,]*')
+DURATION_RE = re.compile(r'^(?:(\d+):)?(\d+):(\d+)$|^(\d+(?:\.\d+)?)\s*s?$')
+
+
+class UsageImportError(Exception):
+    """The export or the mapping rules cannot be used at all."""
+
+
+def _key(name):
+    return str(name or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+# Stream parsers: yield one dict per record
+
+def iter_csv(binary):
+    reader = csv.DictReader(codecs.iterdecode(binary, 'utf-8-sig'))
+    try:
+        for row in reader:
+            yield {_key(name): value for name, value in row.items() if name is not None}
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise UsageImportError(f'Invalid CSV: {e}')
+
+
+def iter_ndjson(binary):
+    for number, line in enumerate(codecs.iterdecode(binary, 'utf-8-sig'), start=1):
+        if line.strip():
+            try:
+                yield _flat(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise UsageImportError(f'Invalid JSON on line {number}: {e}')
+
+
+def iter_json(binary):
+    """
+    Records of a JSON export. A top-level array is decoded one element at a
+    time; an object wrapping the list (e.g. {"data": [...]}) is loaded whole.
+    """
+    text = codecs.getreader('utf-8-sig')(binary)
+    buffer = text.read(READ_SIZE).lstrip()
+    if buffer.startswith('{'):
+        document = json.loads(buffer + text.read())
+        for key in JSON_LIST_KEYS:
+            if isinstance(document.get(key), list):
+                yield from (_flat(item) for item in document[key])
+                return
+        raise UsageImportError(f'No list of records under {", ".join(JSON_LIST_KEYS)}')
+    if not buffer.startswith('['):
+        raise UsageImportError('Expected a JSON array or object')
+
+    decoder = json.JSONDecoder()
+    position = 1
+    while True:
+        position = WHITESPACE_COMMA.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            if position >= len(buffer):
+                raise json.JSONDecodeError('Need more data', buffer, position)
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            more = text.read(READ_SIZE)
+            if not more:
+                raise UsageImportError('Invalid or truncated JSON array')
+            buffer, position = buffer[position:] + more, 0
+            continue
+        yield _flat(item)
+        if position > READ_SIZE:
+            buffer, position = buffer[position:], 0
+
+
+def _flat(item):
+    """One level of nesting is flattened ({"usage": {"credits": 5}} -> usage_credits)."""
+    if not isinstance(item, dict):
+        raise UsageImportError('Expected JSON objects as records')
+    flat = {}
+    for name, value in item.items():
+        if isinstance(value, dict):
+            flat.update({_key(f'{name}_{inner}'): inner_value for inner, inner_value in value.items()})
+        else:
+            flat[_key(name)] = value
+    return flat
+
+
+PARSERS = {
+    'csv': iter_csv,
+    'json': iter_json,
+    'ndjson': iter_ndjson,
+    'jsonl': iter_ndjson,
+}
+
+
+# Value readers
+
+def parse_timestamp(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        seconds = float(value)
+        # Millisecond epochs are what most JSON exports use
+        return datetime.fromtimestamp(seconds / 1000 if seconds > 1e11 else seconds, tz=dt_timezone.utc)
+    text = str(value).strip().replace('Z', '+00:00')
+    parsed = parse_datetime(text)
+    if parsed is None:
+        day = parse_date(text)
+        parsed = datetime.combine(day, datetime.min.time()) if day else None
+    if parsed is None:
+        raise ValueError(f'Unrecognised date: {value}')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def parse_seconds(value):
+    """'10', '10s', '5.0', '00:10' or '0:00:10' -> whole seconds."""
+    if value in (None, ''):
+        return 0
+    match = DURATION_RE.match(str(value).strip().lower())
+    if match is None:
+        raise ValueError(f'Unrecognised duration: {value}')
+    hours, minutes, seconds, plain = match.groups()
+    if plain is not None:
+        return round(float(plain))
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def parse_int(value, default=0):
+    if value in (None, ''):
+        return default
+    return round(float(str(value).replace(',', '.')))
+
+
+# Adapters
+
+ADAPTERS = {}
+
+
+def register(cls):
+    ADAPTERS[cls.tool] = cls
+    return cls
+
+
+class UsageExportAdapter:
+    """
+    Reads one tool's export. `columns` maps each normalized field to the
+    candidate column names (snake_cased) it may have in the export.
+    """
+
+    tool = None
+    columns = {
+        'generation_id': ['generation_id', 'id'],
+        'created_at': ['created_at', 'date'],
+        'generation_type': ['generation_type', 'type'],
+        'items_generated': ['items_generated', 'items', 'count'],
+        'credits_used': ['credits_used', 'credits'],
+        'video_seconds': ['video_seconds', 'duration', 'seconds'],
+        'description': ['description', 'prompt'],
+        'project': ['project', 'folder'],
+    }
+    # Export values -> CreditUsage.GENERATION_TYPES
+    type_aliases = {
+        'image': 'image', 'images': 'image', 'img': 'image', 'text_to_image': 'image', 'image_to_image': 'image',
+        'video': 'video', 'videos': 'video', 'text_to_video': 'video', 'image_to_video': 'video',
+        'audio': 'audio', 'music': 'audio', 'song': 'audio', 'sound': 'audio',
+    }
+    default_type = 'image'
+
+    def __init__(self, tool=None):
+        if tool is not None:
+            self.tool = tool
+
+    def value(self, raw, field):
+        for name in self.columns.get(field, []):
+            if raw.get(name) not in (None, ''):
+                return raw[name]
+        return None
+
+    def generation_type(self, raw):
+        value = self.value(raw, 'generation_type')
+        if value in (None, ''):
+            return self.default_type
+        return self.type_aliases.get(_key(value), 'other')
+
+    def generation_id(self, raw):
+        value = self.value(raw, 'generation_id')
+        if value not in (None, ''):
+            return str(value)
+        # No id column: the record itself identifies the generation
+        return 'sha1:' + hashlib.sha1(json.dumps(raw, sort_keys=True, default=str).encode()).hexdigest()
+
+    def normalize(self, raw):
+        """Returns the record in log_generation terms; raises ValueError on unreadable values."""
+        generation_type = self.generation_type(raw)
+        video_seconds = parse_seconds(self.value(raw, 'video_seconds'))
+        return {
+            'generation_id': self.generation_id(raw),
+            'usage_date': parse_timestamp(self.value(raw, 'created_at')),
+            'generation_type': generation_type,
+            'items_generated': parse_int(self.value(raw, 'items_generated'), default=1),
+            'credits_used': parse_int(self.value(raw, 'credits_used')),
+            'video_seconds': video_seconds if generation_type == 'video' else 0,
+            'description': str(self.value(raw, 'description') or '')[:500],
+            'project': str(self.value(raw, 'project') or ''),
+        }
+
+
+class GenericUsageAdapter(UsageExportAdapter):
+    """Any tool, with this module's column names (see UsageExportAdapter.columns)."""
+
+
+@register
+class KlingUsageAdapter(UsageExportAdapter):
+    tool = 'kling_ai'
+    columns = {
+        **UsageExportAdapter.columns,
+        'generation_id': ['task_id', 'work_id', 'id'],
+        'created_at': ['create_time', 'created_time', 'created_at', 'time'],
+        'generation_type': ['type', 'task_type', 'mode'],
+        'credits_used': ['credits_consumed', 'credit_cost', 'credits'],
+        'video_seconds': ['duration', 'video_duration'],
+        'description': ['prompt', 'description'],
+    }
+    default_type = 'video'
+
+
+@register
+class FreepikUsageAdapter(UsageExportAdapter):
+    tool = 'freepik'
+    columns = {
+        **UsageExportAdapter.columns,
+        'generation_id': ['id', 'generation_id', 'task_id'],
+        'created_at': ['created_at', 'creation_date', 'date'],
+        'generation_type': ['type', 'asset_type', 'tool'],
+        'items_generated': ['num_images', 'images', 'items'],
+        'credits_used': ['credits', 'credits_spent', 'cost'],
+        'description': ['prompt', 'description'],
+        'project': ['collection', 'folder', 'project'],
+    }
+
+
+@register
+class RunwayUsageAdapter(UsageExportAdapter):
+    tool = 'runway'
+    columns = {
+        **UsageExportAdapter.columns,
+        'generation_id': ['id', 'task_id'],
+        'created_at': ['createdat', 'created_at', 'created'],
+        'generation_type': ['tasktype', 'task_type', 'type', 'output_type'],
+        'credits_used': ['credits', 'cost', 'credits_used'],
+        'video_seconds': ['duration', 'options_seconds', 'seconds'],
+        'description': ['prompttext', 'prompt_text', 'prompt', 'options_text_prompt'],
+        'project': ['project', 'folder', 'asset_group'],
+    }
+    type_aliases = {**UsageExportAdapter.type_aliases, 'gen3a_turbo': 'video', 'gen4_turbo': 'video',
+                    'gen4_image': 'image', 'upscale_v1': 'video'}
+    default_type = 'video'
+
+
+def get_adapter(tool_name):
+    return ADAPTERS.get(tool_name, GenericUsageAdapter)(tool_name)
+
+
+def generation_key(tool_name, generation_id):
+    return uuid.uuid5(GENERATION_NAMESPACE, f'{tool_name}:{generation_id}')
+
+
+# Client / project mapping
+
+class MappingRules:
+    """Assigns client and project ids to normalized records (see module docstring)."""
+
+    def __init__(self, config):
+        config = config or {}
+        if not isinstance(config, dict):
+            raise UsageImportError('Mapping rules must be a JSON object')
+        rules = list(config.get('rules', []))
+        if config.get('default'):
+            rules.append({**config['default'], 'match': {}})
+        if not rules:
+            raise UsageImportError('Mapping rules need at least one rule or a default client')
+        for rule in rules:
+            if not isinstance(rule, dict) or not rule.get('client') or not isinstance(rule.get('match', {}), dict):
+                raise UsageImportError(f'Invalid rule {rule!r}: needs a client and a match object')
+
+        clients = self._resolve_clients({str(rule['client']) for rule in rules})
+        projects = self._resolve_projects({
+            (clients[str(rule['client'])], str(rule['project'])) for rule in rules if rule.get('project')
+        })
+        self.rules = [
+            (
+                {_key(field): str(pattern).lower() for field, pattern in rule.get('match', {}).items()},
+                clients[str(rule['client'])],
+                projects[(clients[str(rule['client'])], str(rule['project']))] if rule.get('project') else None,
+            )
+            for rule in rules
+        ]
+
+    @staticmethod
+    def _resolve_clients(references):
+        """One query: reference (id, email or name) -> client id."""
+        ids = set()
+        for reference in references:
+            try:
+                ids.add(uuid.UUID(reference))
+            except ValueError:
+                pass
+        lowered = {reference.lower() for reference in references}
+        candidates = Client.objects.annotate(email_lower=Lower('email'), name_lower=Lower('name')).filter(
+            Q(pk__in=ids) | Q(email_lower__in=lowered) | Q(name_lower__in=lowered)
+        ).values_list('pk', 'email_lower', 'name_lower')
+        resolved = {}
+        for reference in references:
+            matches = {
+                pk for pk, email, name in candidates
+                if str(pk) == reference or reference.lower() in (email, name)
+            }
+            if len(matches) != 1:
+                problem = 'matches several clients' if matches else 'does not match any client'
+                raise UsageImportError(f'Client "{reference}" in the mapping rules {problem}')
+            resolved[reference] = matches.pop()
+        return resolved
+
+    @staticmethod
+    def _resolve_projects(references):
+        """One query: (client id, project id or title) -> project id."""
+        if not references:
+            return {}
+        client_ids = {client_id for client_id, _ in references}
+        candidates = list(
+            Project.objects.filter(client_id__in=client_ids).values_list('pk', 'client_id', 'title')
+        )
+        resolved = {}
+        for client_id, reference in references:
+            matches = {
+                pk for pk, owner, title in candidates
+                if owner == client_id and (str(pk) == reference or title.lower() == reference.lower())
+            }
+            if len(matches) != 1:
+                problem = 'matches several projects' if matches else 'is not a project of that client'
+                raise UsageImportError(f'Project "{reference}" in the mapping rules {problem}')
+            resolved[(client_id, reference)] = matches.pop()
+        return resolved
+
+    def resolve(self, record, raw):
+        """Returns (client id, project id or None) of the first matching rule, or None."""
+        for conditions, client_id, project_id in self.rules:
+            if all(
+                fnmatch.fnmatchcase(str(record.get(field, raw.get(field)) or '').lower(), pattern)
+                for field, pattern in conditions.items()
+            ):
+                return client_id, project_id
+        return None
+
+
+# Pipeline
+
+def import_usage_export(tool_name, binary, filename, rules_config, dry_run=False,
+                        batch_size=MAX_BULK_GENERATIONS):
+    """
+    Stream an export file into CreditUsage.
+
+    Returns:
+        dict: report with rows, created, skipped (already imported),
+        failed, cost_mad and errors [{'record': n, 'errors': {...}}]
+    """
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension not in PARSERS:
+        raise UsageImportError(f'Unsupported export type .{extension}, expected {", ".join(PARSERS)}')
+    tool = AITool.objects.filter(name=tool_name).first()
+    if tool is None:
+        raise UsageImportError(f'Unknown tool {tool_name}')
+    adapter = get_adapter(tool_name)
+    rules = MappingRules(rules_config)
+    report = {
+        'tool': tool_name, 'adapter': type(adapter).__name__, 'rows': 0, 'created': 0, 'skipped': 0,
+        'failed': 0, 'cost_mad': Decimal('0'), 'errors': [],
+    }
+
+    def fail(number, errors):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'record': number, 'errors': errors})
+
+    def flush(batch):
+        if not batch:
+            return
+        created, skipped, errors = ingest_generations([row for _, row in batch])
+        report['created'] += len(created)
+        report['skipped'] += len(skipped)
+        report['cost_mad'] += sum((usage.calculated_cost_mad for _, usage in created), Decimal('0'))
+        for error in errors:
+            fail(batch[error['index']][0], error['errors'])
+
+    with transaction.atomic():
+        batch = []
+        for number, raw in enumerate(PARSERS[extension](binary), start=1):
+            report['rows'] += 1
+            try:
+                record = adapter.normalize(raw)
+            except ValueError as e:
+                fail(number, {'non_field_errors': [str(e)]})
+                continue
+            target = rules.resolve(record, raw)
+            if target is None:
+                fail(number, {'client_id': ['No mapping rule matched this record']})
+                continue
+            row = {
+                'tool_id': tool.pk,
+                'client_id': target[0],
+                'project_id': target[1],
+                'idempotency_key': generation_key(tool_name, record['generation_id']),
+                **{field: record[field] for field in (
+                    'generation_type', 'items_generated', 'credits_used', 'video_seconds', 'description'
+                )},
+            }
+            if record['usage_date'] is not None:
+                row['usage_date'] = record['usage_date']
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        flush(batch)
+        report['cost_mad'] = report['cost_mad'].quantize(Decimal('0.01'))
+        if dry_run:
+            transaction.set_rollback(True)
+    return report
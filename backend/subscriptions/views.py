@@ -1,11 +1,16 @@
+import json
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db.models import Sum, F
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.conf import settings
+from datetime import datetime
 from decimal import Decimal
-from .models import AITool, Subscription, CreditUsage, ClientServiceSelection
+from .models import AITool, Subscription, CreditUsage, CostRollup, ClientServiceSelection
 from .serializers import (
     AIToolSerializer,
     SubscriptionSerializer,
@@ -13,27 +18,48 @@ from .serializers import (
     CreditUsageSerializer,
     CreditUsageCreateSerializer,
     ClientServiceSelectionSerializer,
-    ClientServiceSelectionCreateSerializer
+    ClientServiceSelectionCreateSerializer,
+    GenerationLogSerializer
 )
+from .parsers import NDJSONParser
+from .ingest import ingest_generations, MAX_BULK_GENERATIONS
+from .usage_imports import import_usage_export, UsageImportError
+from .spool import get_spool, spool_enabled
+from .catalog import get_active_tool_catalog, catalog_version, ACTIVE_TOOLS_RESPONSE_CACHE
+from config.compressed_cache import compressed_cache
+from config.authentication import STATELESS_READ_AUTHENTICATION
+from config.pagination import KeysetPagination
+from config.sparse_fields import SparseFieldsViewMixin
 from clients.models import Client
+from analytics.snapshot import SnapshotReadMixin
 
 
-class AIToolViewSet(viewsets.ModelViewSet):
+class AIToolViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = AITool.objects.filter(is_active=True)
     serializer_class = AIToolSerializer
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], authentication_classes=STATELESS_READ_AUTHENTICATION)
+    @compressed_cache(ACTIVE_TOOLS_RESPONSE_CACHE, settings.CACHE_TIMEOUT_STATIC, key=catalog_version)
     def active(self, request):
         """Get all active tools with their default pricing."""
-        tools = AITool.objects.filter(is_active=True)
-        serializer = self.get_serializer(tools, many=True)
-        return Response(serializer.data)
+        return Response(get_active_tool_catalog(request))
 
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
+class SubscriptionViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Subscription.objects.all()
     serializer_class = SubscriptionSerializer
 
+    def get_queryset(self):
+        """Annotate credits used to avoid one SUM query per subscription."""
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve', 'current_month']:
+            # Meta.ordering is dropped once the annotation adds a GROUP BY: restate
+            # it, with a tiebreaker so pages never repeat or skip a subscription
+            queryset = queryset.select_related('tool').order_by('-billing_month', 'pk')
+            if self.wants_field('credits_used'):
+                queryset = queryset.annotate(_credits_used=Coalesce(Sum('usages__credits_used'), 0))
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ['create', 'upsert']:
             return SubscriptionCreateSerializer
@@ -78,10 +104,10 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         today = timezone.now().date()
         first_of_month = today.replace(day=1)
 
-        subscriptions = Subscription.objects.filter(
+        subscriptions = self.get_queryset().filter(
             billing_month=first_of_month,
             is_active=True
-        ).select_related('tool')
+        )
 
         serializer = self.get_serializer(subscriptions, many=True)
         return Response(serializer.data)
@@ -112,15 +138,29 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         })
 
 
-class CreditUsageViewSet(viewsets.ModelViewSet):
+class CreditUsageViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = CreditUsage.objects.all()
     serializer_class = CreditUsageSerializer
+    ordering = ['-usage_date']
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        """Optimize queryset with select_related to avoid N+1 queries."""
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('subscription__tool', 'client', 'project')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
             return CreditUsageCreateSerializer
         return CreditUsageSerializer
 
+    def _should_defer(self, request):
+        """Write-behind is opt-in per request (?defer=1) and only when the spool is enabled."""
+        defer = request.query_params.get('defer', '').lower() in ('1', 'true', 'yes')
+        return defer and spool_enabled()
+
     @action(detail=False, methods=['get'])
     def by_client(self, request):
         """Get all usage for a specific client."""
@@ -174,6 +214,18 @@ class CreditUsageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if self._should_defer(request):
+            row = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+            if request.headers.get('Idempotency-Key'):
+                row.setdefault('idempotency_key', request.headers['Idempotency-Key'])
+            serializer = GenerationLogSerializer(data=row)
+            serializer.is_valid(raise_exception=True)
+            keys = get_spool().append([row])
+            return Response(
+                {'status': 'accepted', 'idempotency_key': keys[0]},
+                status=status.HTTP_202_ACCEPTED
+            )
+
         # Find current subscription for this tool
         today = timezone.now().date()
         first_of_month = today.replace(day=1)
@@ -204,11 +256,123 @@ class CreditUsageViewSet(viewsets.ModelViewSet):
 
         return Response(CreditUsageSerializer(usage).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def log_generation_bulk(self, request):
+        """
+        Log many generations in one request.
+        Accepts a JSON array, {"generations": [...]}, or an NDJSON stream.
+        Each row may carry a usage_date; its month selects the subscription,
+        and an idempotency_key; rows already logged with that key are skipped.
+        Valid rows are inserted even when other rows fail validation.
+        With ?defer=1 and the spool enabled, valid rows are spooled and
+        acknowledged with 202 instead of being written in the request.
+        """
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('generations')
+
+        if not isinstance(rows, list):
+            return Response(
+                {'error': 'Expected a list of generations'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > MAX_BULK_GENERATIONS:
+            return Response(
+                {'error': f'Too many generations ({len(rows)}), maximum is {MAX_BULK_GENERATIONS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if self._should_defer(request):
+            accepted = []
+            errors = []
+            for index, row in enumerate(rows):
+                serializer = GenerationLogSerializer(data=row)
+                if serializer.is_valid():
+                    accepted.append((index, row))
+                else:
+                    errors.append({'index': index, 'errors': serializer.errors})
+            keys = get_spool().append([row for _, row in accepted]) if accepted else []
+            return Response({
+                'accepted': len(accepted),
+                'failed': len(errors),
+                'idempotency_keys': [
+                    {'index': index, 'idempotency_key': key}
+                    for (index, _), key in zip(accepted, keys)
+                ],
+                'errors': errors,
+            }, status=status.HTTP_202_ACCEPTED if accepted else status.HTTP_400_BAD_REQUEST)
+
+        created, skipped, errors = ingest_generations(rows)
+
+        return Response({
+            'created': len(created),
+            'skipped': skipped,
+            'failed': len(errors),
+            'usages': [
+                {
+                    'index': index,
+                    'id': str(usage.id),
+                    # A string with 2 decimals, as CreditUsageSerializer renders it
+                    'calculated_cost_mad': str(usage.calculated_cost_mad),
+                }
+                for index, usage in created
+            ],
+            'errors': errors,
+        }, status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_export(self, request):
+        """
+        Import a tool's usage export (see subscriptions/usage_imports.py).
+
+        Form fields:
+            tool: AITool name (kling_ai, freepik, runway, ...)
+            file: the export, .csv, .json or .ndjson
+            rules: JSON mapping rules (records -> client/project)
+            dry_run: "true" to report without saving
+        """
+        upload = request.FILES.get('file')
+        tool = request.data.get('tool')
+        if upload is None or not tool:
+            return Response({'error': 'tool and file are required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            rules = json.loads(request.data.get('rules') or '{}')
+        except json.JSONDecodeError as e:
+            return Response({'error': f'Invalid rules JSON: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = request.data.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+        try:
+            report = import_usage_export(tool, upload, upload.name, rules, dry_run=dry_run)
+        except UsageImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        report['dry_run'] = dry_run
+        return Response(
+            report,
+            status=status.HTTP_201_CREATED if report['created'] and not dry_run
+            else status.HTTP_200_OK if report['created'] or not report['failed']
+            else status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(detail=False, methods=['get'])
+    def spool_status(self, request):
+        """Write-behind spool depth and flush lag."""
+        if not spool_enabled():
+            return Response({'enabled': False})
+        return Response(get_spool().stats())
+
 
 class ClientServiceSelectionViewSet(viewsets.ModelViewSet):
     queryset = ClientServiceSelection.objects.all()
     serializer_class = ClientServiceSelectionSerializer
 
+    def get_queryset(self):
+        """Optimize queryset with select_related for tool name/type."""
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('tool')
+        return queryset
+
     def get_serializer_class(self):
         if self.action == 'create':
             return ClientServiceSelectionCreateSerializer
@@ -298,72 +462,86 @@ class ClientServiceSelectionViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CostAnalyticsView(APIView):
+class CostAnalyticsView(SnapshotReadMixin, APIView):
     """Analytics endpoints for cost tracking."""
 
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
     def get(self, request):
-        """Get cost summary for all clients - optimized with single query."""
-        # Get all usages with client and tool info in single query
-        client_totals = CreditUsage.objects.filter(
-            client__is_active=True
-        ).values(
-            'client__id', 'client__name', 'client__company'
-        ).annotate(
-            total_cost_mad=Sum('calculated_cost_mad'),
-            total_credits_used=Sum('credits_used'),
-            total_items_generated=Sum('items_generated')
-        ).order_by('-total_cost_mad')
-
-        # Get breakdown by tool for each client in one query
-        tool_breakdown = CreditUsage.objects.filter(
-            client__is_active=True
-        ).values(
-            'client__id',
-            tool_name=F('subscription__tool__display_name')
+        """
+        Get cost summary for all clients from the pre-aggregated CostRollup table.
+        Optional ?from=YYYY-MM&to=YYYY-MM restricts to a window of billing months.
+        """
+        rollups = CostRollup.objects.filter(client__is_active=True)
+
+        for param, lookup in (('from', 'month__gte'), ('to', 'month__lte')):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                month = datetime.strptime(value, '%Y-%m').date()
+            except ValueError:
+                return Response(
+                    {'error': f'{param} must be in YYYY-MM format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            rollups = rollups.filter(**{lookup: month})
+
+        # Single query over rollup rows: one row per client x tool in the window
+        tool_breakdown = rollups.values(
+            'client_id', 'client__name', 'client__company',
+            tool_name=F('tool__display_name')
         ).annotate(
-            cost_mad=Sum('calculated_cost_mad'),
-            credits=Sum('credits_used'),
-            items=Sum('items_generated')
-        )
+            cost_mad=Sum('total_cost_mad'),
+            credits=Sum('total_credits_used'),
+            items=Sum('total_items_generated')
+        ).order_by()
 
-        # Build breakdown lookup
-        breakdown_by_client = {}
+        # Build client totals and breakdown in one pass
+        summaries_by_client = {}
         for item in tool_breakdown:
-            client_id = str(item['client__id'])
-            if client_id not in breakdown_by_client:
-                breakdown_by_client[client_id] = []
-            breakdown_by_client[client_id].append({
+            client_id = str(item['client_id'])
+            summary = summaries_by_client.get(client_id)
+            if summary is None:
+                summary = summaries_by_client[client_id] = {
+                    'client_id': client_id,
+                    'client_name': item['client__name'],
+                    'company': item['client__company'],
+                    'total_cost_mad': Decimal('0'),
+                    'total_credits_used': 0,
+                    'total_items_generated': 0,
+                    'breakdown_by_tool': []
+                }
+            summary['total_cost_mad'] += item['cost_mad'] or 0
+            summary['total_credits_used'] += item['credits'] or 0
+            summary['total_items_generated'] += item['items'] or 0
+            summary['breakdown_by_tool'].append({
                 'tool_name': item['tool_name'],
                 'cost_mad': item['cost_mad'] or 0,
                 'credits': item['credits'] or 0,
                 'items': item['items'] or 0,
             })
 
-        # Build response
-        summaries = []
-        for client in client_totals:
-            client_id = str(client['client__id'])
-            summaries.append({
-                'client_id': client_id,
-                'client_name': client['client__name'],
-                'company': client['client__company'],
-                'total_cost_mad': float(client['total_cost_mad'] or 0),
-                'total_credits_used': client['total_credits_used'] or 0,
-                'total_items_generated': client['total_items_generated'] or 0,
-                'breakdown_by_tool': breakdown_by_client.get(client_id, [])
-            })
+        summaries = sorted(
+            summaries_by_client.values(),
+            key=lambda summary: summary['total_cost_mad'],
+            reverse=True
+        )
+        for summary in summaries:
+            summary['total_cost_mad'] = float(summary['total_cost_mad'])
 
         return Response(summaries)
 
 
-class MonthlyOverviewView(APIView):
+class MonthlyOverviewView(SnapshotReadMixin, APIView):
     """Monthly subscription overview."""
 
+    authentication_classes = STATELESS_READ_AUTHENTICATION
+
     def get(self, request):
         month_str = request.query_params.get('month')
 
         if month_str:
-            from datetime import datetime
             first_of_month = datetime.strptime(month_str, '%Y-%m').date()
         else:
             today = timezone.now().date()
@@ -372,7 +550,9 @@ class MonthlyOverviewView(APIView):
         subscriptions = Subscription.objects.filter(
             billing_month=first_of_month,
             is_active=True
-        ).select_related('tool')
+        ).select_related('tool').annotate(
+            _credits_used=Coalesce(Sum('usages__credits_used'), 0)
+        )
 
         overview = []
         total_cost = Decimal('0')
@@ -385,7 +565,7 @@ class MonthlyOverviewView(APIView):
                 'original_amount': float(sub.original_amount) if sub.original_amount else None,
                 'original_currency': sub.original_currency,
                 'credits_total': sub.total_credits,
-                'credits_used': sub.credits_used,
+                'credits_used': sub._credits_used,
                 'credits_remaining': sub.credits_remaining,
                 'cost_per_credit_mad': float(sub.cost_per_credit_mad) if sub.cost_per_credit_mad else None,
             }
@@ -14,10 +14,6 @@ echo.
 :: Create backups folder if it doesn't exist
 if not exist "backups" mkdir backups
 
-:: Generate timestamp
-for /f "tokens=2 delims==" %%I in ('wmic os get localdatetime /format:list') do set datetime=%%I
-set BACKUP_NAME=db-backup-%datetime:~0,8%-%datetime:~8,4%.sqlite3
-
 :: Check if Docker is running
 docker info >nul 2>&1
 if %ERRORLEVEL% NEQ 0 (
@@ -38,9 +34,11 @@ if %ERRORLEVEL% NEQ 0 (
     exit /b 1
 )
 
-:: Copy database from container
+:: Online snapshot inside the container (consistent even while the app writes),
+:: compressed and checksummed, older ones rotated out
 echo Creation de la sauvegarde...
-docker cp sufian-panel-backend:/app/data/db.sqlite3 "backups\%BACKUP_NAME%"
+docker exec -e DATABASE_PATH=/app/data/db.sqlite3 -e BACKUP_DIR=/app/data/backups sufian-panel-backend python manage.py backup
+if %ERRORLEVEL% EQU 0 docker cp sufian-panel-backend:/app/data/backups/. backups
 
 if %ERRORLEVEL% EQU 0 (
     color 0A
@@ -49,7 +47,7 @@ if %ERRORLEVEL% EQU 0 (
     echo     SAUVEGARDE CREEE AVEC SUCCES!
     echo ========================================
     echo.
-    echo Fichier: backups\%BACKUP_NAME%
+    echo Dossier: backups\
     echo.
 ) else (
     color 0C